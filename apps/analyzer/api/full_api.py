@@ -10,24 +10,67 @@ Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only
 import sys
 import os
 import json
+import logging
+import asyncio
+from contextlib import asynccontextmanager
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime, timezone
-from storage.mongo_storage import MongoStorage
+from typing import Any, AsyncGenerator, Callable, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+from storage.mongo_storage import MongoStorage, close_mongo_client, get_shared_storage
 from collectors.discord_collector import DiscordCollector
 from bson import ObjectId
-from dateutil.relativedelta import relativedelta
+from pymongo.errors import ExecutionTimeout, OperationFailure
 from llm.analyse import analyse
 from llm.content import trend_to_content
-from dateutil.parser import parse as parse_date
+from llm.ovh_client import close_ovh_client, CompletionAssembler
+from llm.cache import get_analysis_cache
+from llm.discord_analysis import compute_period, formatted_messages, has_messages, build_analysis_doc, run_discord_analysis
+from config.config import get_env_var
+
+logger = logging.getLogger(__name__)
 
 origins = ["*"]
 
-app = FastAPI()
+# Max seconds an endpoint waits for the shared Discord session before answering 503
+DISCORD_READY_TIMEOUT = float(get_env_var("DISCORD_READY_TIMEOUT", "10"))
+# Server-side time limit of a message search
+SEARCH_MAX_TIME_MS = int(get_env_var("SEARCH_MAX_TIME_MS", "2000"))
+# Recency window of relevance searches without `days`
+SEARCH_RELEVANCE_DAYS = int(get_env_var("SEARCH_RELEVANCE_DAYS", "90"))
+# MongoDB error code of a $text query without text index
+INDEX_NOT_FOUND = 27
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    =========
+    Function: lifespan
+    ------------
+    DESCRIPTION: Start one long-lived Discord gateway session for the whole API process; close it and the shared MongoDB/LLM clients on shutdown.
+    PARAMS: app (FastAPI)
+    RETURNS: None
+    =========
+    """
+    collector = DiscordCollector()
+    app.state.discord = collector
+    if collector.token:
+        await collector.start()
+    else:
+        logger.warning("DISCORD_BOT_TOKEN is not set: Discord endpoints will answer 503.")
+    try:
+        yield
+    finally:
+        await collector.close()
+        await close_ovh_client()
+        close_mongo_client()
+
+app = FastAPI(lifespan=lifespan)
 router = APIRouter(prefix="/analyzer")
 
 
@@ -45,6 +88,7 @@ class DiscordHarvestRequest(BaseModel):
     channels: List[int] = Field(..., description="List of channel IDs to fetch")
     after: Optional[str] = Field(None, description="ISO timestamp or snowflake ID for start of period")
     before: Optional[str] = Field(None, description="ISO timestamp or snowflake ID for end of period")
+    fullBackfill: bool = Field(False, description="Re-read whole channel histories instead of resuming after the last harvested message")
 
 class DiscordAnalyzeRequest(BaseModel):
     creator_id: int = Field(..., description="Internal user ID (SQL, obligatoire)")
@@ -53,23 +97,50 @@ class DiscordAnalyzeRequest(BaseModel):
     model_name: str = Field(..., description="LLM model name to use")
     prompt_key: str = Field(..., description="Prompt key from discord_prompts.yaml")
     period: str = Field(..., description="Period to analyze: last_day, last_week, last_month")
+    force_refresh: bool = Field(False, description="Ignore any cached result and call the LLM again")
+
+def get_storage() -> MongoStorage:
+    """
+    =========
+    Dependency: get_storage
+    ------------
+    DESCRIPTION: Return the process-wide MongoStorage (built once, on the pooled client).
+    PARAMS: None
+    RETURNS: MongoStorage
+    =========
+    """
+    return get_shared_storage()
+
+async def get_discord_collector(request: Request) -> DiscordCollector:
+    """
+    =========
+    Dependency: get_discord_collector
+    ------------
+    DESCRIPTION: Return the shared Discord collector once its gateway session is ready.
+    PARAMS: request (Request)
+    RETURNS: DiscordCollector
+    =========
+    """
+    collector = request.app.state.discord
+    if not collector.token or not await collector.wait_until_ready(timeout=DISCORD_READY_TIMEOUT):
+        raise HTTPException(status_code=503, detail="Discord session not ready, retry later.")
+    return collector
 
 @router.get("/s2")
 def read_main_2():
     return {"msg": "Hello World 2"}
 
 @router.post("/discord/harvest")
-async def discord_harvest(request: DiscordHarvestRequest):
+async def discord_harvest(request: DiscordHarvestRequest, storage: MongoStorage = Depends(get_storage)):
     """
     =========
     Endpoint: /discord/harvest [POST]
     ------------
-    DESCRIPTION: Insert a harvesting job for Discord messages in MongoDB. The daemon will process it asynchronously.
+    DESCRIPTION: Insert a harvesting job for Discord messages in MongoDB. The daemon will process it asynchronously. Without after/before, channels are harvested incrementally from their last harvested message unless fullBackfill is set.
     PARAMS: DiscordHarvestRequest (JSON body)
     RETURNS: JSON with job_id and status
     =========
     """
-    storage = MongoStorage()
     job = {
         "discordId": request.discordId,
         "serverId": request.serverId,
@@ -81,24 +152,27 @@ async def discord_harvest(request: DiscordHarvestRequest):
         job["after"] = request.after
     if request.before:
         job["before"] = request.before
+    if request.fullBackfill:
+        job["full_backfill"] = True
     job_id = storage.add_harvest_job(job)
     return {"job_id": str(job_id), "status": "queued"}
 
 @router.get("/discord/channels/{server_id}")
-async def list_discord_channels(server_id: int):
+async def list_discord_channels(
+    server_id: int,
+    collector: DiscordCollector = Depends(get_discord_collector),
+    storage: MongoStorage = Depends(get_storage),
+):
     """
     =========
     Endpoint: /discord/channels/{server_id} [GET]
     ------------
-    DESCRIPTION: Lists all text channels (id, name) for a given Discord server (guild) by connecting temporarily to Discord.
+    DESCRIPTION: Lists all text channels (id, name) for a given Discord server (guild) from the shared session's guild cache.
     PARAMS: server_id (path)
     RETURNS: List of channels (id, name)
     =========
     """
-    collector = DiscordCollector()
-    storage = MongoStorage()
     try:
-        await collector.connect()
         guild = collector.client.get_guild(server_id)
 
         if not guild:
@@ -113,23 +187,22 @@ async def list_discord_channels(server_id: int):
             if ch.permissions_for(guild.me).read_messages
         ]
         return {"server_id": str(guild.id), "server_name": guild.name, "channels": channels}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await collector.close()
 
 @router.get("/discord/harvest/status/{job_id}")
-def get_harvest_job_status(job_id: str):
+def get_harvest_job_status(job_id: str, storage: MongoStorage = Depends(get_storage)):
     """
     =========
     Endpoint: /discord/harvest/status/{job_id} [GET]
     ------------
     DESCRIPTION: Allows to track the status and result of a Discord harvesting job.
     PARAMS: job_id (path)
-    RETURNS: Status, number of inserted messages, finish date, error if any
+    RETURNS: Status, number of inserted messages, progress of a running job, start/finish dates, queue wait, worker and attempts, error if any
     =========
     """
-    storage = MongoStorage()
     try:
         job = storage.db.discord_harvest_jobs.find_one({"_id": ObjectId(job_id)})
     except Exception:
@@ -140,12 +213,17 @@ def get_harvest_job_status(job_id: str):
         "job_id": str(job["_id"]),
         "status": job["status"],
         "inserted": job.get("inserted"),
+        "started_at": job.get("started_at"),
         "finished_at": job.get("finished_at"),
+        "queue_wait_seconds": job.get("queue_wait_seconds"),
+        "progress": job.get("progress"),
+        "worker": job.get("worker"),
+        "attempts": job.get("attempts"),
         "error": job.get("error")
     }
 
 @router.get("/discord/servers")
-async def list_discord_servers():
+async def list_discord_servers(collector: DiscordCollector = Depends(get_discord_collector)):
     """
     =========
     Endpoint: /discord/servers [GET]
@@ -155,109 +233,161 @@ async def list_discord_servers():
     RETURNS: List of servers (id, name)
     =========
     """
-    collector = DiscordCollector()
+    servers = [
+        {"id": str(guild.id), "name": guild.name}
+        for guild in collector.client.guilds
+    ]
+    return {"servers": servers}
+
+def resolve_period(period: str):
     try:
-        await collector.connect()
-        servers = [
-            {"id": str(guild.id), "name": guild.name}
-            for guild in collector.client.guilds
-        ]
-        return {"servers": servers}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await collector.close()
+        return compute_period(period)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/discord/analyze")
-async def discord_analyze(request: DiscordAnalyzeRequest):
+def summarize_activity(buckets: List[dict], top: int) -> dict:
     """
     =========
-    Endpoint: /discord/analyze [POST]
+    Function: summarize_activity
     ------------
-    DESCRIPTION: Analyze Discord messages in a channel over a given period using a selected LLM model and prompt.
-    PARAMS: DiscordAnalyzeRequest (JSON body, creator_id obligatoire)
-    RETURNS: LLM analysis result
+    DESCRIPTION: Aggregate hourly activity buckets into period totals and the most active authors.
+    PARAMS: buckets (discord_channel_activity documents), top (number of authors to return)
+    RETURNS: dict - message_count, reply_count, active_authors, top_authors
     =========
     """
-    # 1. Compute date range
-    now = datetime.utcnow()
-    if request.period == "last_day":
-        since = now - relativedelta(days=1)
-    elif request.period == "last_week":
-        since = now - relativedelta(weeks=1)
-    elif request.period == "last_month":
-        since = now - relativedelta(months=1)
-    else:
-        raise HTTPException(status_code=400, detail="Invalid period. Use last_day, last_week, or last_month.")
+    authors, names = {}, {}
+    for bucket in buckets:
+        for user_id, count in bucket.get("authors", {}).items():
+            authors[user_id] = authors.get(user_id, 0) + count
+        names.update(bucket.get("author_names", {}))
+    # Deletes decrement the author counters without removing them: skip authors left with no message
+    authors = {user_id: count for user_id, count in authors.items() if count > 0}
+    ranked = sorted(authors.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "message_count": sum(b.get("message_count", 0) for b in buckets),
+        "reply_count": sum(b.get("reply_count", 0) for b in buckets),
+        "active_authors": len(authors),
+        "top_authors": [
+            {"user_id": user_id, "author_name": names.get(user_id), "message_count": count}
+            for user_id, count in ranked
+        ]
+    }
 
-    # 2. Fetch messages from MongoDB (already harvested)
-    storage = MongoStorage()
-    filters = {
-        "channel_id": request.channelId,
-        "created_at": {"$gte": since, "$lte": now}
+@router.get("/discord/activity/{channel_id}")
+def get_channel_activity(
+    channel_id: int,
+    period: str = "last_week",
+    top: int = Query(10, ge=1, le=100),
+    storage: MongoStorage = Depends(get_storage),
+):
+    """
+    =========
+    Endpoint: /discord/activity/{channel_id} [GET]
+    ------------
+    DESCRIPTION: Channel activity over a period, read from the hourly rollups maintained at ingest (no scan of discord_messages).
+    PARAMS: channel_id (path), period (query: last_day, last_week, last_month), top (query, authors to rank)
+    RETURNS: {"channel_id", "period", "totals", "buckets": [{"hour", "message_count", "reply_count", "authors", ...}]}
+    =========
+    """
+    since, now = resolve_period(period)
+    buckets = storage.get_channel_activity(channel_id, since, now)
+    return {
+        "channel_id": str(channel_id),
+        "period": {"from": since, "to": now},
+        "totals": summarize_activity(buckets, top),
+        "buckets": buckets
     }
-    messages = storage.get_discord_messages(filters)
-    if not messages:
-        return {"result": None, "message": "No messages found for this period."}
 
-    # Trie du plus ancien au plus récent
-    for m in messages:
-        if isinstance(m["created_at"], str):
-            m["created_at"] = parse_date(m["created_at"])
-    messages = sorted(messages, key=lambda m: m["created_at"])
-
-    # 3. Format messages for the prompt
-    formatted = []
-    for msg in messages:
-        dt = msg["created_at"].strftime("%Y-%m-%d %H:%M")
-        user = msg.get("author_name", str(msg.get("user_id", "?")))
-        content = msg["content"]
-        formatted.append(f"[{dt}] {user}: {content}")
-
-    # 4. Appel à l'API OVH via analyse.py
-    try:
-        ovh_response = analyse(
-            model_name=request.model_name,
-            prompt_name=request.prompt_key,
-            user_content=formatted
-        )
-        # 5. Stockage du résultat dans analysis_results
-        analysis_doc = {
-            "creator_id": int(request.creator_id),
-            "platform": "discord",
-            "prompt_key": request.prompt_key,
-            "llm_model": request.model_name,
-            "scope": {
-                "server_id": request.serverId,
-                "channel_id": request.channelId
-            },
-            "period": {
-                "from": since,
-                "to": now
-            },
-            "result": ovh_response,
-            "created_at": datetime.utcnow()
-        }
-        storage.db.analysis_results.insert_one(analysis_doc)
-        return ovh_response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+def resolve_search_channels(storage: MongoStorage, server_id: Optional[int], channel_id: Optional[int]) -> Tuple[int, List[int]]:
+    """
+    =========
+    Function: resolve_search_channels
+    ------------
+    DESCRIPTION: Server and channels a search is scoped to: the given channel and its server (which must match server_id if both are given), else the harvested channels of the server.
+    PARAMS: storage, server_id, channel_id
+    RETURNS: Tuple[int, List[int]] - (server snowflake, channel snowflakes)
+    =========
+    """
+    if channel_id is None and server_id is None:
+        raise HTTPException(status_code=400, detail="server_id or channel_id is required")
+    if channel_id is None:
+        return server_id, [channel["_id"] for channel in storage.get_discord_channels(server_id)]
+    channel = storage.db.discord_channels.find_one({"_id": channel_id}, {"server_id": 1})
+    if not channel or (server_id is not None and channel["server_id"] != server_id):
+        raise HTTPException(status_code=404, detail=f"Channel {channel_id} not harvested" + (f" in server {server_id}" if server_id is not None else ""))
+    return channel["server_id"], [channel_id]
 
-@router.get("/discord/trend-to-content/{analyse_id}")
-def get_trend_to_content(analyse_id: str, trend_index: int = 0):
+@router.get("/discord/search")
+def search_discord_messages(
+    q: str = Query(..., min_length=1, max_length=200, description="Words, \"exact phrases\" or -excluded words"),
+    server_id: Optional[int] = None,
+    channel_id: Optional[int] = None,
+    sort: str = Query("relevance", pattern="^(relevance|recent)$"),
+    days: Optional[int] = Query(None, ge=1, le=3650, description="Only messages of the last N days (relevance: SEARCH_RELEVANCE_DAYS by default)"),
+    page: int = Query(1, ge=1, le=50),
+    page_size: int = Query(20, ge=1, le=100),
+    storage: MongoStorage = Depends(get_storage),
+):
     """
     =========
-    Endpoint: /discord/trend-to-content/{analyse_id} [GET]
+    Endpoint: /discord/search [GET]
+    ------------
+    DESCRIPTION: Full-text search of harvested messages in a server or a channel, through the text index of discord_messages (see scripts/init_mongo.py). Ranked by relevance over the last SEARCH_RELEVANCE_DAYS days unless `days` is given (most recent first on ties), or by recency only.
+    PARAMS: q (query), server_id and/or channel_id (query, one required), sort (query: relevance, recent), days (query, optional), page and page_size (query)
+    RETURNS: {"query", "page", "page_size", "has_more", "results": [{"id", "channel_id", "user_id", "author_name", "content", "created_at", "parent_message_id", "score"}]}
+    =========
+    """
+    server_id, channel_ids = resolve_search_channels(storage, server_id, channel_id)
+    if days is None and sort == "relevance":
+        days = SEARCH_RELEVANCE_DAYS
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    messages = []
+    if channel_ids:
+        try:
+            # One extra match tells whether a next page exists, without counting every match
+            messages = storage.search_discord_messages(
+                q, server_id, channel_ids, sort=sort, skip=(page - 1) * page_size, limit=page_size + 1, since=since,
+                max_time_ms=SEARCH_MAX_TIME_MS
+            )
+        except ExecutionTimeout:
+            raise HTTPException(status_code=504, detail="Search took too long, narrow it down to a channel, recent days or more specific words.")
+        except OperationFailure as e:
+            if e.code == INDEX_NOT_FOUND:
+                logger.error("Text index of discord_messages missing: run scripts/init_mongo.py")
+                raise HTTPException(status_code=503, detail="Message search is not available yet.")
+            raise
+    return {
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(messages) > page_size,
+        "results": [
+            {
+                "id": str(msg["_id"]),
+                "channel_id": str(msg["channel_id"]),
+                "user_id": str(msg["user_id"]),
+                "author_name": msg.get("author_name"),
+                "content": msg.get("content"),
+                "created_at": msg["created_at"],
+                "parent_message_id": str(msg["parent_message_id"]) if msg.get("parent_message_id") else None,
+                "score": round(msg["score"], 3)
+            }
+            for msg in messages[:page_size]
+        ]
+    }
+
+def load_trends(storage: MongoStorage, analyse_id: str):
+    """
+    =========
+    Function: load_trends
     ------------
-    DESCRIPTION: 
-    PARAMS: analyse_id (path)
-    RETURNS: 
+    DESCRIPTION: Load a stored discord_trends analysis and parse its trends.
+    PARAMS: storage, analyse_id
+    RETURNS: Tuple[dict, list] - (analysis document, parsed trends)
     =========
     """
-    storage = MongoStorage()
     try:
-        analysis  = storage.db.analysis_results.find_one({"_id": ObjectId(analyse_id)})
-        print(analysis)
+        analysis = storage.db.analysis_results.find_one({"_id": ObjectId(analyse_id)})
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid analyse_id format")
     if not analysis:
@@ -271,7 +401,19 @@ def get_trend_to_content(analyse_id: str, trend_index: int = 0):
     trends = parsed_result.get("trends", [])
     if not trends:
         raise HTTPException(status_code=400, detail="No trends found in the analysis result")
-    if trend_index >= len(trends):
+    return analysis, trends
+
+def build_trend_input(analysis: dict, trends: list, trend_index: int):
+    """
+    =========
+    Function: build_trend_input
+    ------------
+    DESCRIPTION: Build the trend_to_content input for one trend of a parsed analysis.
+    PARAMS: analysis, trends, trend_index
+    RETURNS: Tuple[dict, dict] - (selected trend, trend input)
+    =========
+    """
+    if trend_index < 0 or trend_index >= len(trends):
         raise HTTPException(status_code=400, detail=f"Trend index {trend_index} out of range. Only {len(trends)} trend(s) available.")
 
     selected_trend = trends[trend_index]
@@ -282,36 +424,344 @@ def get_trend_to_content(analyse_id: str, trend_index: int = 0):
         "activity_level": selected_trend.get("activity_level"),
         "timeframe": analysis.get("result", {}).get("timeframe")  # important pour la suite
     }
+    return selected_trend, trend_input
+
+def load_trend_input(storage: MongoStorage, analyse_id: str, trend_index: int):
+    """
+    =========
+    Function: load_trend_input
+    ------------
+    DESCRIPTION: Load a stored discord_trends analysis and build the trend_to_content input for one of its trends.
+    PARAMS: storage, analyse_id, trend_index
+    RETURNS: Tuple[dict, dict, dict] - (analysis document, selected trend, trend input)
+    =========
+    """
+    analysis, trends = load_trends(storage, analyse_id)
+    selected_trend, trend_input = build_trend_input(analysis, trends, trend_index)
+    return analysis, selected_trend, trend_input
+
+def build_summary_doc(analysis: dict, trend_index: int, selected_trend: dict, trend_input: dict, model_name: str, result: dict) -> dict:
+    return {
+        "creator_id": analysis.get("creator_id", -1),
+        "platform": "discord",
+        "source_analysis_id": analysis["_id"],
+        "prompt_key": "trend_to_content",
+        "llm_model": model_name,
+        "scope": {
+            "trend_id": trend_index,
+            "trend_title": selected_trend.get("title"),
+            "timeframe": trend_input["timeframe"]
+        },
+        "input_trend": trend_input,
+        "result": result,
+        "created_at": datetime.now(timezone.utc)
+    }
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def stream_completion(lines: AsyncGenerator[str, None], on_complete: Callable[[dict], Any]) -> AsyncGenerator[str, None]:
+    """
+    =========
+    Function: stream_completion
+    ------------
+    DESCRIPTION: Relay a streamed LLM completion as Server-Sent Events ("token" events), then persist the assembled result through on_complete and send a final "done" event (or an "error" event).
+    PARAMS:
+    - lines: raw upstream lines (OVHClient.stream)
+    - on_complete: blocking callback storing the assembled result (run in a worker thread), returns the stored document id
+    RETURNS: async generator of SSE frames
+    =========
+    """
+    assembler = CompletionAssembler()
+    try:
+        async for line in lines:
+            delta = assembler.feed(line)
+            if delta:
+                yield sse_event("token", {"content": delta})
+            if assembler.done:
+                break
+        inserted_id = await asyncio.to_thread(on_complete, assembler.result())
+        yield sse_event("done", {"id": str(inserted_id), "content": assembler.content})
+    except Exception as e:
+        yield sse_event("error", {"detail": f"LLM error: {e}"})
+    finally:
+        await lines.aclose()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@router.post("/discord/analyze")
+async def discord_analyze(request: DiscordAnalyzeRequest, storage: MongoStorage = Depends(get_storage)):
+    """
+    =========
+    Endpoint: /discord/analyze [POST]
+    ------------
+    DESCRIPTION: Analyze Discord messages in a channel over a given period using a selected LLM model and prompt.
+    PARAMS: DiscordAnalyzeRequest (JSON body, creator_id obligatoire)
+    RETURNS: LLM analysis result
+    =========
+    """
+    resolve_period(request.period)
+    try:
+        ovh_response, _ = await run_discord_analysis(storage, request.model_dump(), force_refresh=request.force_refresh)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+    if ovh_response is None:
+        return {"result": None, "message": "No messages found for this period."}
+    return ovh_response
+
+@router.post("/discord/analyze/jobs")
+def submit_discord_analysis_job(request: DiscordAnalyzeRequest, storage: MongoStorage = Depends(get_storage)):
+    """
+    =========
+    Endpoint: /discord/analyze/jobs [POST]
+    ------------
+    DESCRIPTION: Queue a Discord analysis in analysis_jobs. The analysis worker runs it asynchronously; poll /discord/analyze/status/{job_id}.
+    PARAMS: DiscordAnalyzeRequest (JSON body, creator_id obligatoire)
+    RETURNS: JSON with job_id and status
+    =========
+    """
+    resolve_period(request.period)
+    job = {
+        "params": request.model_dump(exclude={"force_refresh"}),
+        "force_refresh": request.force_refresh,
+        "status": "pending",
+        "created_at": datetime.utcnow()
+    }
+    job_id = storage.add_analysis_job(job)
+    return {"job_id": str(job_id), "status": "queued"}
+
+def load_analysis_job(storage: MongoStorage, job_id: str) -> dict:
+    try:
+        job = storage.get_analysis_job(ObjectId(job_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job_id format")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/discord/analyze/status/{job_id}")
+def get_analysis_job_status(job_id: str, storage: MongoStorage = Depends(get_storage)):
+    """
+    =========
+    Endpoint: /discord/analyze/status/{job_id} [GET]
+    ------------
+    DESCRIPTION: Track the status of a queued Discord analysis job.
+    PARAMS: job_id (path)
+    RETURNS: Status, analysis id once done, dates, worker and attempts, error if any
+    =========
+    """
+    job = load_analysis_job(storage, job_id)
+    return {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "analysis_id": str(job["analysis_id"]) if job.get("analysis_id") else None,
+        "message": job.get("message"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "worker": job.get("worker"),
+        "attempts": job.get("attempts"),
+        "error": job.get("error")
+    }
+
+@router.get("/discord/analyze/result/{job_id}")
+def get_analysis_job_result(job_id: str, storage: MongoStorage = Depends(get_storage)):
+    """
+    =========
+    Endpoint: /discord/analyze/result/{job_id} [GET]
+    ------------
+    DESCRIPTION: Return the LLM result of a finished Discord analysis job (same body as /discord/analyze).
+    PARAMS: job_id (path)
+    RETURNS: LLM analysis result; 409 while the job is pending/running, 500 if it failed
+    =========
+    """
+    job = load_analysis_job(storage, job_id)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=job.get("error"))
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    if not job.get("analysis_id"):
+        return {"result": None, "message": job.get("message")}
+    analysis = storage.db.analysis_results.find_one({"_id": job["analysis_id"]}, {"result": 1})
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analyse not found")
+    return analysis["result"]
+
+@router.post("/discord/analyze/stream")
+async def discord_analyze_stream(request: DiscordAnalyzeRequest, storage: MongoStorage = Depends(get_storage)):
+    """
+    =========
+    Endpoint: /discord/analyze/stream [POST]
+    ------------
+    DESCRIPTION: Streaming variant of /discord/analyze. Forwards the LLM tokens as Server-Sent Events as they arrive and stores the assembled result in analysis_results when the stream ends.
+    PARAMS: DiscordAnalyzeRequest (JSON body, creator_id obligatoire)
+    RETURNS: text/event-stream - "token" events ({content}), then "done" ({id, content}) or "error" ({detail})
+    =========
+    """
+    since, now = resolve_period(request.period)
+    if not await asyncio.to_thread(has_messages, storage, request.channelId, since, now):
+        return {"result": None, "message": "No messages found for this period."}
+    try:
+        lines = await analyse(
+            model_name=request.model_name,
+            prompt_name=request.prompt_key,
+            user_content=formatted_messages(storage, request.channelId, since, now),
+            stream=True,
+            force_refresh=request.force_refresh
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+
+    def store(result: dict):
+        return storage.db.analysis_results.insert_one(build_analysis_doc(request.model_dump(), since, now, result)).inserted_id
+
+    return StreamingResponse(stream_completion(lines, store), media_type="text/event-stream", headers=SSE_HEADERS)
 
+@router.get("/discord/trend-to-content/{analyse_id}")
+async def get_trend_to_content(
+    analyse_id: str,
+    trend_index: int = 0,
+    force_refresh: bool = False,
+    storage: MongoStorage = Depends(get_storage),
+):
+    """
+    =========
+    Endpoint: /discord/trend-to-content/{analyse_id} [GET]
+    ------------
+    DESCRIPTION: Turn one trend of a stored discord_trends analysis into an educational content proposal.
+    PARAMS: analyse_id (path), trend_index (query, default 0), force_refresh (query, default false)
+    RETURNS: LLM trend_to_content result
+    =========
+    """
+    analysis, selected_trend, trend_input = await asyncio.to_thread(load_trend_input, storage, analyse_id, trend_index)
     try:
         model_name = analysis.get("llm_model")
-        response = trend_to_content(
+        response = await trend_to_content(
             model_name=model_name,
             prompt_name="trend_to_content",
-            trend=trend_input
+            trend=trend_input,
+            force_refresh=force_refresh
         )
 
         # stockage du contenu généré
-        summary_res ={
-            "creator_id": analysis.get("creator_id", -1),
-            "platform": "discord",
-            "source_analysis_id": analysis["_id"],
-            "prompt_key": "trend_to_content",
-            "llm_model": model_name,
-            "scope": {
-                "trend_id": trend_index,
-                "trend_title": selected_trend.get("title"),
-                "timeframe": trend_input["timeframe"]
-            },
-            "input_trend": trend_input,
-            "result": response,
-            "created_at": datetime.now(timezone.utc)
-        }
-        storage.db.summary_results.insert_one(summary_res)
+        await asyncio.to_thread(
+            storage.db.summary_results.insert_one,
+            build_summary_doc(analysis, trend_index, selected_trend, trend_input, model_name, response)
+        )
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+
+@router.get("/discord/trend-to-content/{analyse_id}/batch")
+async def get_trend_to_content_batch(
+    analyse_id: str,
+    trend_indexes: Optional[List[int]] = Query(None),
+    force_refresh: bool = False,
+    storage: MongoStorage = Depends(get_storage),
+):
+    """
+    =========
+    Endpoint: /discord/trend-to-content/{analyse_id}/batch [GET]
+    ------------
+    DESCRIPTION: Turn several trends of a stored discord_trends analysis into content proposals in one request, with concurrent LLM calls. A failing trend does not fail the others.
+    PARAMS: analyse_id (path), trend_indexes (repeated query, default all trends), force_refresh (query, default false)
+    RETURNS: {"analysis_id", "results": [{"trend_index", "trend_title", "summary_id", "result"} or {"trend_index", "trend_title", "error"}]}
+    =========
+    """
+    analysis, trends = await asyncio.to_thread(load_trends, storage, analyse_id)
+    indexes = list(dict.fromkeys(trend_indexes)) if trend_indexes else list(range(len(trends)))
+    inputs = [(i, *build_trend_input(analysis, trends, i)) for i in indexes]
+    model_name = analysis.get("llm_model")
+
+    responses = await asyncio.gather(*(
+        trend_to_content(
+            model_name=model_name,
+            prompt_name="trend_to_content",
+            trend=trend_input,
+            force_refresh=force_refresh
+        )
+        for _, _, trend_input in inputs
+    ), return_exceptions=True)
+
+    results, docs = [], []
+    for (trend_index, selected_trend, trend_input), response in zip(inputs, responses):
+        item = {"trend_index": trend_index, "trend_title": selected_trend.get("title")}
+        if isinstance(response, Exception):
+            item["error"] = f"LLM error: {response}"
+        else:
+            item["result"] = response
+            docs.append(build_summary_doc(analysis, trend_index, selected_trend, trend_input, model_name, response))
+        results.append(item)
+
+    # stockage des contenus générés en un seul aller-retour
+    if docs:
+        inserted_ids = iter((await asyncio.to_thread(storage.db.summary_results.insert_many, docs)).inserted_ids)
+        for item in results:
+            if "result" in item:
+                item["summary_id"] = str(next(inserted_ids))
+    return {"analysis_id": analyse_id, "results": results}
+
+@router.get("/discord/trend-to-content/{analyse_id}/stream")
+async def get_trend_to_content_stream(
+    analyse_id: str,
+    trend_index: int = 0,
+    force_refresh: bool = False,
+    storage: MongoStorage = Depends(get_storage),
+):
+    """
+    =========
+    Endpoint: /discord/trend-to-content/{analyse_id}/stream [GET]
+    ------------
+    DESCRIPTION: Streaming variant of /discord/trend-to-content. Forwards tokens as Server-Sent Events and stores the assembled result in summary_results when the stream ends.
+    PARAMS: analyse_id (path), trend_index (query, default 0), force_refresh (query, default false)
+    RETURNS: text/event-stream - "token" events ({content}), then "done" ({id, content}) or "error" ({detail})
+    =========
+    """
+    analysis, selected_trend, trend_input = await asyncio.to_thread(load_trend_input, storage, analyse_id, trend_index)
+    model_name = analysis.get("llm_model")
+    try:
+        lines = await trend_to_content(
+            model_name=model_name,
+            prompt_name="trend_to_content",
+            trend=trend_input,
+            stream=True,
+            force_refresh=force_refresh
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"LLM error: {e}")
+
+    def store(result: dict):
+        summary_res = build_summary_doc(analysis, trend_index, selected_trend, trend_input, model_name, result)
+        return storage.db.summary_results.insert_one(summary_res).inserted_id
+
+    return StreamingResponse(stream_completion(lines, store), media_type="text/event-stream", headers=SSE_HEADERS)
     
+@router.get("/llm/cache/stats")
+def get_llm_cache_stats():
+    """
+    =========
+    Endpoint: /llm/cache/stats [GET]
+    ------------
+    DESCRIPTION: Hit/miss counters of this API process's LLM result cache.
+    PARAMS: None
+    RETURNS: Cache counters and hit rate
+    =========
+    """
+    return get_analysis_cache().stats()
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    =========
+    Endpoint: /metrics [GET]
+    ------------
+    DESCRIPTION: Prometheus metrics of this API process (LLM calls, tokens, cache lookups, Mongo writes). The harvester daemon and the analysis worker serve theirs on HARVEST_METRICS_PORT and ANALYSIS_METRICS_PORT.
+    PARAMS: None
+    RETURNS: Prometheus text exposition format
+    =========
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 app.include_router(router)
 # Prepare here other analysis endpoints to come
 if __name__ == "__main__":
@@ -6,12 +6,19 @@ This module is intended to be imported and used by orchestrators (CLI, API, etc.
 Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 import asyncio
-from datetime import datetime
+import logging
 import nextcord
 from nextcord import Intents
 from config.config import load_env, get_env_var
+from collectors.message_stream import after_snowflake, before_snowflake, readable_text_channel, stream_batches, stream_messages, MessageRecord, StreamStats
+
+logger = logging.getLogger(__name__)
+
+# Backoff bounds (seconds) between two login attempts of the persistent session
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
 
 class DiscordCollector:
     """
@@ -39,6 +46,8 @@ class DiscordCollector:
         self.token = token or get_env_var("DISCORD_BOT_TOKEN")
         self.client = nextcord.Client(intents=self._create_intents())
         self._ready = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._closing = False
         self._register_events()
 
     def _create_intents(self) -> Intents:
@@ -52,13 +61,100 @@ class DiscordCollector:
         async def on_ready():
             self._ready.set()
 
+        @self.client.event
+        async def on_resumed():
+            self._ready.set()
+
+        @self.client.event
+        async def on_disconnect():
+            # nextcord reconnects on its own; the gate stays closed until READY/RESUMED
+            self._ready.clear()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set() and not self.client.is_closed()
+
     async def connect(self) -> None:
         loop = asyncio.get_event_loop()
         loop.create_task(self.client.start(self.token))
         await self._ready.wait()
 
+    async def start(self) -> None:
+        """
+        ============
+        Function: start
+        ------------
+        DESCRIPTION: Start a long-lived gateway session in the background, for processes that share one collector (e.g. the API). Returns immediately; use wait_until_ready() to gate on the guild cache.
+        PARAMS: None
+        RETURNS: None
+        ============
+        """
+        if self._runner is not None and not self._runner.done():
+            return
+        self._closing = False
+        self._runner = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def _run_forever(self) -> None:
+        """
+        ============
+        Function: _run_forever
+        ------------
+        DESCRIPTION: Keep the gateway session alive. nextcord handles resumes and gateway reconnects itself; this loop only restarts the client (with exponential backoff) when start() gives up, e.g. login or network failure.
+        PARAMS: None
+        RETURNS: None
+        ============
+        """
+        delay = RECONNECT_MIN_DELAY
+        while not self._closing:
+            try:
+                await self.client.start(self.token, reconnect=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Discord session stopped: %s", e)
+            if self._closing:
+                break
+            if self._ready.is_set():
+                # The session had been up: start the backoff over
+                delay = RECONNECT_MIN_DELAY
+            self._ready.clear()
+            if not self.client.is_closed():
+                await self.client.close()
+            self.client.clear()
+            logger.info("Reconnecting to Discord in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        ============
+        Function: wait_until_ready
+        ------------
+        DESCRIPTION: Readiness gate. Wait until the gateway session is ready (guild cache populated).
+        PARAMS:
+        - timeout (float|None): Max seconds to wait. None waits forever.
+        RETURNS: bool - True if ready, False on timeout.
+        ============
+        """
+        if self.is_ready:
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.is_ready
+
     async def close(self) -> None:
+        self._closing = True
         await self.client.close()
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._runner = None
+        self._ready.clear()
 
     async def list_guilds(self) -> Dict[int, str]:
         """
@@ -92,97 +188,114 @@ class DiscordCollector:
             if ch.permissions_for(guild.me).read_messages
         ]
 
+    def _text_channel(self, guild_id: int, channel_id: int) -> nextcord.TextChannel:
+        guild = self.client.get_guild(guild_id)
+        if guild is None:
+            raise ValueError(f"Guild {guild_id} not found")
+        return readable_text_channel(guild, channel_id)
+
+    async def iter_messages(
+        self,
+        guild_id: int,
+        channel_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> AsyncIterator[MessageRecord]:
+        """
+        ============
+        Function: iter_messages
+        ------------
+        DESCRIPTION: Stream the messages of a text channel *after* `after_id` and *before* `before_id` (Snowflakes), oldest first, as they are paged from Discord. If `after_id` is None, the history is read from the beginning. Attachments and embeds are appended inline.
+        PARAMS:
+        - guild_id (int): Guild ID.
+        - channel_id (int): Channel ID.
+        - after_id (int | None): Snowflake ID of the last stored message (exclusive).
+        - before_id (int | None): Snowflake upper bound (exclusive).
+        RETURNS: AsyncIterator[MessageRecord]
+        ============
+        """
+        channel = self._text_channel(guild_id, channel_id)
+        async for message in stream_messages(channel, after_id=after_id, before_id=before_id):
+            yield message
+
     async def fetch_messages(
         self,
         guild_id: int,
         channel_id: int,
         after_id: Optional[int] = None,
-    ) -> List[Dict[str, Any]]:
+    ) -> List[MessageRecord]:
         """
         ============
         Function: fetch_messages
         ------------
-        DESCRIPTION: Fetch every message in a text channel *after* `after_id` (Snowflake). If `after_id` is None, the whole history is returned. Attachments and embeds are appended inline.
+        DESCRIPTION: Fetch every message in a text channel *after* `after_id` (Snowflake) into a list. Prefer iter_messages for large histories.
         PARAMS:
         - guild_id (int): Guild ID.
         - channel_id (int): Channel ID.
         - after_id (int | None): Snowflake ID of the last stored message.
-        RETURNS: List[Dict] (see schema)
+        RETURNS: List[MessageRecord]
         ============
         """
-        guild = self.client.get_guild(guild_id)
-        if guild is None:
-            raise ValueError(f"Guild {guild_id} not found")
-        channel = guild.get_channel(channel_id)
-        if not isinstance(channel, nextcord.TextChannel):
-            raise ValueError(f"Channel {channel_id} is not a text channel")
-        perms = channel.permissions_for(guild.me)
-        if not (perms.read_messages and perms.read_message_history):
-            raise ValueError(f"Missing permissions on channel {channel_id}")
-        history_kwargs = {"limit": None, "oldest_first": True}
-        if after_id is not None:
-            history_kwargs["after"] = nextcord.Object(id=after_id)
-        messages: List[Dict[str, Any]] = []
-        async for msg in channel.history(**history_kwargs):
-            text = msg.content or ""
-            if msg.attachments:
-                text += " [Attachments: " + ", ".join(a.url for a in msg.attachments) + "]"
-            if msg.embeds:
-                text += " [Embeds present]"
-            parent_id = msg.reference.message_id if msg.reference else None
-            # Drop messages with empty content after attachments/embeds
-            if not text.strip():
-                continue
-            messages.append(
-                {
-                    "id": int(msg.id),
-                    "channel_id": int(channel_id),
-                    "parent_message_id": int(parent_id) if parent_id else None,
-                    "author_name": getattr(msg.author, 'display_name', msg.author.name),
-                    "author_user_id": int(msg.author.id),
-                    "content": text,
-                    "created_at": msg.created_at,
-                    "fetched_at": datetime.utcnow(),
-                }
-            )
-        return messages
+        return [msg async for msg in self.iter_messages(guild_id, channel_id, after_id=after_id)]
 
     async def collect(
         self,
         guild: int,
         channels: List[int],
         after: Optional[str] = None,
-        before: Optional[str] = None
-    ) -> List[Dict[str, Any]]:
+        before: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        high_water_marks: Optional[Dict[int, int]] = None,
+        on_batch: Optional[Callable[[int, List[MessageRecord]], Awaitable[Any]]] = None,
+        batch_size: Optional[int] = None
+    ) -> List[MessageRecord]:
         """
         ============
         Function: collect
         ------------
-        DESCRIPTION: Collect messages from specified channels in a guild, with optional time filtering.
+        DESCRIPTION: Collect messages from specified channels in a guild, with optional time filtering. Channels are fetched concurrently, at most `concurrency` at a time.
         PARAMS:
         - guild (int): Guild/server ID
         - channels (List[int]): List of channel IDs
         - after (str|None): ISO timestamp or snowflake ID
         - before (str|None): ISO timestamp or snowflake ID
-        RETURNS: List[Dict] of messages
+        - concurrency (int|None): Max channels fetched at once (default env HARVEST_CHANNEL_CONCURRENCY, 5)
+        - high_water_marks (Dict[int, int]|None): Last harvested message per channel (see MongoStorage.get_channel_high_water_mark); without `after`, each channel resumes after its mark
+        - on_batch (async callable|None): Called with (channel_id, messages) for every batch of `batch_size` messages as soon as it is fetched, e.g. to store it. Batches are then not kept in memory and the returned list is empty.
+        - batch_size (int|None): Messages per batch (default env HARVEST_BATCH_SIZE, 500)
+        RETURNS: List[MessageRecord], in channel order (empty when on_batch is set)
         ============
         """
         await self.connect()
-        all_messages = []
+        semaphore = asyncio.Semaphore(concurrency or int(get_env_var("HARVEST_CHANNEL_CONCURRENCY", "5")))
+        batch_size = batch_size or int(get_env_var("HARVEST_BATCH_SIZE", "500"))
+        # Date bounds become snowflakes: Discord only pages the requested window
+        after_id = after_snowflake(after)
+        before_id = before_snowflake(before)
+
+        async def collect_channel(channel_id: int) -> List[MessageRecord]:
+            channel_after_id = after_id
+            if not after and high_water_marks:
+                channel_after_id = high_water_marks.get(channel_id)
+            collected: List[MessageRecord] = []
+            stats = StreamStats(channel_id)
+            async with semaphore:
+                channel = self._text_channel(guild, channel_id)
+                stream = stream_batches(channel, batch_size, after_id=channel_after_id, before_id=before_id, stats=stats)
+                async for batch in stream:
+                    if on_batch is not None:
+                        await on_batch(channel_id, batch)
+                    else:
+                        collected.extend(batch)
+            logger.info("Collected %s", stats.summary())
+            return collected
+
         try:
-            for channel_id in channels:
-                after_id = int(after) if after and after.isdigit() else None
-                messages = await self.fetch_messages(guild, channel_id, after_id=after_id)
-                if after and not (after.isdigit()):
-                    after_dt = datetime.fromisoformat(after)
-                    messages = [m for m in messages if m['created_at'] >= after_dt]
-                if before:
-                    before_dt = datetime.fromisoformat(before)
-                    messages = [m for m in messages if m['created_at'] <= before_dt]
-                all_messages.extend(messages)
+            # Channels are fetched concurrently: Discord rate-limit buckets are per channel
+            results = await asyncio.gather(*(collect_channel(channel_id) for channel_id in channels))
         finally:
             await self.close()
-        return all_messages
+        return [msg for messages in results for msg in messages]
 
     async def get_guild_and_channels_info(self, guild_id: int) -> dict:
         """
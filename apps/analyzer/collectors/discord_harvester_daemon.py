@@ -1,7 +1,7 @@
 """
 Module: discord_harvester_daemon.py
 -----------------------------------
-DESCRIPTION: Discord bot daemon that stays connected and processes harvesting jobs from MongoDB.
+DESCRIPTION: Discord bot daemon that stays connected and processes harvesting jobs from MongoDB. With LIVE_INGESTION, it also stores the gateway's message events of harvested channels as they happen.
 """
 
 import sys
@@ -9,10 +9,22 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 import asyncio
+import socket
+import threading
+import time
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import nextcord
-from storage.mongo_storage import MongoStorage
+from pymongo.errors import OperationFailure, PyMongoError
+from config.config import get_env_var
+from config.metrics import (
+    EVENT_LOOP_LAG, HARVEST_JOB_DURATION, HARVEST_JOBS, HARVEST_QUEUE_DEPTH, HARVEST_QUEUE_WAIT, LIVE_MESSAGES,
+    MESSAGES_FETCHED, MESSAGES_INSERTED, start_metrics_server, track_queue_depth
+)
+from collectors.discord_http import DiscordHistoryClient
+from collectors.message_stream import after_snowflake, before_snowflake, message_text, stream_batches, to_message_record, MessageRecord, StreamStats
+from storage.async_mongo_storage import AsyncMongoStorage
 
 # Charger le token Discord depuis .env.dev
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env.dev'))
@@ -23,110 +35,574 @@ intents.guilds = True
 intents.message_content = True
 
 client = nextcord.Client(intents=intents)
-storage = MongoStorage()
+# Awaitable storage: pymongo calls run in a thread pool, never on the gateway's event loop
+storage = AsyncMongoStorage()
 
-def filter_new_messages(db, messages):
+# Global limit (concurrent jobs on the gateway connection) and per-guild limit (running jobs of a guild
+# across every daemon replica)
+WORKERS = int(get_env_var('HARVEST_WORKERS', '4'))
+PER_GUILD_LIMIT = int(get_env_var('HARVEST_PER_GUILD_LIMIT', '1'))
+# Job leases: renewed by a heartbeat while the job runs; an expired lease (dead daemon) is reclaimed
+# by any daemon replica, at most HARVEST_MAX_ATTEMPTS times
+LEASE_SECONDS = float(get_env_var('HARVEST_LEASE_SECONDS', '60'))
+MAX_ATTEMPTS = int(get_env_var('HARVEST_MAX_ATTEMPTS', '3'))
+# Idle wait bounds: backoff polling without change streams (standalone server), capped at the former
+# fixed 2s poll so pickup latency never regresses; with change streams, only a safety re-check
+POLL_MIN_INTERVAL = float(get_env_var('HARVEST_POLL_MIN_INTERVAL', '0.5'))
+POLL_MAX_INTERVAL = float(get_env_var('HARVEST_POLL_MAX_INTERVAL', '2'))
+WATCH_RECHECK_INTERVAL = float(get_env_var('HARVEST_WATCH_RECHECK_INTERVAL', '30'))
+# Channels fetched concurrently within one job
+CHANNEL_CONCURRENCY = int(get_env_var('HARVEST_CHANNEL_CONCURRENCY', '5'))
+# Messages stored per insert while a channel history is streamed
+BATCH_SIZE = int(get_env_var('HARVEST_BATCH_SIZE', '500'))
+
+# Rate-limit scheduled REST paging (opt-in): history pages of every job share Discord's buckets by priority
+# (full backfills after the others) instead of nextcord sleeping on 429s
+RATE_SCHEDULER = get_env_var('HARVEST_RATE_SCHEDULER', 'false').lower() in ('1', 'true', 'yes')
+history_client = DiscordHistoryClient(token) if RATE_SCHEDULER else None
+
+# Live ingestion (opt-in): gateway messages of harvested channels, written every LIVE_FLUSH_INTERVAL
+# seconds, or as soon as LIVE_BUFFER_MAX changes are buffered
+LIVE_INGESTION = get_env_var('LIVE_INGESTION', 'false').lower() in ('1', 'true', 'yes')
+LIVE_FLUSH_INTERVAL = float(get_env_var('LIVE_FLUSH_INTERVAL', '2'))
+LIVE_BUFFER_MAX = int(get_env_var('LIVE_BUFFER_MAX', '1000'))
+
+# Compteurs par worker
+worker_stats: Dict[int, "WorkerStats"] = {}
+poller: Optional[asyncio.Task] = None
+claim_lock = asyncio.Lock()
+
+# Event loop lag sampling: period, warning threshold and report period (seconds)
+LOOP_LAG_INTERVAL = float(get_env_var('LOOP_LAG_INTERVAL', '0.5'))
+LOOP_LAG_WARN = float(get_env_var('LOOP_LAG_WARN', '0.1'))
+LOOP_LAG_REPORT = float(get_env_var('LOOP_LAG_REPORT', '60'))
+
+class LoopLagMonitor:
+    """
+    ============
+    Class: LoopLagMonitor
+    ------------
+    DESCRIPTION: Measures event loop lag (how late a timer fires). Any blocking call on the loop shows up as lag; a lag above LOOP_LAG_WARN is logged at once, and the max/last values are logged every LOOP_LAG_REPORT seconds.
+    PARAMS: None
+    ============
+    """
+    def __init__(self):
+        self.last = 0.0
+        self.max = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        reported = loop.time()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.last = max(loop.time() - started - LOOP_LAG_INTERVAL, 0.0)
+            EVENT_LOOP_LAG.observe(self.last)
+            self.max = max(self.max, self.last)
+            if self.last > LOOP_LAG_WARN:
+                print(f"[Daemon] Event loop blocked for {self.last * 1000:.0f} ms")
+            if loop.time() - reported >= LOOP_LAG_REPORT:
+                print(f"[Daemon] Event loop lag: max {self.max * 1000:.1f} ms, last {self.last * 1000:.1f} ms")
+                self.max = 0.0
+                reported = loop.time()
+
+loop_lag = LoopLagMonitor()
+
+# MongoDB error code of $changeStream on a standalone server
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+class JobNotifier:
+    """
+    ============
+    Class: JobNotifier
+    ------------
+    DESCRIPTION: Wakes idle workers when a harvest job is inserted, from a MongoDB change stream read in a background thread. On a standalone server (no change streams) `available` stays False and workers fall back to exponential-backoff polling.
+    PARAMS: None
+    ============
+    """
+    def __init__(self):
+        self.available = False
+        self._event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread = threading.Thread(target=self._watch, name="harvest-job-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def notify(self) -> None:
+        """Wake every idle worker (thread-safe)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout: float) -> None:
+        """Wait for a notification, at most `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    def _watch(self) -> None:
+        delay = POLL_MIN_INTERVAL
+        while not self._stopping.is_set():
+            try:
+                with storage.sync.watch_harvest_job_inserts() as stream:
+                    if not self.available:
+                        print("[Daemon] Listening to new jobs through a change stream.")
+                    self.available = True
+                    delay = POLL_MIN_INTERVAL
+                    # Jobs inserted while the stream was down
+                    self.notify()
+                    while not self._stopping.is_set() and stream.alive:
+                        if stream.try_next() is not None:
+                            self.notify()
+            except OperationFailure as e:
+                self.available = False
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    print("[Daemon] Change streams not supported (standalone server): polling with backoff.")
+                    return
+                print(f"[Daemon] Job change stream failed, retrying in {delay:.0f}s: {e}")
+            except PyMongoError as e:
+                self.available = False
+                print(f"[Daemon] Job change stream failed, retrying in {delay:.0f}s: {e}")
+            # Workers poll meanwhile (available is False)
+            self._stopping.wait(delay)
+            delay = min(delay * 2, WATCH_RECHECK_INTERVAL)
+
+notifier = JobNotifier()
+
+class LiveIngestor:
+    """
+    ============
+    Class: LiveIngestor
+    ------------
+    DESCRIPTION: Buffers the gateway's message creations, edits and deletions in harvested channels (those with a high-water mark) and writes them in bulk every LIVE_FLUSH_INTERVAL seconds. Channel high-water marks are left to the delta harvests.
+    PARAMS: None
+    ============
+    """
+    def __init__(self):
+        self.channel_ids: set = set()
+        self._created: Dict[int, MessageRecord] = {}
+        self._edited: Dict[int, str] = {}
+        self._deleted: set = set()
+        self._full = asyncio.Event()
+
+    async def load_channels(self) -> None:
+        delay = POLL_MIN_INTERVAL
+        while True:
+            try:
+                self.channel_ids |= set(await storage.get_harvested_channel_ids())
+                break
+            except PyMongoError as e:
+                print(f"[Daemon] Loading harvested channels failed, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, POLL_MAX_INTERVAL)
+        print(f"[Daemon] Live ingestion on {len(self.channel_ids)} harvested channels.")
+
+    def add_channels(self, channel_ids: List[int]) -> None:
+        self.channel_ids.update(channel_ids)
+
+    def pending(self) -> int:
+        return len(self._created) + len(self._edited) + len(self._deleted)
+
+    def _buffered(self) -> None:
+        if self.pending() >= LIVE_BUFFER_MAX:
+            self._full.set()
+
+    def created(self, msg: nextcord.Message) -> None:
+        if msg.channel.id not in self.channel_ids:
+            return
+        message = to_message_record(msg)
+        if message is not None:
+            self._created[message.id] = message
+            self._buffered()
+
+    def edited(self, channel_id: int, message_id: int, data: dict) -> None:
+        # Partial updates without content (e.g. link embeds resolved) change nothing we store
+        if channel_id not in self.channel_ids or "content" not in data:
+            return
+        text = message_text(
+            data["content"],
+            [a["url"] for a in data.get("attachments", [])],
+            bool(data.get("embeds"))
+        )
+        if message_id in self._created:
+            self._created[message_id].content = text
+        else:
+            self._edited[message_id] = text
+        self._buffered()
+
+    def deleted(self, channel_id: int, message_ids) -> None:
+        if channel_id not in self.channel_ids:
+            return
+        for message_id in message_ids:
+            # Created in this window: never written, nothing to delete
+            if self._created.pop(message_id, None) is None:
+                self._edited.pop(message_id, None)
+                self._deleted.add(message_id)
+        self._buffered()
+
+    async def flush(self) -> None:
+        """Write the buffered changes: creations, then edits, then deletions. On failure they are put back for the next flush."""
+        created, edited, deleted = self._created, self._edited, self._deleted
+        self._created, self._edited, self._deleted = {}, {}, set()
+        self._full.clear()
+        try:
+            if created:
+                counts = await storage.save_discord_messages(list(created.values()))
+                LIVE_MESSAGES.labels(change='created').inc(counts["inserted"])
+            if edited:
+                LIVE_MESSAGES.labels(change='edited').inc(await storage.update_discord_message_contents(edited))
+            if deleted:
+                LIVE_MESSAGES.labels(change='deleted').inc(await storage.delete_discord_messages(list(deleted)))
+        except PyMongoError as e:
+            print(f"[Daemon] Live ingestion flush failed, retrying: {e}")
+            # Changes received meanwhile are newer and win
+            self._created = {**created, **self._created}
+            self._edited = {**edited, **self._edited}
+            self._deleted |= deleted
+
+    async def run(self) -> None:
+        await self.load_channels()
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), LIVE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            if self.pending():
+                await self.flush()
+
+live = LiveIngestor()
+
+class WorkerStats:
     """
     ============
-    Function: filter_new_messages
+    Class: WorkerStats
     ------------
-    DESCRIPTION: Filter out messages whose _id already exists in the discord_messages collection.
+    DESCRIPTION: Running counters of one job worker (jobs, messages, busy time, queue wait), for throughput reporting.
+    ============
+    """
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.jobs = 0
+        self.failed = 0
+        self.messages = 0
+        self.busy_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def record(self, queue_wait: float, duration: float, inserted: int, ok: bool) -> None:
+        self.jobs += 1
+        self.failed += 0 if ok else 1
+        self.messages += inserted
+        self.busy_seconds += duration
+        self.queue_wait_seconds += queue_wait
+
+    def summary(self) -> str:
+        throughput = self.messages / self.busy_seconds if self.busy_seconds else 0.0
+        avg_wait = self.queue_wait_seconds / self.jobs if self.jobs else 0.0
+        return (
+            f"{self.jobs} jobs ({self.failed} failed), {self.messages} messages, "
+            f"{throughput:.1f} msg/s, avg queue wait {avg_wait:.1f}s"
+        )
+
+def is_windowed(job: dict) -> bool:
+    return bool(job.get("after") or job.get("before"))
+
+async def resolve_after_id(job: dict, channel_id: int) -> Optional[int]:
+    """
+    ============
+    Function: resolve_after_id
+    ------------
+    DESCRIPTION: Snowflake to resume a channel's history from: the job's `after` bound if any (snowflake, or ISO date translated into one), nothing for full backfills and `before`-only windows, otherwise the channel's high-water mark (delta mode, the default).
     PARAMS:
-    - db: MongoDB database instance
-    - messages: List[dict] of messages to check
-    RETURNS: List[dict] of messages not yet in the database
+    - job (dict): discord_harvest_jobs document
+    - channel_id (int): Channel snowflake
+    RETURNS: int or None to read the history from the beginning
     ============
     """
-    if not messages:
-        return []
-    ids = [msg["id"] for msg in messages]
-    existing_ids = set(
-        doc["_id"] for doc in db.discord_messages.find({"_id": {"$in": ids}}, {"_id": 1})
-    )
-    return [msg for msg in messages if msg["id"] not in existing_ids]
+    if job.get("after"):
+        return after_snowflake(job["after"])
+    if job.get("full_backfill") or is_windowed(job):
+        return None
+    return await storage.get_channel_high_water_mark(channel_id)
 
-async def poll_jobs():
-    await client.wait_until_ready()
-    print("[Daemon] Polling jobs started.")
+async def harvest_channel(job: dict, ch: "nextcord.TextChannel", semaphore: asyncio.Semaphore) -> int:
+    """
+    ============
+    Function: harvest_channel
+    ------------
+    DESCRIPTION: Stream one channel's history for a job (within the job's channel concurrency limit) and store it every HARVEST_BATCH_SIZE messages, advancing the job's progress and the channel's high-water mark.
+    PARAMS:
+    - job (dict): discord_harvest_jobs document (after/before bounds)
+    - ch (nextcord.TextChannel): Channel to harvest
+    - semaphore (asyncio.Semaphore): Limits concurrent channel fetches of the job
+    RETURNS: int - number of inserted messages
+    ============
+    """
+    inserted = 0
+    stats = StreamStats(ch.id)
+    async with semaphore:
+        after_id = await resolve_after_id(job, ch.id)
+        before_id = before_snowflake(job.get("before"))
+        batches = stream_batches(
+            ch, BATCH_SIZE, after_id=after_id, before_id=before_id, stats=stats,
+            history=history_client, priority=job_priority(job)
+        )
+        async for batch in batches:
+            last_id = batch[-1].id
+            # Les doublons (déjà stockés) sont ignorés par l'insertion
+            MESSAGES_FETCHED.inc(len(batch))
+            counts = await storage.save_discord_messages(batch)
+            MESSAGES_INSERTED.inc(counts["inserted"])
+            # Only an unbounded harvest has read everything up to this message
+            if not is_windowed(job):
+                await storage.advance_channel_high_water_mark(ch.id, last_id)
+                live.add_channels([ch.id])
+            await storage.record_harvest_progress(job["_id"], fetched=len(batch), inserted=counts["inserted"])
+            inserted += counts["inserted"]
+    print(f"[Daemon] Job {job['_id']} - {stats.summary()}, {inserted} new (after {after_id}).")
+    return inserted
+
+def job_priority(job: dict) -> int:
+    # Full backfills page whole histories: they only get the slots other jobs leave
+    return 1 if job.get("full_backfill") else 0
+
+def queue_wait_of(job: dict) -> float:
+    return (job["started_at"] - job["created_at"]).total_seconds()
+
+async def process_job(job: dict, worker_name: str) -> Tuple[bool, int]:
+    """
+    ============
+    Function: process_job
+    ------------
+    DESCRIPTION: Harvest the channels of one job and record its outcome (done with inserted count, or failed with error) on the job document, unless the lease was lost meanwhile.
+    PARAMS:
+    - job (dict): discord_harvest_jobs document, already claimed
+    - worker_name (str): Lease owner, for fenced status updates
+    RETURNS: Tuple[bool, int] - (success, number of inserted messages)
+    ============
+    """
+    started = time.monotonic()
+    timings = {"queue_wait_seconds": queue_wait_of(job)}
+    try:
+        # 1. Fetch guild and channels info
+        guild = client.get_guild(job["serverId"])
+        if not guild:
+            raise ValueError(f"Guild {job['serverId']} not found or bot not a member.")
+        channels = [ch for ch in guild.text_channels if ch.id in job["channels"]]
+        # 2. Add server/channel if not present
+        await storage.ensure_discord_server_and_channels(
+            {'_id': job["serverId"], 'user_id': int(job["discordId"]), 'name': guild.name},
+            [{'_id': ch.id, 'name': ch.name, 'server_id': job["serverId"]} for ch in channels]
+        )
+        # 3. Fetch and store each channel concurrently (rate-limit buckets are per channel)
+        semaphore = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+        results = await asyncio.gather(
+            *(harvest_channel(job, ch, semaphore) for ch in channels),
+            return_exceptions=True
+        )
+        inserted = sum(r for r in results if not isinstance(r, BaseException))
+        errors = [f"channel {ch.id}: {r}" for ch, r in zip(channels, results) if isinstance(r, BaseException)]
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        # 4. Update job as done
+        owned = await storage.update_job_status(
+            job["_id"],
+            "done",
+            worker=worker_name,
+            finished_at=datetime.utcnow(),
+            inserted=inserted,
+            duration_seconds=time.monotonic() - started,
+            **timings
+        )
+        if not owned:
+            print(f"Job {job['_id']} finished after its lease was lost: outcome not recorded.")
+        print(f"Job {job['_id']} done: {inserted} new messages.")
+        return True, inserted
+    except Exception as e:
+        # Batches stored before the failure are kept: report them from the job's progress
+        inserted = (await storage.get_harvest_job_progress(job["_id"])).get("inserted", 0)
+        await storage.update_job_status(
+            job["_id"],
+            "failed",
+            worker=worker_name,
+            finished_at=datetime.utcnow(),
+            error=str(e),
+            inserted=inserted,
+            duration_seconds=time.monotonic() - started,
+            **timings
+        )
+        print(f"Job {job['_id']} failed: {e}")
+        return False, inserted
+
+async def keep_lease(job_id, worker_name: str, job_task: asyncio.Task) -> None:
+    """
+    ============
+    Function: keep_lease
+    ------------
+    DESCRIPTION: Heartbeat of a running job: renew its lease every third of HARVEST_LEASE_SECONDS. If the lease was lost (reclaimed by another daemon after a stall), cancel the job so that only one worker harvests it.
+    PARAMS:
+    - job_id: The ObjectId of the job
+    - worker_name (str): Lease owner
+    - job_task (asyncio.Task): Task running process_job
+    RETURNS: None
+    ============
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            owned = await storage.renew_harvest_job_lease(job_id, worker_name, LEASE_SECONDS)
+        except PyMongoError as e:
+            # Transient: retry at the next beat, the lease has some slack left
+            print(f"[Daemon] Lease renewal of job {job_id} failed: {e}")
+            continue
+        if not owned:
+            print(f"[Daemon] Lease of job {job_id} lost: cancelling it.")
+            job_task.cancel()
+            return
+
+async def reap_expired_jobs() -> None:
+    """
+    ============
+    Function: reap_expired_jobs
+    ------------
+    DESCRIPTION: Every HARVEST_LEASE_SECONDS, fail the jobs whose lease expired HARVEST_MAX_ATTEMPTS times, and wake idle workers so that other expired leases are reclaimed without waiting for a new job.
+    PARAMS: None
+    RETURNS: None
+    ============
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS)
+        try:
+            failed = await storage.fail_exhausted_harvest_jobs(MAX_ATTEMPTS)
+        except PyMongoError as e:
+            print(f"[Daemon] Expired job sweep failed: {e}")
+            continue
+        if failed:
+            print(f"[Daemon] {failed} job(s) failed after {MAX_ATTEMPTS} expired leases.")
+        notifier.notify()
+
+async def worker(worker_id: int) -> None:
+    """
+    ============
+    Function: worker
+    ------------
+    DESCRIPTION: Claim and run pending harvest jobs (FIFO, skipping busy guilds) until the client closes, reporting queue wait and throughput after each job. Failed claims are retried with backoff. When idle, waits for the job notifier (change stream), or polls with exponential backoff if change streams are unavailable.
+    PARAMS: worker_id (int) - index in the pool
+    RETURNS: None
+    ============
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}/{worker_id}"
+    stats = worker_stats[worker_id] = WorkerStats(worker_id)
+    idle_delay = POLL_MIN_INTERVAL
     while not client.is_closed():
-        job = storage.get_next_pending_job()
+        # Cleared before claiming: a job inserted from now on wakes the wait below
+        notifier.clear()
+        # The per-guild limit is checked in Mongo, across every daemon replica; claims of this daemon are
+        # serialized so that its own workers never race for the last slot of a guild
+        try:
+            async with claim_lock:
+                job = await storage.get_next_pending_job(
+                    worker=name,
+                    lease_seconds=LEASE_SECONDS,
+                    max_attempts=MAX_ATTEMPTS,
+                    per_server_limit=PER_GUILD_LIMIT
+                )
+        except PyMongoError as e:
+            # Transient: back off and claim again, the other workers and tasks keep running
+            print(f"[Daemon] Worker {worker_id}: job claim failed: {e}")
+            await asyncio.sleep(idle_delay)
+            idle_delay = min(idle_delay * 2, POLL_MAX_INTERVAL)
+            continue
         if not job:
-            await asyncio.sleep(2)
+            if notifier.available:
+                await notifier.wait(WATCH_RECHECK_INTERVAL)
+            else:
+                await notifier.wait(idle_delay)
+                idle_delay = min(idle_delay * 2, POLL_MAX_INTERVAL)
             continue
-        print(f"[Daemon] Nouveau job à traiter : {job}")
+        idle_delay = POLL_MIN_INTERVAL
+        queue_wait = queue_wait_of(job)
+        HARVEST_QUEUE_WAIT.observe(queue_wait)
+        print(f"[Daemon] Worker {worker_id} - nouveau job à traiter : {job['_id']} (guild {job['serverId']}, attempt {job['attempts']}, queued {queue_wait:.1f}s)")
+        started = time.monotonic()
+        job_task = asyncio.create_task(process_job(job, name))
+        lease_task = asyncio.create_task(keep_lease(job["_id"], name, job_task))
+        status = "failed"
         try:
-            # 1. Fetch guild and channels info
-            guild = client.get_guild(job["serverId"])
-            if not guild:
-                raise ValueError(f"Guild {job['serverId']} not found or bot not a member.")
-            channels = [ch for ch in guild.text_channels if ch.id in job["channels"]]
-            # 2. Add server/channel if not present
-            if not storage.db.discord_servers.find_one({'_id': job["serverId"]}):
-                storage.add_discord_server({'_id': job["serverId"], 'user_id': int(job["discordId"]), 'name': guild.name})
-            for ch in channels:
-                if not storage.db.discord_channels.find_one({'_id': ch.id}):
-                    storage.add_discord_channel({'_id': ch.id, 'name': ch.name, 'server_id': job["serverId"]})
-            # 3. Fetch messages for each channel
-            all_messages = []
-            for ch in channels:
-                after_id = None
-                if job.get("after") and str(job["after"]).isdigit():
-                    after_id = int(job["after"])
-                history_kwargs = {"limit": None, "oldest_first": True}
-                if after_id:
-                    history_kwargs["after"] = nextcord.Object(id=after_id)
-                messages = []
-                async for msg in ch.history(**history_kwargs):
-                    text = msg.content or ""
-                    if msg.attachments:
-                        text += " [Attachments: " + ", ".join(a.url for a in msg.attachments) + "]"
-                    if msg.embeds:
-                        text += " [Embeds present]"
-                    parent_id = msg.reference.message_id if msg.reference else None
-                    if not text.strip():
-                        continue
-                    messages.append({
-                        "id": int(msg.id),
-                        "channel_id": int(ch.id),
-                        "parent_message_id": int(parent_id) if parent_id else None,
-                        "author_name": getattr(msg.author, 'display_name', msg.author.name),
-                        "author_user_id": int(msg.author.id),
-                        "content": text,
-                        "created_at": msg.created_at,
-                        "fetched_at": datetime.utcnow(),
-                    })
-                # Filtrage after/before par date si besoin
-                if job.get("after") and not str(job["after"]).isdigit():
-                    after_dt = datetime.fromisoformat(job["after"])
-                    messages = [m for m in messages if m['created_at'] >= after_dt]
-                if job.get("before"):
-                    before_dt = datetime.fromisoformat(job["before"])
-                    messages = [m for m in messages if m['created_at'] <= before_dt]
-                all_messages.extend(messages)
-            # 4. Filtrer et insérer uniquement les nouveaux messages
-            new_messages = filter_new_messages(storage.db, all_messages)
-            storage.save_discord_messages(new_messages)
-            # 5. Update job as done
-            storage.update_job_status(
-                job["_id"],
-                "done",
-                finished_at=datetime.utcnow(),
-                inserted=len(new_messages)
-            )
-            print(f"Job {job['_id']} done: {len(new_messages)} new messages.")
-        except Exception as e:
-            storage.update_job_status(
-                job["_id"],
-                "failed",
-                finished_at=datetime.utcnow(),
-                error=str(e)
-            )
-            print(f"Job {job['_id']} failed: {e}")
+            ok, inserted = await job_task
+            status = "done" if ok else "failed"
+        except asyncio.CancelledError:
+            # Re-raise if the worker itself is being cancelled, not just the job (lease lost)
+            if asyncio.current_task().cancelling() or not job_task.cancelled():
+                raise
+            ok, inserted, status = False, 0, "lease_lost"
+        finally:
+            lease_task.cancel()
+            # Jobs of this guild skipped while it was busy can now be claimed
+            notifier.notify()
+        duration = time.monotonic() - started
+        stats.record(queue_wait, duration, inserted, ok)
+        HARVEST_JOBS.labels(status=status).inc()
+        HARVEST_JOB_DURATION.labels(status=status).observe(duration)
+        print(f"[Daemon] Worker {worker_id}: {stats.summary()}")
+        if history_client is not None:
+            print(f"[Daemon] Rate limits: {history_client.scheduler.stats.summary()}")
+
+async def poll_jobs():
+    await client.wait_until_ready()
+    print(f"[Daemon] Polling jobs started: {WORKERS} workers, {PER_GUILD_LIMIT} job(s) per guild.")
+    notifier.start()
+    lag_monitor = asyncio.create_task(loop_lag.run())
+    reaper = asyncio.create_task(reap_expired_jobs())
+    ingestor = asyncio.create_task(live.run()) if LIVE_INGESTION else None
+    try:
+        await asyncio.gather(*(worker(i) for i in range(WORKERS)))
+    finally:
+        lag_monitor.cancel()
+        reaper.cancel()
+        if ingestor is not None:
+            ingestor.cancel()
+            await live.flush()
+        if history_client is not None:
+            await history_client.close()
+        notifier.stop()
 
 @client.event
 async def on_ready():
+    global poller
     print(f"[Discord Harvester Daemon] Bot connecté en tant que {client.user}")
-    client.loop.create_task(poll_jobs())
+    # on_ready fires again after a session re-identify: start the pool only once
+    if poller is None:
+        poller = client.loop.create_task(poll_jobs())
+
+if LIVE_INGESTION:
+    @client.event
+    async def on_message(message: nextcord.Message):
+        live.created(message)
+
+    # Raw events: on_message_edit/on_message_delete only fire for messages still in nextcord's cache
+    @client.event
+    async def on_raw_message_edit(payload: nextcord.RawMessageUpdateEvent):
+        live.edited(payload.channel_id, payload.message_id, payload.data)
+
+    @client.event
+    async def on_raw_message_delete(payload: nextcord.RawMessageDeleteEvent):
+        live.deleted(payload.channel_id, [payload.message_id])
+
+    @client.event
+    async def on_raw_bulk_message_delete(payload: nextcord.RawBulkMessageDeleteEvent):
+        live.deleted(payload.channel_id, payload.message_ids)
 
 if __name__ == "__main__":
+    track_queue_depth(HARVEST_QUEUE_DEPTH, storage.sync.count_pending_harvest_jobs)
+    start_metrics_server('HARVEST_METRICS_PORT', 9101)
     client.run(token)
\ No newline at end of file
@@ -0,0 +1,290 @@
+"""
+Module: discord_http.py
+---------------------------
+DESCRIPTION: Rate-limit-aware Discord REST access for history paging: RateLimitScheduler grants request slots per route bucket by priority, and DiscordHistoryClient pages GET /channels/{id}/messages through it.
+Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+import aiohttp
+from config.config import get_env_var
+from config.metrics import RATE_LIMIT_WAIT, RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISCORD_API_URL = 'https://discord.com/api/v10'
+# Messages per history page (Discord maximum)
+PAGE_SIZE = 100
+
+class RateLimitStats:
+    """
+    ============
+    Class: RateLimitStats
+    ------------
+    DESCRIPTION: Counters of a scheduler: requests sent, requests delayed by a rate limit and total delay, 429 responses (per bucket and global).
+    ============
+    """
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+        self.global_rate_limited = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} requests, {self.throttled} throttled ({self.throttled_seconds:.1f}s), "
+            f"{self.rate_limited} 429s ({self.global_rate_limited} global)"
+        )
+
+class Bucket:
+    """
+    ============
+    Class: Bucket
+    ------------
+    DESCRIPTION: State of one rate-limit bucket, from the last response headers. Until a first response, one request at a time is let through to learn the limit.
+    ============
+    """
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.limit = 1
+        self.remaining = 1
+        self.reset_at = 0.0
+        self.in_flight = 0
+        self.waiters: List[tuple] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class RateLimitScheduler:
+    """
+    ============
+    Class: RateLimitScheduler
+    ------------
+    DESCRIPTION: Grants request slots per route bucket: as many concurrent requests as the bucket has remaining, the others waiting in priority order (lower first, then FIFO) until the bucket resets. Requests are also paced under the global limit, and a global 429 pauses every route.
+    PARAMS: global_rate (float|None) - Max requests per second overall (default env DISCORD_GLOBAL_RATE, 45: under Discord's 50 to absorb jitter)
+    ============
+    """
+    def __init__(self, global_rate: Optional[float] = None):
+        self.global_interval = 1.0 / float(global_rate or get_env_var('DISCORD_GLOBAL_RATE', '45'))
+        self.buckets: Dict[str, Bucket] = {}
+        self.stats = RateLimitStats()
+        self._next_global = 0.0
+        self._global_blocked_until = 0.0
+        self._global_waiters: List[tuple] = []
+        self._global_timer: Optional[asyncio.TimerHandle] = None
+        self._sequence = itertools.count()
+
+    async def acquire(self, route: str, priority: int = 0) -> None:
+        """
+        ============
+        Function: acquire
+        ------------
+        DESCRIPTION: Wait for a request slot on a route. Every acquire must be followed by release() with the response.
+        PARAMS:
+        - route (str): Rate-limit route, e.g. "GET /channels/123/messages" (major parameter included)
+        - priority (int): Lower is served first among the waiters of a bucket
+        RETURNS: None
+        ============
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        bucket = self.buckets.setdefault(route, Bucket())
+        ticket = loop.create_future()
+        heapq.heappush(bucket.waiters, (priority, next(self._sequence), ticket))
+        self._dispatch(bucket)
+        try:
+            await ticket
+            # Global pacing (also by priority), and pause after a global 429
+            global_ticket = loop.create_future()
+            heapq.heappush(self._global_waiters, (priority, next(self._sequence), global_ticket))
+            self._dispatch_global()
+            await global_ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                # Granted meanwhile: give the slot back
+                bucket.in_flight -= 1
+                self._dispatch(bucket)
+            raise
+        waited = loop.time() - started
+        RATE_LIMIT_WAIT.observe(waited)
+        self.stats.requests += 1
+        # Beyond the global pacing interval, the request was held back by a rate limit
+        if waited > self.global_interval:
+            self.stats.throttled += 1
+            self.stats.throttled_seconds += waited
+
+    def release(self, route: str, status: int, headers: Any, retry_after: Optional[float] = None) -> None:
+        """
+        ============
+        Function: release
+        ------------
+        DESCRIPTION: Free the slot of a finished request and update its bucket from the rate-limit headers (X-RateLimit-Limit, -Remaining, -Reset-After, -Bucket, -Scope). A 429 empties the bucket until retry_after, or pauses every route if global.
+        PARAMS:
+        - route (str): Route given to acquire()
+        - status (int): HTTP status (0 if the request failed without response)
+        - headers (Mapping): Response headers
+        - retry_after (float|None): retry_after of a 429 body
+        RETURNS: None
+        ============
+        """
+        now = asyncio.get_running_loop().time()
+        bucket = self.buckets[route]
+        bucket.in_flight -= 1
+        if 'X-RateLimit-Limit' in headers:
+            bucket.name = headers.get('X-RateLimit-Bucket', bucket.name)
+            bucket.limit = int(headers['X-RateLimit-Limit'])
+            bucket.remaining = int(headers.get('X-RateLimit-Remaining', bucket.remaining))
+            bucket.reset_at = now + float(headers.get('X-RateLimit-Reset-After', 0))
+        if status == 429:
+            delay = float(retry_after if retry_after is not None else headers.get('Retry-After', 1))
+            self.stats.rate_limited += 1
+            if headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global':
+                self.stats.global_rate_limited += 1
+                RATE_LIMITED.labels(scope='global').inc()
+                self._global_blocked_until = max(self._global_blocked_until, now + delay)
+                logger.warning("Globally rate limited on %s, pausing every route for %.2fs", route, delay)
+            else:
+                RATE_LIMITED.labels(scope='bucket').inc()
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + delay)
+                logger.warning("Rate limited on %s (bucket %s), retrying in %.2fs", route, bucket.name, delay)
+        self._dispatch(bucket)
+
+    def _dispatch_global(self) -> None:
+        """Grant the global slot to the best waiter if the pacing interval has elapsed, else schedule the next grant."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if now >= max(self._next_global, self._global_blocked_until):
+            while self._global_waiters:
+                _, _, ticket = heapq.heappop(self._global_waiters)
+                if not ticket.cancelled():
+                    ticket.set_result(None)
+                    self._next_global = now + self.global_interval
+                    break
+        if self._global_waiters and self._global_timer is None:
+            def next_slot():
+                self._global_timer = None
+                self._dispatch_global()
+            self._global_timer = loop.call_at(max(self._next_global, self._global_blocked_until), next_slot)
+
+    def _dispatch(self, bucket: Bucket) -> None:
+        """Grant free slots of a bucket to its best waiters, or schedule a retry at its reset."""
+        loop = asyncio.get_running_loop()
+        if loop.time() >= bucket.reset_at and bucket.remaining < bucket.limit:
+            bucket.remaining = bucket.limit
+        while bucket.waiters and bucket.remaining - bucket.in_flight > 0:
+            _, _, ticket = heapq.heappop(bucket.waiters)
+            if ticket.cancelled():
+                continue
+            bucket.in_flight += 1
+            ticket.set_result(None)
+        if bucket.waiters and bucket.in_flight == 0 and bucket.timer is None:
+            # Depleted: nothing in flight will wake the waiters, the reset will
+            def reset():
+                bucket.timer = None
+                self._dispatch(bucket)
+            bucket.timer = loop.call_at(bucket.reset_at, reset)
+
+class DiscordHistoryClient:
+    """
+    ============
+    Class: DiscordHistoryClient
+    ------------
+    DESCRIPTION: Pages channel histories from the Discord REST API through a RateLimitScheduler, on one pooled aiohttp session (opened lazily per event loop).
+    PARAMS:
+    - token (str|None): Bot token (default env DISCORD_BOT_TOKEN)
+    - base_url (str|None): API root (default env DISCORD_API_BASE_URL, https://discord.com/api/v10)
+    - scheduler (RateLimitScheduler|None): Shared scheduler (default: a new one)
+    ============
+    """
+    def __init__(self, token: Optional[str] = None, base_url: Optional[str] = None, scheduler: Optional[RateLimitScheduler] = None):
+        self.token = token or get_env_var('DISCORD_BOT_TOKEN')
+        self.base_url = (base_url or get_env_var('DISCORD_API_BASE_URL', DEFAULT_DISCORD_API_URL)).rstrip('/')
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.timeout = float(get_env_var('DISCORD_HTTP_TIMEOUT', '30'))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=60, ttl_dns_cache=300),
+                headers={'Authorization': f'Bot {self.token}'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+        return self._session
+
+    async def get(self, path: str, params: Optional[dict] = None, priority: int = 0) -> Any:
+        """
+        ============
+        Function: get
+        ------------
+        DESCRIPTION: GET an API path once a scheduler slot is granted, retrying after 429s.
+        PARAMS:
+        - path (str): Path under the API root, e.g. /channels/123/messages (also the rate-limit route)
+        - params (dict|None): Query string
+        - priority (int): Scheduling priority, lower first
+        RETURNS: Parsed JSON body (RuntimeError on any other error status)
+        ============
+        """
+        route = f"GET {path}"
+        while True:
+            await self.scheduler.acquire(route, priority)
+            status, headers, retry_after = 0, {}, None
+            try:
+                async with self._get_session().get(self.base_url + path, params=params) as response:
+                    status, headers = response.status, response.headers
+                    if status == 429:
+                        retry_after = (await response.json(content_type=None)).get('retry_after')
+                        continue
+                    if status != 200:
+                        raise RuntimeError(f"Discord API error: {status} - {await response.text()}")
+                    return await response.json(content_type=None)
+            finally:
+                self.scheduler.release(route, status, headers, retry_after)
+
+    async def history_pages(
+        self,
+        channel_id: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        priority: int = 0,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        ============
+        Function: history_pages
+        ------------
+        DESCRIPTION: Page a channel's history *after* `after_id`, oldest first, 100 messages per request, until the newest message or `before_id` (Snowflakes, exclusive). Pages are raw API message objects, sorted oldest first.
+        PARAMS:
+        - channel_id (int): Channel ID
+        - after_id (int|None): Snowflake lower bound (None: from the beginning)
+        - before_id (int|None): Snowflake upper bound
+        - priority (int): Scheduling priority of the requests, lower first
+        RETURNS: AsyncIterator[List[dict]]
+        ============
+        """
+        cursor = after_id or 0
+        while True:
+            page = await self.get(
+                f"/channels/{channel_id}/messages",
+                params={'after': str(cursor), 'limit': str(PAGE_SIZE)},
+                priority=priority
+            )
+            if not page:
+                return
+            page.sort(key=lambda data: int(data['id']))
+            yield page
+            cursor = int(page[-1]['id'])
+            if len(page) < PAGE_SIZE or (before_id is not None and cursor >= before_id):
+                return
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
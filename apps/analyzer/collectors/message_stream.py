@@ -0,0 +1,327 @@
+"""
+Module: message_stream.py
+---------------------------
+DESCRIPTION: Message extraction engine shared by the collector, the harvester daemon and the CLI: streams a text channel's history oldest first as compact message records.
+Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only.
+"""
+
+import sys
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import AsyncIterator, List, Optional, TypeVar
+import nextcord
+from collectors.discord_http import DiscordHistoryClient
+
+T = TypeVar("T")
+
+def to_utc(dt: datetime) -> datetime:
+    """
+    ============
+    Function: to_utc
+    ------------
+    DESCRIPTION: Make a datetime timezone-aware, treating naive values as UTC (the harvest API contract) rather than local time.
+    PARAMS: dt (datetime)
+    RETURNS: datetime (aware, UTC)
+    ============
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def after_snowflake(value: Optional[str]) -> Optional[int]:
+    """
+    ============
+    Function: after_snowflake
+    ------------
+    DESCRIPTION: Translate an `after` bound (snowflake ID or ISO timestamp) into the exclusive snowflake to pass to channel.history, so Discord starts paging at the bound. ISO bounds are inclusive.
+    PARAMS: value (str|None) - Snowflake ID or ISO timestamp
+    RETURNS: int or None
+    ============
+    """
+    if not value:
+        return None
+    if str(value).isdigit():
+        return int(value)
+    return nextcord.utils.time_snowflake(to_utc(datetime.fromisoformat(value)), high=False) - 1
+
+def before_snowflake(value: Optional[str]) -> Optional[int]:
+    """
+    ============
+    Function: before_snowflake
+    ------------
+    DESCRIPTION: Translate a `before` bound (snowflake ID or ISO timestamp) into an exclusive snowflake upper bound. ISO bounds are inclusive.
+    PARAMS: value (str|None) - Snowflake ID or ISO timestamp
+    RETURNS: int or None
+    ============
+    """
+    if not value:
+        return None
+    if str(value).isdigit():
+        return int(value)
+    return nextcord.utils.time_snowflake(to_utc(datetime.fromisoformat(value)), high=True) + 1
+
+def message_text(content: Optional[str], attachment_urls: List[str], has_embeds: bool) -> str:
+    """
+    ============
+    Function: message_text
+    ------------
+    DESCRIPTION: Stored text of a message: its content, with attachments and embeds appended inline.
+    PARAMS:
+    - content (str|None): Message content
+    - attachment_urls (List[str]): Attachment URLs
+    - has_embeds (bool): Whether the message has embeds
+    RETURNS: str
+    ============
+    """
+    text = content or ""
+    if attachment_urls:
+        text += " [Attachments: " + ", ".join(attachment_urls) + "]"
+    if has_embeds:
+        text += " [Embeds present]"
+    return text
+
+class MessageRecord:
+    """
+    ============
+    Class: MessageRecord
+    ------------
+    DESCRIPTION: One collected message, as a slotted object of ints and strings so long histories stay small in memory. Converted to a discord_messages document by storage.mongo_storage.to_message_doc.
+    PARAMS:
+    - id (int): Message snowflake
+    - channel_id (int): Channel snowflake
+    - parent_message_id (int|None): Snowflake of the replied message
+    - author_user_id (int): Author snowflake
+    - author_name (str): Author display name
+    - content (str): Text, attachments and embeds appended inline
+    - server_id (int|None): Guild snowflake
+    ============
+    """
+    __slots__ = ("id", "channel_id", "parent_message_id", "author_user_id", "author_name", "content", "server_id")
+
+    def __init__(self, id: int, channel_id: int, parent_message_id: Optional[int], author_user_id: int, author_name: str, content: str, server_id: Optional[int] = None):
+        self.id = id
+        self.channel_id = channel_id
+        self.parent_message_id = parent_message_id
+        self.author_user_id = author_user_id
+        self.author_name = sys.intern(author_name)
+        self.content = content
+        self.server_id = server_id
+
+    @property
+    def created_at(self) -> datetime:
+        # Original timestamp (UTC), encoded in the snowflake
+        return nextcord.utils.snowflake_time(self.id)
+
+    def __repr__(self) -> str:
+        return f"MessageRecord(id={self.id}, channel_id={self.channel_id}, author_name={self.author_name!r})"
+
+def to_message_record(msg: nextcord.Message) -> Optional[MessageRecord]:
+    """
+    ============
+    Function: to_message_record
+    ------------
+    DESCRIPTION: Convert a nextcord message (from history or a gateway event) into a MessageRecord.
+    PARAMS: msg (nextcord.Message)
+    RETURNS: MessageRecord, or None if the message has no text, attachment or embed
+    ============
+    """
+    text = message_text(msg.content, [a.url for a in msg.attachments], bool(msg.embeds))
+    # Drop messages with empty content after attachments/embeds
+    if not text.strip():
+        return None
+    parent_id = msg.reference.message_id if msg.reference else None
+    return MessageRecord(
+        int(msg.id),
+        int(msg.channel.id),
+        int(parent_id) if parent_id else None,
+        int(msg.author.id),
+        getattr(msg.author, 'display_name', msg.author.name),
+        text,
+        int(msg.guild.id) if msg.guild else None,
+    )
+
+def raw_message_record(data: dict, server_id: Optional[int] = None) -> Optional[MessageRecord]:
+    """
+    ============
+    Function: raw_message_record
+    ------------
+    DESCRIPTION: Convert a raw API message object (REST history page) into a MessageRecord.
+    PARAMS:
+    - data (dict): Discord message object
+    - server_id (int|None): Guild of the channel (history pages do not carry it)
+    RETURNS: MessageRecord, or None if the message has no text, attachment or embed
+    ============
+    """
+    text = message_text(data.get("content"), [a["url"] for a in data.get("attachments", [])], bool(data.get("embeds")))
+    if not text.strip():
+        return None
+    author = data["author"]
+    parent_id = (data.get("message_reference") or {}).get("message_id")
+    return MessageRecord(
+        int(data["id"]),
+        int(data["channel_id"]),
+        int(parent_id) if parent_id else None,
+        int(author["id"]),
+        author.get("global_name") or author["username"],
+        text,
+        server_id,
+    )
+
+async def batched(items: AsyncIterator[T], size: int) -> AsyncIterator[List[T]]:
+    """
+    ============
+    Function: batched
+    ------------
+    DESCRIPTION: Group an async stream into lists of at most `size` items, yielded as soon as they are full (the last one may be shorter).
+    PARAMS:
+    - items (AsyncIterator): Source stream
+    - size (int): Max items per batch
+    RETURNS: AsyncIterator[List]
+    ============
+    """
+    batch: List[T] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StreamStats:
+    """
+    ============
+    Class: StreamStats
+    ------------
+    DESCRIPTION: Metrics of one channel stream, updated while it is consumed: messages yielded, messages skipped (no text, attachment or embed), batches and elapsed time.
+    PARAMS: channel_id (int) - Streamed channel
+    ============
+    """
+    def __init__(self, channel_id: int):
+        self.channel_id = channel_id
+        self.messages = 0
+        self.skipped = 0
+        self.batches = 0
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> str:
+        rate = self.messages / self.elapsed if self.elapsed else 0.0
+        return (
+            f"channel {self.channel_id}: {self.messages} messages ({self.skipped} skipped) "
+            f"in {self.batches} batches, {self.elapsed:.1f}s, {rate:.1f} msg/s"
+        )
+
+def readable_text_channel(guild: nextcord.Guild, channel_id: int) -> nextcord.TextChannel:
+    """
+    ============
+    Function: readable_text_channel
+    ------------
+    DESCRIPTION: Get a text channel of a guild whose history the bot can read.
+    PARAMS:
+    - guild (nextcord.Guild): Guild of the channel
+    - channel_id (int): Channel ID
+    RETURNS: nextcord.TextChannel (ValueError if it is not a text channel or its history cannot be read)
+    ============
+    """
+    channel = guild.get_channel(channel_id)
+    if not isinstance(channel, nextcord.TextChannel):
+        raise ValueError(f"Channel {channel_id} is not a text channel")
+    perms = channel.permissions_for(guild.me)
+    if not (perms.read_messages and perms.read_message_history):
+        raise ValueError(f"Missing permissions on channel {channel_id}")
+    return channel
+
+async def _history_items(
+    channel: nextcord.TextChannel,
+    after_id: Optional[int],
+    before_id: Optional[int],
+    history: Optional[DiscordHistoryClient],
+    priority: int,
+) -> AsyncIterator[tuple]:
+    """Raw history items, oldest first, as (snowflake, item, converter to a MessageRecord)."""
+    if history is not None:
+        convert = partial(raw_message_record, server_id=channel.guild.id)
+        async for page in history.history_pages(channel.id, after_id=after_id, before_id=before_id, priority=priority):
+            for data in page:
+                yield int(data["id"]), data, convert
+        return
+    history_kwargs = {"limit": None, "oldest_first": True}
+    if after_id is not None:
+        history_kwargs["after"] = nextcord.Object(id=after_id)
+    # Not passed as before=: oldest-first paging only filters it client-side and would page on to the
+    # newest message. stream_messages stops at the bound, which ends the paging.
+    async for msg in channel.history(**history_kwargs):
+        yield msg.id, msg, to_message_record
+
+async def stream_messages(
+    channel: nextcord.TextChannel,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    stats: Optional[StreamStats] = None,
+    history: Optional[DiscordHistoryClient] = None,
+    priority: int = 0,
+) -> AsyncIterator[MessageRecord]:
+    """
+    ============
+    Function: stream_messages
+    ------------
+    DESCRIPTION: Stream the messages of a channel *after* `after_id` and *before* `before_id` (Snowflakes, exclusive), oldest first, skipping messages without text, attachment or embed.
+    PARAMS:
+    - channel (nextcord.TextChannel): Channel to read (see readable_text_channel)
+    - after_id (int | None): Snowflake lower bound, e.g. last stored message (see after_snowflake for dates)
+    - before_id (int | None): Snowflake upper bound (see before_snowflake for dates)
+    - stats (StreamStats | None): Metrics to update
+    - history (DiscordHistoryClient | None): Scheduled REST pager to use instead of nextcord
+    - priority (int): Scheduling priority of the page requests with `history`, lower first
+    RETURNS: AsyncIterator[MessageRecord]
+    ============
+    """
+    stats = stats or StreamStats(channel.id)
+    try:
+        async for msg_id, msg, convert in _history_items(channel, after_id, before_id, history, priority):
+            if before_id is not None and msg_id >= before_id:
+                break
+            message = convert(msg)
+            if message is None:
+                stats.skipped += 1
+                continue
+            stats.messages += 1
+            yield message
+    finally:
+        stats.finished = time.monotonic()
+
+async def stream_batches(
+    channel: nextcord.TextChannel,
+    batch_size: int,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    stats: Optional[StreamStats] = None,
+    history: Optional[DiscordHistoryClient] = None,
+    priority: int = 0,
+) -> AsyncIterator[List[MessageRecord]]:
+    """
+    ============
+    Function: stream_batches
+    ------------
+    DESCRIPTION: stream_messages grouped into lists of at most `batch_size` messages, yielded as soon as they are full, e.g. to store a long history with flat memory.
+    PARAMS:
+    - channel (nextcord.TextChannel): Channel to read
+    - batch_size (int): Max messages per batch
+    - after_id, before_id (int | None): Snowflake bounds (exclusive)
+    - stats (StreamStats | None): Metrics to update
+    - history, priority: See stream_messages
+    RETURNS: AsyncIterator[List[MessageRecord]]
+    ============
+    """
+    stats = stats or StreamStats(channel.id)
+    messages = stream_messages(channel, after_id=after_id, before_id=before_id, stats=stats, history=history, priority=priority)
+    async for batch in batched(messages, batch_size):
+        stats.batches += 1
+        yield batch
@@ -0,0 +1,93 @@
+"""
+Module: metrics.py
+------------------------
+DESCRIPTION: Prometheus metrics of the analyzer processes (harvest, storage, LLM, caches). Each process exposes its
+own registry: the API on GET /metrics, the harvester daemon and the analysis worker on a sidecar HTTP port
+(start_metrics_server). Throughputs are counters (use rate() for per-second values), latencies and waits are histograms.
+"""
+
+import logging
+import math
+from typing import Callable
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from config.config import get_env_var
+
+logger = logging.getLogger(__name__)
+
+# Bucket sets (seconds)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+QUEUE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# ===== Harvest =====
+MESSAGES_FETCHED = Counter('harvest_messages_fetched_total', 'Messages read from Discord channel histories')
+MESSAGES_INSERTED = Counter('harvest_messages_inserted_total', 'Harvested messages newly stored (duplicates excluded)')
+LIVE_MESSAGES = Counter('live_ingestion_changes_total', 'Gateway message changes written by live ingestion', ['change'])
+HARVEST_JOBS = Counter('harvest_jobs_total', 'Finished harvest jobs', ['status'])
+HARVEST_QUEUE_DEPTH = Gauge('harvest_jobs_pending', 'Pending harvest jobs')
+HARVEST_QUEUE_WAIT = Histogram('harvest_job_queue_wait_seconds', 'Time a harvest job waited before being claimed', buckets=QUEUE_BUCKETS)
+HARVEST_JOB_DURATION = Histogram('harvest_job_duration_seconds', 'Run time of harvest jobs', ['status'], buckets=QUEUE_BUCKETS)
+EVENT_LOOP_LAG = Histogram('event_loop_lag_seconds', 'Delay of the event loop timers', buckets=FAST_BUCKETS)
+RATE_LIMIT_WAIT = Histogram('discord_rate_limit_wait_seconds', 'Wait for a Discord request slot (bucket and global limits)', buckets=FAST_BUCKETS)
+RATE_LIMITED = Counter('discord_rate_limited_total', 'Discord 429 responses', ['scope'])
+
+# ===== Storage =====
+MONGO_WRITE_LATENCY = Histogram('mongo_write_seconds', 'MongoDB bulk write latency', ['operation'], buckets=FAST_BUCKETS)
+
+# ===== LLM =====
+LLM_CALL_LATENCY = Histogram('llm_call_seconds', 'OVH chat completion latency (whole stream when streaming)', ['model', 'stream'], buckets=LLM_BUCKETS)
+LLM_CALL_ERRORS = Counter('llm_call_errors_total', 'Failed OVH chat completion calls', ['model'])
+LLM_TOKENS = Counter('llm_tokens_total', 'Tokens reported by the OVH API', ['model', 'kind'])
+LLM_CACHE_LOOKUPS = Counter('llm_cache_lookups_total', 'LLM result cache lookups', ['result'])
+ANALYSIS_JOBS = Counter('analysis_jobs_total', 'Finished analysis jobs', ['status'])
+ANALYSIS_QUEUE_DEPTH = Gauge('analysis_jobs_pending', 'Pending analysis jobs')
+ANALYSIS_QUEUE_WAIT = Histogram('analysis_job_queue_wait_seconds', 'Time an analysis job waited before being claimed', buckets=QUEUE_BUCKETS)
+
+# ============
+# Function: track_queue_depth
+# ------------
+# DESCRIPTION: Compute a queue depth gauge at scrape time. A failing count (e.g. Mongo down) reports NaN
+#   instead of failing the whole scrape.
+# PARAMS:
+#   - gauge: Gauge
+#   - count: callable returning the current depth
+# RETURNS: None
+# ============
+def track_queue_depth(gauge: Gauge, count: Callable[[], int]) -> None:
+    def safe_count() -> float:
+        try:
+            return count()
+        except Exception as e:
+            logger.warning("Queue depth count failed: %s", e)
+            return math.nan
+    gauge.set_function(safe_count)
+
+# ============
+# Function: record_llm_usage
+# ------------
+# DESCRIPTION: Count the tokens of an OVH response (OpenAI-style `usage` block, if any).
+# PARAMS:
+#   - model: str, model label
+#   - usage: dict or None
+# RETURNS: None
+# ============
+def record_llm_usage(model: str, usage: dict) -> None:
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage and usage.get(kind):
+            LLM_TOKENS.labels(model=model, kind=kind.split('_')[0]).inc(usage[kind])
+
+# ============
+# Function: start_metrics_server
+# ------------
+# DESCRIPTION: Serve this process's metrics on a sidecar HTTP port (background thread), for processes without an
+#   HTTP API. A port of 0 disables it.
+# PARAMS:
+#   - env_key: str, variable holding the port
+#   - default_port: int
+# RETURNS: None
+# ============
+def start_metrics_server(env_key: str, default_port: int) -> None:
+    port = int(get_env_var(env_key, str(default_port)))
+    if port:
+        start_http_server(port)
+        logger.info("Metrics served on :%d/metrics", port)
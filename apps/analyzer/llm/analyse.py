@@ -1,8 +1,19 @@
-import requests
+import asyncio
+import logging
+import time
 import yaml
 from pathlib import Path
-from typing import List, Union, Generator, Optional
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, Union, AsyncGenerator, Optional
 from config.config import get_env_var
+from config.metrics import LLM_CALL_ERRORS, LLM_CALL_LATENCY, record_llm_usage
+from llm.ovh_client import CompletionAssembler, get_ovh_client
+from llm.cache import get_analysis_cache, make_cache_key
+from llm.chunking import chunk_token_budget, estimate_tokens, get_max_output_tokens, iter_windows, split_into_windows
+
+logger = logging.getLogger(__name__)
+
+# Re-readable source of prompt lines: each call returns a fresh iterator (e.g. a new Mongo cursor)
+LineSource = Callable[[], Iterator[str]]
 
 # ============
 # Function: load_yaml
@@ -71,10 +82,11 @@ def build_payload(model_config: dict, prompt_config: dict, user_content: Union[s
     # Add system/user messages
     for msg in prompt_config.get('messages', []):
         content = msg['content']
-        # Remplacement {{question}} ou {{messages}} si présent
-        if '{{question}}' in content or '{{messages}}' in content:
+        # Remplacement {{question}}, {{messages}} ou {{partials}} (prompts de reduce) si présent
+        if '{{question}}' in content or '{{messages}}' in content or '{{partials}}' in content:
             content = content.replace('{{question}}', user_content_str)
             content = content.replace('{{messages}}', user_content_str)
+            content = content.replace('{{partials}}', user_content_str)
         messages.append({
             'role': msg['role'],
             'content': content
@@ -83,7 +95,7 @@ def build_payload(model_config: dict, prompt_config: dict, user_content: Union[s
     temperature = prompt_config.get('temperature', model_config.get('temperature', 0.3))
     top_p = prompt_config.get('top_p', model_config.get('top_p', 0.8))
     payload = {
-        'max_tokens': 512,
+        'max_tokens': get_max_output_tokens(model_config, prompt_config),
         'messages': messages,
         'model': model_config.get('name'),
         'temperature': temperature,
@@ -98,50 +110,235 @@ def build_payload(model_config: dict, prompt_config: dict, user_content: Union[s
         payload.update(extra)
     return payload
 
+# ============
+# Function: timed_stream
+# ------------
+# DESCRIPTION: Relay the lines of a streamed completion, recording its latency (until the last line) and token usage.
+# PARAMS:
+#   - model: str, model label
+#   - lines: async generator of raw stream lines
+# RETURNS: async generator of str
+# ============
+async def timed_stream(model: str, lines: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    assembler = CompletionAssembler()
+    started = time.perf_counter()
+    try:
+        async for line in lines:
+            assembler.feed(line)
+            yield line
+    except Exception:
+        LLM_CALL_ERRORS.labels(model=model).inc()
+        raise
+    finally:
+        # Consumers usually close the stream as soon as they see [DONE]: record a completed call here
+        if assembler.done:
+            LLM_CALL_LATENCY.labels(model=model, stream='true').observe(time.perf_counter() - started)
+            record_llm_usage(model, assembler.usage)
+        await lines.aclose()
+
 # ============
 # Function: call_ovh_api
 # ------------
-# DESCRIPTION: Send a POST request to the OVH API with the given payload and headers. Supports streaming.
+# DESCRIPTION: Send the payload to the OVH API through the shared async client (pooled keep-alive connections). Supports streaming.
+#   Latency, errors and token usage are recorded in the LLM metrics.
 # PARAMS:
 #   - payload: dict, request payload
 #   - stream: bool, whether to enable streaming
-# RETURNS: dict (if not streaming) or generator (if streaming)
-# ============
-def call_ovh_api(payload: dict, stream: bool = False) -> Union[dict, Generator[str, None, None]]:
-    url = get_env_var('OVH_API_BASE_URL', 'https://oai.endpoints.kepler.ai.cloud.ovh.net/v1/chat/completions')
-    token = get_env_var('OVH_AI_ENDPOINTS_ACCESS_TOKEN')
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
-    print(payload)
-    response = requests.post(url, json=payload, headers=headers, stream=stream, timeout=60)
+# RETURNS: dict (if not streaming) or async generator of raw lines (if streaming)
+# ============
+async def call_ovh_api(payload: dict, stream: bool = False) -> Union[dict, AsyncGenerator[str, None]]:
+    client = get_ovh_client()
+    model = payload.get('model') or 'unknown'
+    logger.debug("OVH call: model=%s, %d messages, stream=%s", model, len(payload.get('messages', [])), stream)
     if stream:
-        def stream_generator():
-            for line in response.iter_lines():
-                if line:
-                    yield line.decode('utf-8')
-        return stream_generator()
-    else:
-        if response.status_code == 200:
-            return response.json()
+        return timed_stream(model, client.stream(payload))
+    started = time.perf_counter()
+    try:
+        response = await client.complete(payload)
+    except Exception:
+        LLM_CALL_ERRORS.labels(model=model).inc()
+        raise
+    LLM_CALL_LATENCY.labels(model=model, stream='false').observe(time.perf_counter() - started)
+    record_llm_usage(model, response.get('usage'))
+    return response
+
+# ============
+# Function: get_response_content
+# ------------
+# DESCRIPTION: Extract the assistant message text from an OVH chat completion response.
+# PARAMS:
+#   - response: dict, OVH API response
+# RETURNS: str
+# ============
+def get_response_content(response: dict) -> str:
+    return response['choices'][0]['message']['content']
+
+# ============
+# Function: format_partials
+# ------------
+# DESCRIPTION: Format partial results (JSON strings) of consecutive windows as the user content of a reduce prompt.
+# PARAMS:
+#   - partials: list of str
+# RETURNS: List[str]
+# ============
+def format_partials(partials: List[str]) -> List[str]:
+    return [f"### Window {i}/{len(partials)}\n{partial}" for i, partial in enumerate(partials, 1)]
+
+# ============
+# Function: iterate
+# ------------
+# DESCRIPTION: Chain sync and async iterables into one async iterator.
+# PARAMS:
+#   - sources: iterables or async iterables
+# RETURNS: AsyncIterator
+# ============
+async def iterate(*sources) -> AsyncIterator:
+    for source in sources:
+        if hasattr(source, '__aiter__'):
+            async for item in source:
+                yield item
         else:
-            raise RuntimeError(f"OVH API error: {response.status_code} - {response.text}")
+            for item in source:
+                yield item
+
+# ============
+# Function: read_windows
+# ------------
+# DESCRIPTION: Token-budgeted windows of a line source, read lazily: each window is packed in a worker thread
+#   (the source may be a blocking Mongo cursor) only when the consumer asks for it.
+# PARAMS:
+#   - lines: LineSource
+#   - budget: int, max estimated tokens per window
+# RETURNS: AsyncIterator[List[str]]
+# ============
+async def read_windows(lines: LineSource, budget: int) -> AsyncIterator[List[str]]:
+    windows = iter_windows(lines(), budget)
+    try:
+        while (window := await asyncio.to_thread(next, windows, None)) is not None:
+            yield window
+    finally:
+        windows.close()
+
+# ============
+# Function: map_reduce
+# ------------
+# DESCRIPTION: Chunked analysis. Runs the prompt on every window concurrently (at most LLM_MAP_CONCURRENCY
+#   calls in flight, each one cached like a regular analysis), then merges the partial outputs with the
+#   prompt's reduce_prompt. Partials too large for one reduce call are reduced in groups first.
+#   Windows are pulled only when a call slot is free, so a lazy window stream keeps at most
+#   LLM_MAP_CONCURRENCY + 1 windows in memory; only the (small) partial outputs accumulate.
+# PARAMS:
+#   - model_config: dict, model configuration
+#   - prompt_config: dict, prompt configuration (with 'reduce_prompt')
+#   - windows: list or async iterator of list of str, consecutive message windows
+#   - stream: bool, whether to stream the final reduce call
+#   - extra: dict, additional parameters (optional)
+#   - force_refresh: bool, bypass the cache for the map calls
+# RETURNS: dict (if not streaming) or async generator (if streaming)
+# ============
+async def map_reduce(model_config: dict, prompt_config: dict, windows: Union[List[List[str]], AsyncIterator[List[str]]], stream: bool = False, extra: Optional[dict] = None, force_refresh: bool = False) -> Union[dict, AsyncGenerator[str, None]]:
+    cache = get_analysis_cache()
+    semaphore = asyncio.Semaphore(int(get_env_var('LLM_MAP_CONCURRENCY', '8')))
+
+    async def run(config: dict, content: List[str]) -> str:
+        try:
+            payload = build_payload(model_config, config, content, extra=extra)
+            response = await cache.complete(
+                make_cache_key(model_config, config, content, extra),
+                lambda: call_ovh_api(payload),
+                force_refresh=force_refresh,
+                model=model_config.get('name')
+            )
+            return get_response_content(response)
+        finally:
+            semaphore.release()
+
+    async def run_all(config: dict, contents: Union[Iterable[List[str]], AsyncIterator[List[str]]]) -> List[str]:
+        tasks = []
+        async with asyncio.TaskGroup() as group:
+            async for content in iterate(contents):
+                # Wait for a free slot before reading the next window
+                await semaphore.acquire()
+                tasks.append(group.create_task(run(config, content)))
+        return [task.result() for task in tasks]
+
+    partials = await run_all(prompt_config, windows)
+    reduce_config = get_prompt_config(prompt_config['reduce_prompt'])
+    budget = chunk_token_budget(model_config, reduce_config)
+    while len(partials) > 1 and sum(estimate_tokens(p) for p in partials) > budget:
+        groups = split_into_windows(partials, budget)
+        if len(groups) == len(partials):
+            # Every partial needs its own window: merging further cannot shrink the input
+            break
+        partials = await run_all(reduce_config, [format_partials(group) for group in groups])
+    payload = build_payload(model_config, reduce_config, format_partials(partials), stream=stream, extra=extra)
+    return await call_ovh_api(payload, stream=stream)
+
+# ============
+# Function: analyse_lines
+# ------------
+# DESCRIPTION: LLM call for a line source (prompt with a reduce_prompt): a single call when the lines fit in one
+#   window, map_reduce over the lazily read windows otherwise.
+# PARAMS:
+#   - model_config: dict, model configuration
+#   - prompt_config: dict, prompt configuration (with 'reduce_prompt')
+#   - lines: LineSource
+#   - stream: bool, whether to stream the (final) call
+#   - extra: dict, additional parameters (optional)
+#   - force_refresh: bool, bypass the cache for the map calls
+# RETURNS: dict (if not streaming) or async generator (if streaming)
+# ============
+async def analyse_lines(model_config: dict, prompt_config: dict, lines: LineSource, stream: bool = False, extra: Optional[dict] = None, force_refresh: bool = False) -> Union[dict, AsyncGenerator[str, None]]:
+    windows = read_windows(lines, chunk_token_budget(model_config, prompt_config))
+    first = await anext(windows, [])
+    second = await anext(windows, None)
+    if second is None:
+        payload = build_payload(model_config, prompt_config, first, stream=stream, extra=extra)
+        return await call_ovh_api(payload, stream=stream)
+    return await map_reduce(model_config, prompt_config, iterate([first, second], windows), stream=stream, extra=extra, force_refresh=force_refresh)
 
 # ============
 # Function: analyse
 # ------------
 # DESCRIPTION: Main entry point. Prepares and sends a request to the OVH API using the specified model and prompt.
+#   Responses are cached by content hash (model config, prompt config, user content): an identical request is served without calling OVH.
+#   A message list larger than one token-budgeted window is analysed with map_reduce when the prompt defines a reduce_prompt.
+#   User content can also be a LineSource: its lines are then read twice, once to hash the cache key and, on a
+#   miss, once more window by window, so they are never all in memory (unless the prompt has no reduce_prompt:
+#   the single call needs every line).
 # PARAMS:
 #   - model_name: str, name of the model
 #   - prompt_name: str, name of the prompt
-#   - user_content: str or list, user input or messages
+#   - user_content: str, list of lines or LineSource, user input or messages
 #   - stream: bool, whether to enable streaming (default: False)
 #   - extra: dict, additional parameters (optional)
-# RETURNS: dict (if not streaming) or generator (if streaming)
+#   - force_refresh: bool, bypass the cache lookup and refresh the entry (default: False)
+# RETURNS: dict (if not streaming) or async generator (if streaming)
 # ============
-def analyse(model_name: str, prompt_name: str, user_content: Union[str, List[str]], stream: bool = False, extra: Optional[dict] = None) -> Union[dict, Generator[str, None, None]]:
+async def analyse(model_name: str, prompt_name: str, user_content: Union[str, List[str], LineSource], stream: bool = False, extra: Optional[dict] = None, force_refresh: bool = False) -> Union[dict, AsyncGenerator[str, None]]:
     model_config = get_model_config(model_name)
     prompt_config = get_prompt_config(prompt_name)
-    payload = build_payload(model_config, prompt_config, user_content, stream=stream, extra=extra)
-    return call_ovh_api(payload, stream=stream)
\ No newline at end of file
+    if callable(user_content) and not prompt_config.get('reduce_prompt'):
+        user_content = await asyncio.to_thread(lambda lines: list(lines()), user_content)
+    if callable(user_content):
+        lines = user_content
+        key = await asyncio.to_thread(make_cache_key, model_config, prompt_config, lines(), extra)
+        call = lambda: analyse_lines(model_config, prompt_config, lines, stream=stream, extra=extra, force_refresh=force_refresh)
+    else:
+        key = make_cache_key(model_config, prompt_config, user_content, extra)
+        windows = []
+        if isinstance(user_content, list) and prompt_config.get('reduce_prompt'):
+            windows = split_into_windows(user_content, chunk_token_budget(model_config, prompt_config))
+        if len(windows) > 1:
+            call = lambda: map_reduce(model_config, prompt_config, windows, stream=stream, extra=extra, force_refresh=force_refresh)
+        else:
+            payload = build_payload(model_config, prompt_config, user_content, stream=stream, extra=extra)
+            call = lambda: call_ovh_api(payload, stream=stream)
+    return await get_analysis_cache().complete(
+        key,
+        call,
+        stream=stream,
+        force_refresh=force_refresh,
+        model=model_name,
+        prompt_key=prompt_name
+    )
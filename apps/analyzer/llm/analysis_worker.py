@@ -0,0 +1,158 @@
+"""
+Module: analysis_worker.py
+-----------------------------------
+DESCRIPTION: Worker process that runs queued Discord analyses (analysis_jobs) with a pool of concurrent
+workers, so LLM throughput scales independently of the API tier. Jobs are submitted by POST /discord/analyze/jobs.
+Claims are leased and renewed while a job runs: the jobs of a dead worker process are picked up again.
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import asyncio
+import socket
+from datetime import datetime
+from pymongo.errors import PyMongoError
+from config.config import get_env_var
+from config.metrics import ANALYSIS_JOBS, ANALYSIS_QUEUE_DEPTH, ANALYSIS_QUEUE_WAIT, start_metrics_server, track_queue_depth
+from storage.async_mongo_storage import AsyncMongoStorage
+from llm.discord_analysis import run_discord_analysis
+from llm.ovh_client import close_ovh_client
+
+# Awaitable storage: pymongo calls run in a thread pool, so the workers' Mongo phases overlap
+storage = AsyncMongoStorage()
+
+WORKERS = int(get_env_var('ANALYSIS_WORKERS', '4'))
+POLL_INTERVAL = float(get_env_var('ANALYSIS_POLL_INTERVAL', '2'))
+# Job leases: renewed by a heartbeat while the job runs; an expired lease (dead worker) is reclaimed
+# by any worker process, at most ANALYSIS_MAX_ATTEMPTS times
+LEASE_SECONDS = float(get_env_var('ANALYSIS_LEASE_SECONDS', '120'))
+MAX_ATTEMPTS = int(get_env_var('ANALYSIS_MAX_ATTEMPTS', '3'))
+
+async def process_job(job: dict, worker_name: str) -> str:
+    """
+    ============
+    Function: process_job
+    ------------
+    DESCRIPTION: Run one analysis job and record its outcome (analysis id or error) on the job document, unless the lease was lost meanwhile.
+    PARAMS:
+    - job (dict): analysis_jobs document, already claimed
+    - worker_name (str): Lease owner, for fenced status updates
+    RETURNS: str - final status (done, failed)
+    ============
+    """
+    try:
+        _, analysis_id = await run_discord_analysis(storage.sync, job["params"], force_refresh=job.get("force_refresh", False))
+        fields = {"finished_at": datetime.utcnow()}
+        if analysis_id is None:
+            fields["message"] = "No messages found for this period."
+        else:
+            fields["analysis_id"] = analysis_id
+        status = "done"
+        print(f"[AnalysisWorker] Job {job['_id']} done: {analysis_id}")
+    except Exception as e:
+        fields = {"finished_at": datetime.utcnow(), "error": str(e)}
+        status = "failed"
+        print(f"[AnalysisWorker] Job {job['_id']} failed: {e}")
+    if not await storage.update_analysis_job_status(job["_id"], status, worker=worker_name, **fields):
+        print(f"[AnalysisWorker] Job {job['_id']} was reclaimed by another worker: outcome not recorded.")
+    return status
+
+async def keep_lease(job_id, worker_name: str, job_task: asyncio.Task) -> None:
+    """
+    ============
+    Function: keep_lease
+    ------------
+    DESCRIPTION: Heartbeat of a running job: renew its lease every third of ANALYSIS_LEASE_SECONDS. If the lease was lost (reclaimed after a stall), cancel the job so that only one worker runs it.
+    PARAMS:
+    - job_id: The ObjectId of the job
+    - worker_name (str): Lease owner
+    - job_task (asyncio.Task): Task running process_job
+    RETURNS: None
+    ============
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            owned = await storage.renew_analysis_job_lease(job_id, worker_name, LEASE_SECONDS)
+        except PyMongoError as e:
+            # Transient: retry at the next beat, the lease has some slack left
+            print(f"[AnalysisWorker] Lease renewal of job {job_id} failed: {e}")
+            continue
+        if not owned:
+            print(f"[AnalysisWorker] Lease of job {job_id} lost: cancelling it.")
+            job_task.cancel()
+            return
+
+async def reap_expired_jobs() -> None:
+    """
+    ============
+    Function: reap_expired_jobs
+    ------------
+    DESCRIPTION: Every ANALYSIS_LEASE_SECONDS, fail the jobs whose lease expired ANALYSIS_MAX_ATTEMPTS times. Other expired leases are reclaimed by the workers' next claim.
+    PARAMS: None
+    RETURNS: None
+    ============
+    """
+    while True:
+        await asyncio.sleep(LEASE_SECONDS)
+        try:
+            failed = await storage.fail_exhausted_analysis_jobs(MAX_ATTEMPTS)
+        except PyMongoError as e:
+            print(f"[AnalysisWorker] Expired job sweep failed: {e}")
+            continue
+        if failed:
+            print(f"[AnalysisWorker] {failed} job(s) failed after {MAX_ATTEMPTS} expired leases.")
+
+async def worker(worker_id: int) -> None:
+    """
+    ============
+    Function: worker
+    ------------
+    DESCRIPTION: Claim and run pending (or lease-expired) analysis jobs until cancelled, renewing each job's lease while it runs.
+    PARAMS: worker_id (int) - index in the pool, for logs and the lease owner name
+    RETURNS: None
+    ============
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}/{worker_id}"
+    while True:
+        try:
+            job = await storage.get_next_pending_analysis_job(worker=name, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS)
+        except PyMongoError as e:
+            # Transient: retry at the next poll instead of taking the whole pool down
+            print(f"[AnalysisWorker {worker_id}] Job claim failed: {e}")
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        if not job:
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        print(f"[AnalysisWorker {worker_id}] Nouveau job à traiter : {job['_id']} (attempt {job['attempts']})")
+        ANALYSIS_QUEUE_WAIT.observe((job["started_at"] - job["created_at"]).total_seconds())
+        job_task = asyncio.create_task(process_job(job, name))
+        lease_task = asyncio.create_task(keep_lease(job["_id"], name, job_task))
+        try:
+            status = await job_task
+        except asyncio.CancelledError:
+            # Re-raise if the worker itself is being cancelled, not just the job (lease lost)
+            if asyncio.current_task().cancelling() or not job_task.cancelled():
+                raise
+            status = "lease_lost"
+        finally:
+            lease_task.cancel()
+        ANALYSIS_JOBS.labels(status=status).inc()
+
+async def main() -> None:
+    print(f"[AnalysisWorker] Starting {WORKERS} workers.")
+    reaper = asyncio.create_task(reap_expired_jobs())
+    try:
+        await asyncio.gather(*(worker(i) for i in range(WORKERS)))
+    finally:
+        reaper.cancel()
+        await close_ovh_client()
+        storage.close()
+
+if __name__ == "__main__":
+    track_queue_depth(ANALYSIS_QUEUE_DEPTH, storage.sync.count_pending_analysis_jobs)
+    start_metrics_server('ANALYSIS_METRICS_PORT', 9102)
+    asyncio.run(main())
@@ -0,0 +1,218 @@
+"""
+Module: cache.py
+------------------------
+DESCRIPTION: Content-addressed cache of LLM responses. The key is a hash of (model config, prompt config,
+input content), so the same channel/period/model/prompt with no new messages never pays for a second LLM
+call. An in-process LRU sits in front of the Mongo `llm_cache` collection (TTL index on expires_at).
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional, Tuple, Union
+from config.config import get_env_var
+from config.metrics import LLM_CACHE_LOOKUPS
+from llm.ovh_client import CompletionAssembler
+from storage.mongo_storage import get_shared_storage
+
+logger = logging.getLogger(__name__)
+
+# ============
+# Function: make_cache_key
+# ------------
+# DESCRIPTION: Hash the model config, prompt config and input content into a stable cache key.
+#   Any change to the prompt template, model settings or message set yields a new key.
+#   Lines are hashed one at a time, so a lazy iterator of lines (e.g. a Mongo cursor) is keyed without
+#   being materialized; it gives the same key as the list of the same lines or their '\n' join.
+# PARAMS:
+#   - model_config: dict, model configuration
+#   - prompt_config: dict, prompt configuration
+#   - content: input content (str, dict, list or iterator of lines)
+#   - extra: dict, additional payload parameters (optional)
+# RETURNS: str, sha256 hex digest
+# ============
+def make_cache_key(model_config: dict, prompt_config: dict, content: Any, extra: Optional[dict] = None) -> str:
+    header = json.dumps(
+        {'model': model_config, 'prompt': prompt_config, 'extra': extra or {}},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    digest = hashlib.sha256(header.encode('utf-8'))
+    if isinstance(content, dict):
+        content = [json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)]
+    elif isinstance(content, str):
+        content = [content]
+    for i, line in enumerate(content):
+        if i:
+            digest.update(b'\n')
+        digest.update(line.encode('utf-8'))
+    return digest.hexdigest()
+
+# ============
+# Function: replay_stream
+# ------------
+# DESCRIPTION: Replay a cached response as upstream stream lines, so streaming callers handle hits like misses.
+# PARAMS:
+#   - result: dict, cached LLM response
+# RETURNS: async generator of str
+# ============
+async def replay_stream(result: dict) -> AsyncGenerator[str, None]:
+    content = result['choices'][0]['message']['content']
+    chunk = {'id': result.get('id'), 'model': result.get('model'), 'choices': [{'index': 0, 'delta': {'content': content}, 'finish_reason': 'stop'}]}
+    yield 'data: ' + json.dumps(chunk, ensure_ascii=False)
+    yield 'data: [DONE]'
+
+# ============
+# Class: AnalysisCache
+# ------------
+# DESCRIPTION:
+#   Two-level cache (in-process LRU, then Mongo) with hit/miss counters.
+#   Mongo round trips run in a worker thread, never on the event loop.
+#   Mongo errors are logged and treated as misses: the cache never fails a request.
+# PARAMS:
+#   - max_entries: int, LRU size (env LLM_CACHE_MAX_ENTRIES)
+#   - ttl_seconds: int, entry lifetime (env LLM_CACHE_TTL)
+# RETURNS: None
+# ============
+class AnalysisCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[int] = None):
+        self.max_entries = int(max_entries or get_env_var('LLM_CACHE_MAX_ENTRIES', '256'))
+        self.ttl_seconds = int(ttl_seconds or get_env_var('LLM_CACHE_TTL', str(7 * 24 * 3600)))
+        self._lru: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _remember(self, key: str, result: dict, expires_at: float) -> None:
+        self._lru[key] = (expires_at, result)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    # ============
+    # Function: get
+    # ------------
+    # DESCRIPTION: Look a key up in the LRU, then in Mongo (promoting Mongo hits into the LRU).
+    # PARAMS:
+    #   - key: str, cache key
+    # RETURNS: dict (copy of the cached response) or None
+    # ============
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._lru.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                LLM_CACHE_LOOKUPS.labels(result='memory_hit').inc()
+                return copy.deepcopy(entry[1])
+            del self._lru[key]
+        try:
+            doc = await asyncio.to_thread(get_shared_storage().get_cached_llm_result, key)
+        except Exception as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            doc = None
+        if doc is None:
+            self.misses += 1
+            LLM_CACHE_LOOKUPS.labels(result='miss').inc()
+            return None
+        self.mongo_hits += 1
+        LLM_CACHE_LOOKUPS.labels(result='mongo_hit').inc()
+        remaining = (doc['expires_at'].replace(tzinfo=None) - datetime.utcnow()).total_seconds()
+        self._remember(key, doc['result'], time.time() + remaining)
+        return copy.deepcopy(doc['result'])
+
+    # ============
+    # Function: set
+    # ------------
+    # DESCRIPTION: Store a response in both levels.
+    # PARAMS:
+    #   - key: str, cache key
+    #   - result: dict, LLM response
+    #   - metadata: extra fields stored with the Mongo entry
+    # RETURNS: None
+    # ============
+    async def set(self, key: str, result: dict, **metadata) -> None:
+        self._remember(key, copy.deepcopy(result), time.time() + self.ttl_seconds)
+        try:
+            await asyncio.to_thread(get_shared_storage().save_cached_llm_result, key, result, self.ttl_seconds, **metadata)
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+    # ============
+    # Function: complete
+    # ------------
+    # DESCRIPTION: Return the cached response for `key`, or run `call` and cache its result.
+    #   In stream mode, hits are replayed as stream lines and misses are cached once the stream completes.
+    # PARAMS:
+    #   - key: str, cache key
+    #   - call: coroutine factory performing the LLM call
+    #   - stream: bool, whether `call` returns stream lines
+    #   - force_refresh: bool, skip the lookup and overwrite the entry
+    #   - metadata: extra fields stored with the Mongo entry
+    # RETURNS: dict or async generator of str
+    # ============
+    async def complete(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Any]],
+        stream: bool = False,
+        force_refresh: bool = False,
+        **metadata
+    ) -> Union[dict, AsyncGenerator[str, None]]:
+        if force_refresh:
+            self.refreshes += 1
+        else:
+            cached = await self.get(key)
+            if cached is not None:
+                return replay_stream(cached) if stream else cached
+        if stream:
+            return self._record_stream(key, await call(), metadata)
+        result = await call()
+        await self.set(key, result, **metadata)
+        return result
+
+    async def _record_stream(self, key: str, lines: AsyncGenerator[str, None], metadata: dict) -> AsyncGenerator[str, None]:
+        assembler = CompletionAssembler()
+        try:
+            async for line in lines:
+                assembler.feed(line)
+                if assembler.done:
+                    # Store before relaying [DONE]: consumers may stop iterating right after it
+                    await self.set(key, assembler.result(), **metadata)
+                yield line
+        finally:
+            await lines.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.mongo_hits
+        lookups = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'mongo_hits': self.mongo_hits,
+            'misses': self.misses,
+            'forced_refreshes': self.refreshes,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'memory_entries': len(self._lru),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+_cache: Optional[AnalysisCache] = None
+
+# ============
+# Function: get_analysis_cache
+# ------------
+# DESCRIPTION: Return the process-wide LLM result cache.
+# PARAMS: None
+# RETURNS: AnalysisCache
+# ============
+def get_analysis_cache() -> AnalysisCache:
+    global _cache
+    if _cache is None:
+        _cache = AnalysisCache()
+    return _cache
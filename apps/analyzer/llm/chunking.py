@@ -0,0 +1,97 @@
+"""
+Module: chunking.py
+------------------------
+DESCRIPTION: Token budgeting for long inputs. Splits formatted message lines into consecutive windows that fit
+the model's context window (minus prompt overhead and output budget), for the map step of a map-reduce analysis.
+Token counts are estimated from character length: no tokenizer is shipped for the OVH models.
+"""
+
+import json
+from typing import Iterable, Iterator, List
+from config.config import get_env_var
+
+# Conservative estimate (English/French text averages ~4 chars per token)
+CHARS_PER_TOKEN = 3
+# Share of the computed room actually used, to absorb estimation error
+SAFETY_RATIO = 0.9
+
+# ============
+# Function: estimate_tokens
+# ------------
+# DESCRIPTION: Estimate the number of tokens of a text.
+# PARAMS:
+#   - text: str
+# RETURNS: int
+# ============
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+# ============
+# Function: get_max_output_tokens
+# ------------
+# DESCRIPTION: Output token budget of a request: prompt config, then model config, then 512.
+# PARAMS:
+#   - model_config: dict, model configuration
+#   - prompt_config: dict, prompt configuration
+# RETURNS: int
+# ============
+def get_max_output_tokens(model_config: dict, prompt_config: dict) -> int:
+    return int(prompt_config.get('max_tokens', model_config.get('max_output_tokens', 512)))
+
+# ============
+# Function: chunk_token_budget
+# ------------
+# DESCRIPTION: Max input tokens per window: what is left of the context window once the prompt template,
+#   response schema and output budget are accounted for, capped by LLM_CHUNK_TOKENS (or the model's
+#   chunk_tokens) so that large periods fan out into parallel calls instead of one slow huge call.
+# PARAMS:
+#   - model_config: dict, model configuration
+#   - prompt_config: dict, prompt configuration
+# RETURNS: int
+# ============
+def chunk_token_budget(model_config: dict, prompt_config: dict) -> int:
+    context_window = int(model_config.get('context_window', 8192))
+    overhead = estimate_tokens(json.dumps(prompt_config.get('messages', []), ensure_ascii=False))
+    overhead += estimate_tokens(json.dumps(prompt_config.get('response_format', {}), ensure_ascii=False))
+    available = int((context_window - overhead - get_max_output_tokens(model_config, prompt_config)) * SAFETY_RATIO)
+    cap = int(model_config.get('chunk_tokens', get_env_var('LLM_CHUNK_TOKENS', '8000')))
+    return max(min(available, cap), 256)
+
+# ============
+# Function: iter_windows
+# ------------
+# DESCRIPTION: Greedily pack consecutive lines into windows of at most `budget` estimated tokens, yielding each
+#   window as soon as it is full: only the window being filled is held, whatever the input size.
+#   Order is preserved; a single line longer than the budget is truncated into its own window.
+# PARAMS:
+#   - lines: iterable of str (consumed lazily)
+#   - budget: int, max estimated tokens per window
+# RETURNS: Iterator[List[str]]
+# ============
+def iter_windows(lines: Iterable[str], budget: int) -> Iterator[List[str]]:
+    current: List[str] = []
+    used = 0
+    for line in lines:
+        cost = estimate_tokens(line) + 1  # + newline
+        if cost > budget:
+            line = line[:budget * CHARS_PER_TOKEN - 1]
+            cost = budget
+        if current and used + cost > budget:
+            yield current
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        yield current
+
+# ============
+# Function: split_into_windows
+# ------------
+# DESCRIPTION: All the windows of iter_windows, as a list.
+# PARAMS:
+#   - lines: iterable of str
+#   - budget: int, max estimated tokens per window
+# RETURNS: List[List[str]]
+# ============
+def split_into_windows(lines: Iterable[str], budget: int) -> List[List[str]]:
+    return list(iter_windows(lines, budget))
@@ -1,9 +1,9 @@
 import json
-import requests
 import yaml
 from pathlib import Path
-from typing import Union, Generator, Optional, Dict
-from config.config import get_env_var
+from typing import Union, AsyncGenerator, Optional, Dict
+from llm.analyse import call_ovh_api
+from llm.cache import get_analysis_cache, make_cache_key
 
 def load_yaml(file_path: str) -> dict:
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -61,35 +61,23 @@ def build_payload_for_content(
 
     return payload
 
-def call_ovh_api(payload: dict, stream: bool = False) -> Union[dict, Generator[str, None, None]]:
-    url = get_env_var('OVH_API_BASE_URL', 'https://oai.endpoints.kepler.ai.cloud.ovh.net/v1/chat/completions')
-    token = get_env_var('OVH_AI_ENDPOINTS_ACCESS_TOKEN')
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
-    response = requests.post(url, json=payload, headers=headers, stream=stream, timeout=60)
-
-    if stream:
-        def stream_generator():
-            for line in response.iter_lines():
-                if line:
-                    yield line.decode('utf-8')
-        return stream_generator()
-    else:
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise RuntimeError(f"OVH API error: {response.status_code} - {response.text}")
-
-def trend_to_content(
+async def trend_to_content(
     model_name: str,
     prompt_name: str,
     trend: Dict,
     stream: bool = False,
-    extra: Optional[dict] = None
-) -> Union[dict, Generator[str, None, None]]:
+    extra: Optional[dict] = None,
+    force_refresh: bool = False
+) -> Union[dict, AsyncGenerator[str, None]]:
     model_config = get_model_config(model_name)
     prompt_config = get_prompt_config(prompt_name)
     payload = build_payload_for_content(model_config, prompt_config, trend, stream=stream, extra=extra)
-    return call_ovh_api(payload, stream=stream)
+    key = make_cache_key(model_config, prompt_config, trend, extra)
+    return await get_analysis_cache().complete(
+        key,
+        lambda: call_ovh_api(payload, stream=stream),
+        stream=stream,
+        force_refresh=force_refresh,
+        model=model_name,
+        prompt_key=prompt_name
+    )
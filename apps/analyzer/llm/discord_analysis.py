@@ -0,0 +1,151 @@
+"""
+Module: discord_analysis.py
+------------------------
+DESCRIPTION: Discord channel analysis pipeline (period → harvested messages → LLM → analysis_results), shared by
+the synchronous API endpoints and the analysis job worker. Raises ValueError on invalid input; callers map it to
+their own error reporting (HTTP 400, failed job...).
+"""
+
+import asyncio
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from dateutil.relativedelta import relativedelta
+from dateutil.parser import parse as parse_date
+from config.config import get_env_var
+from llm.analyse import analyse
+from storage.mongo_storage import MongoStorage
+
+PERIODS = {
+    "last_day": relativedelta(days=1),
+    "last_week": relativedelta(weeks=1),
+    "last_month": relativedelta(months=1),
+}
+
+# ============
+# Function: compute_period
+# ------------
+# DESCRIPTION: Translate an analysis period keyword into a (since, now) UTC date range.
+# PARAMS:
+#   - period: str, last_day, last_week or last_month
+# RETURNS: Tuple[datetime, datetime]
+# ============
+def compute_period(period: str) -> Tuple[datetime, datetime]:
+    if period not in PERIODS:
+        raise ValueError("Invalid period. Use last_day, last_week, or last_month.")
+    now = datetime.utcnow()
+    return now - PERIODS[period], now
+
+# ============
+# Function: format_message
+# ------------
+# DESCRIPTION: Format one message document as a prompt line.
+# PARAMS:
+#   - msg: dict with created_at, author_name, user_id, content
+# RETURNS: str, "[DATE TIME] USER: MESSAGE"
+# ============
+def format_message(msg: dict) -> str:
+    created_at = msg["created_at"]
+    if isinstance(created_at, str):
+        created_at = parse_date(created_at)
+    dt = created_at.strftime("%Y-%m-%d %H:%M")
+    user = msg.get("author_name", str(msg.get("user_id", "?")))
+    return f"[{dt}] {user}: {msg['content']}"
+
+# ============
+# Function: iter_formatted_messages
+# ------------
+# DESCRIPTION: Lazily yield the formatted prompt lines of a channel for a date range, oldest first.
+#   Documents are projected, sorted by MongoDB and read in cursor batches; none is kept after formatting.
+# PARAMS:
+#   - storage: MongoStorage
+#   - channel_id: int
+#   - since, now: datetime bounds (UTC)
+#   - batch_size: int, cursor batch size (env ANALYSIS_CURSOR_BATCH_SIZE)
+# RETURNS: Iterator[str]
+# ============
+def iter_formatted_messages(storage: MongoStorage, channel_id: int, since: datetime, now: datetime, batch_size: Optional[int] = None) -> Iterator[str]:
+    batch_size = batch_size or int(get_env_var("ANALYSIS_CURSOR_BATCH_SIZE", "1000"))
+    for msg in storage.iter_discord_messages_for_analysis(channel_id, since, now, batch_size=batch_size):
+        yield format_message(msg)
+
+# ============
+# Function: formatted_messages
+# ------------
+# DESCRIPTION: Formatted prompt lines of a channel for a date range, as a LineSource for llm.analyse.analyse:
+#   every call opens a new cursor (iter_formatted_messages), so the analysis can hash the lines, then read them
+#   again window by window, without ever holding the whole period.
+# PARAMS:
+#   - storage: MongoStorage
+#   - channel_id: int
+#   - since, now: datetime bounds (UTC)
+# RETURNS: Callable[[], Iterator[str]]
+# ============
+def formatted_messages(storage: MongoStorage, channel_id: int, since: datetime, now: datetime) -> Callable[[], Iterator[str]]:
+    return partial(iter_formatted_messages, storage, channel_id, since, now)
+
+# ============
+# Function: has_messages
+# ------------
+# DESCRIPTION: Whether a channel has at least one message in a date range (reads a single document).
+# PARAMS:
+#   - storage: MongoStorage
+#   - channel_id: int
+#   - since, now: datetime bounds (UTC)
+# RETURNS: bool
+# ============
+def has_messages(storage: MongoStorage, channel_id: int, since: datetime, now: datetime) -> bool:
+    return next(iter_formatted_messages(storage, channel_id, since, now, batch_size=1), None) is not None
+
+# ============
+# Function: build_analysis_doc
+# ------------
+# DESCRIPTION: Build the analysis_results document of a Discord analysis.
+# PARAMS:
+#   - params: dict with creator_id, serverId, channelId, model_name, prompt_key
+#   - since, now: datetime, analysed period
+#   - result: dict, LLM response
+# RETURNS: dict
+# ============
+def build_analysis_doc(params: Dict[str, Any], since: datetime, now: datetime, result: dict) -> dict:
+    return {
+        "creator_id": int(params["creator_id"]),
+        "platform": "discord",
+        "prompt_key": params["prompt_key"],
+        "llm_model": params["model_name"],
+        "scope": {
+            "server_id": params["serverId"],
+            "channel_id": params["channelId"]
+        },
+        "period": {
+            "from": since,
+            "to": now
+        },
+        "result": result,
+        "created_at": datetime.utcnow()
+    }
+
+# ============
+# Function: run_discord_analysis
+# ------------
+# DESCRIPTION: Run a full channel analysis and store it in analysis_results. The Mongo reads and writes run in a
+#   worker thread, never on the caller's event loop.
+# PARAMS:
+#   - storage: MongoStorage
+#   - params: dict with creator_id, serverId, channelId, model_name, prompt_key, period
+#   - force_refresh: bool, bypass the LLM result cache
+# RETURNS: Tuple[dict|None, ObjectId|None], (LLM response, analysis id); (None, None) if the period has no message
+# ============
+async def run_discord_analysis(storage: MongoStorage, params: Dict[str, Any], force_refresh: bool = False) -> Tuple[Optional[dict], Optional[Any]]:
+    since, now = compute_period(params["period"])
+    if not await asyncio.to_thread(has_messages, storage, params["channelId"], since, now):
+        return None, None
+    response = await analyse(
+        model_name=params["model_name"],
+        prompt_name=params["prompt_key"],
+        user_content=formatted_messages(storage, params["channelId"], since, now),
+        force_refresh=force_refresh
+    )
+    doc = build_analysis_doc(params, since, now, response)
+    analysis_id = (await asyncio.to_thread(storage.db.analysis_results.insert_one, doc)).inserted_id
+    return response, analysis_id
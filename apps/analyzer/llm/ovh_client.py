@@ -0,0 +1,203 @@
+"""
+Module: ovh_client.py
+------------------------
+DESCRIPTION: Asyncio HTTP client for the OVH AI Endpoints chat completions API. One pooled keep-alive
+aiohttp session is shared by every LLM call of the process, so concurrent analyses overlap on the
+event loop instead of blocking it. Cancelling the awaiting task aborts the upstream request.
+"""
+
+import asyncio
+import json
+from typing import AsyncGenerator, List, Optional
+import aiohttp
+from config.config import get_env_var
+
+DEFAULT_OVH_API_URL = 'https://oai.endpoints.kepler.ai.cloud.ovh.net/v1/chat/completions'
+
+# ============
+# Class: OVHClient
+# ------------
+# DESCRIPTION:
+#   Lazily opens one aiohttp session (keep-alive connection pool) per event loop
+#   and sends chat completion requests, buffered or streamed.
+# PARAMS: url, token, timeout (s), max_connections (all default to env)
+# RETURNS: None
+# ============
+class OVHClient:
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        token: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+    ):
+        self.url = url or get_env_var('OVH_API_BASE_URL', DEFAULT_OVH_API_URL)
+        self.token = token or get_env_var('OVH_AI_ENDPOINTS_ACCESS_TOKEN')
+        self.timeout = float(timeout or get_env_var('OVH_TIMEOUT', '60'))
+        self.connect_timeout = float(get_env_var('OVH_CONNECT_TIMEOUT', '10'))
+        self.max_connections = int(max_connections or get_env_var('OVH_MAX_CONNECTIONS', '20'))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ============
+    # Function: _get_session
+    # ------------
+    # DESCRIPTION: Return the pooled session, (re)creating it if closed or bound to another event loop.
+    # PARAMS: None
+    # RETURNS: aiohttp.ClientSession
+    # ============
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    'Content-Type': 'application/json',
+                    'Authorization': f'Bearer {self.token}'
+                },
+            )
+            self._loop = loop
+        return self._session
+
+    # ============
+    # Function: complete
+    # ------------
+    # DESCRIPTION: Send a non-streaming chat completion request.
+    # PARAMS:
+    #   - payload: dict, request payload
+    # RETURNS: dict, parsed JSON response
+    # ============
+    async def complete(self, payload: dict) -> dict:
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+        async with self._get_session().post(self.url, json=payload, timeout=timeout) as response:
+            if response.status == 200:
+                return await response.json(content_type=None)
+            raise RuntimeError(f"OVH API error: {response.status} - {await response.text()}")
+
+    # ============
+    # Function: stream
+    # ------------
+    # DESCRIPTION: Send a streaming chat completion request and yield the raw non-empty response lines.
+    #   The timeout applies between two reads, not to the whole generation.
+    # PARAMS:
+    #   - payload: dict, request payload (with 'stream': True)
+    # RETURNS: async generator of str
+    # ============
+    async def stream(self, payload: dict) -> AsyncGenerator[str, None]:
+        timeout = aiohttp.ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.timeout)
+        async with self._get_session().post(self.url, json=payload, timeout=timeout) as response:
+            if response.status != 200:
+                raise RuntimeError(f"OVH API error: {response.status} - {await response.text()}")
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8').strip()
+                if line:
+                    yield line
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+# ============
+# Class: CompletionAssembler
+# ------------
+# DESCRIPTION:
+#   Parses the upstream SSE lines of a streamed completion ("data: {...}" chunks,
+#   ending with "data: [DONE]") one at a time, returns each content delta, and
+#   rebuilds a response shaped like the non-streaming one for storage.
+# PARAMS: None
+# RETURNS: None
+# ============
+class CompletionAssembler:
+    def __init__(self):
+        self.parts: List[str] = []
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.usage: Optional[dict] = None
+        self.finish_reason: Optional[str] = None
+        self.done = False
+
+    # ============
+    # Function: feed
+    # ------------
+    # DESCRIPTION: Consume one raw stream line.
+    # PARAMS:
+    #   - line: str, raw line from OVHClient.stream()
+    # RETURNS: str content delta, or None if the line carries no text
+    # ============
+    def feed(self, line: str) -> Optional[str]:
+        if not line.startswith('data:'):
+            return None
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            self.done = True
+            return None
+        chunk = json.loads(data)
+        self.id = chunk.get('id', self.id)
+        self.model = chunk.get('model', self.model)
+        if chunk.get('usage'):
+            self.usage = chunk['usage']
+        delta = None
+        for choice in chunk.get('choices', []):
+            if choice.get('finish_reason'):
+                self.finish_reason = choice['finish_reason']
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                delta = (delta or '') + content
+        if delta:
+            self.parts.append(delta)
+        return delta
+
+    @property
+    def content(self) -> str:
+        return ''.join(self.parts)
+
+    # ============
+    # Function: result
+    # ------------
+    # DESCRIPTION: Assemble the final response in the non-streaming format.
+    # PARAMS: None
+    # RETURNS: dict
+    # ============
+    def result(self) -> dict:
+        response = {
+            'id': self.id,
+            'object': 'chat.completion',
+            'model': self.model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self.content},
+                'finish_reason': self.finish_reason
+            }]
+        }
+        if self.usage:
+            response['usage'] = self.usage
+        return response
+
+_client: Optional[OVHClient] = None
+
+# ============
+# Function: get_ovh_client
+# ------------
+# DESCRIPTION: Return the process-wide OVH client.
+# PARAMS: None
+# RETURNS: OVHClient
+# ============
+def get_ovh_client() -> OVHClient:
+    global _client
+    if _client is None:
+        _client = OVHClient()
+    return _client
+
+# ============
+# Function: close_ovh_client
+# ------------
+# DESCRIPTION: Close the pooled HTTP session of the process-wide client (on shutdown).
+# PARAMS: None
+# RETURNS: None
+# ============
+async def close_ovh_client() -> None:
+    if _client is not None:
+        await _client.close()
@@ -0,0 +1,138 @@
+"""
+Tool: bench_message_records
+------------
+DESCRIPTION:
+- Compares the memory held by a collected history in two representations:
+  - legacy: one dict of eight keys per message, with created_at and fetched_at datetimes (old collector output)
+  - records: collectors.message_stream.MessageRecord (slotted, created_at derived from the snowflake,
+    interned author names, fetched_at stamped once per stored batch)
+- Converts a synthetic history of raw API message objects (one message every 10 seconds, 50 authors)
+  both ways, keeps every message in memory like DiscordCollector.collect without on_batch, and reports
+  the retained memory (tracemalloc) and conversion time. Also checks that both give the same
+  discord_messages documents. No Discord token or MongoDB needed.
+USAGE: python scripts/bench_message_records.py --messages 1000000
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from nextcord.utils import snowflake_time, time_snowflake
+
+from collectors.message_stream import message_text, raw_message_record
+from storage.mongo_storage import to_message_doc
+
+AUTHORS = 50
+
+# ============
+# Function: synthetic_history
+# ------------
+# DESCRIPTION: Generate raw API message objects (as in a REST history page), oldest first, without keeping them.
+# PARAMS:
+#   - messages: int, number of messages
+#   - first_id: int, snowflake of the first message
+# RETURNS: Iterator[dict]
+# ============
+def synthetic_history(messages: int, first_id: int) -> Iterator[dict]:
+    for i in range(messages):
+        author = i % AUTHORS
+        yield {
+            "id": str(first_id + (i * 10_000 << 22)),
+            "channel_id": "1234567890123456789",
+            "content": f"message {i} about the weekly release, see the changelog",
+            "author": {"id": str(100_000_000_000_000_000 + author), "username": f"user{author}", "global_name": f"User {author}"},
+            "message_reference": {"message_id": str(first_id)} if i % 5 == 0 and i else None,
+            "attachments": [],
+            "embeds": [],
+        }
+
+# ============
+# Function: legacy_message_dict
+# ------------
+# DESCRIPTION: Previous collector conversion: a dict per message, with a datetime for created_at and one
+#   for fetched_at.
+# PARAMS:
+#   - data: dict, raw API message object
+# RETURNS: dict or None
+# ============
+def legacy_message_dict(data: dict) -> Optional[Dict[str, Any]]:
+    text = message_text(data.get("content"), [a["url"] for a in data.get("attachments", [])], bool(data.get("embeds")))
+    if not text.strip():
+        return None
+    author = data["author"]
+    parent_id = (data.get("message_reference") or {}).get("message_id")
+    message_id = int(data["id"])
+    return {
+        "id": message_id,
+        "channel_id": int(data["channel_id"]),
+        "parent_message_id": int(parent_id) if parent_id else None,
+        "author_name": author.get("global_name") or author["username"],
+        "author_user_id": int(author["id"]),
+        "content": text,
+        "created_at": snowflake_time(message_id),
+        "fetched_at": datetime.utcnow(),
+    }
+
+def legacy_message_doc(msg: dict) -> dict:
+    doc = dict(msg)
+    doc['_id'] = doc.pop('id')
+    doc['user_id'] = doc.pop('author_user_id')
+    if doc.get('parent_message_id') is None:
+        doc.pop('parent_message_id', None)
+    return doc
+
+# ============
+# Function: measure
+# ------------
+# DESCRIPTION: Convert the synthetic history and keep every message, measuring the memory retained by the
+#   result (the raw objects are freed as they are converted) and the elapsed time.
+# PARAMS:
+#   - convert: callable, raw API message -> message
+#   - messages: int, history size
+#   - first_id: int, snowflake of the first message
+# RETURNS: (List, retained bytes, seconds)
+# ============
+def measure(convert: Callable[[dict], Any], messages: int, first_id: int) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    collected: List[Any] = [convert(data) for data in synthetic_history(messages, first_id)]
+    elapsed = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return collected, retained, elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory of collected messages: dicts vs MessageRecord")
+    parser.add_argument("--messages", type=int, default=1_000_000, help="Messages in the synthetic history")
+    args = parser.parse_args()
+    first_id = time_snowflake(datetime.now(timezone.utc) - timedelta(seconds=10 * args.messages))
+
+    legacy, legacy_bytes, legacy_seconds = measure(legacy_message_dict, args.messages, first_id)
+    sample = [legacy_message_doc(msg) for msg in legacy[:1000:7]]
+    del legacy
+    records, record_bytes, record_seconds = measure(raw_message_record, args.messages, first_id)
+
+    fetched_at = datetime.utcnow()
+    for expected, record in zip(sample, records[:1000:7]):
+        doc = to_message_doc(record, fetched_at)
+        expected['fetched_at'] = fetched_at
+        if doc != expected:
+            print(f"FAILED: documents differ for message {record.id}:\n  {expected}\n  {doc}")
+            sys.exit(1)
+
+    print(f"{args.messages} messages kept in memory")
+    print(f"  legacy dicts:    {legacy_bytes / 2**20:8.1f} MiB ({legacy_bytes / args.messages:6.1f} B/message), {legacy_seconds:.2f}s")
+    print(f"  MessageRecord:   {record_bytes / 2**20:8.1f} MiB ({record_bytes / args.messages:6.1f} B/message), {record_seconds:.2f}s")
+    print(f"  saved: {(1 - record_bytes / legacy_bytes) * 100:.0f}% (same documents at the storage boundary)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Tool: bench_message_search
+------------
+DESCRIPTION:
+- Measures the message search of /discord/search (MongoStorage.search_discord_messages) on a synthetic
+  multi-server history:
+  - seeds --messages messages over --channels channels of --servers servers, spread over --span-days days,
+    into a scratch database (same text index as scripts/init_mongo.py: idx_server_content_text)
+  - runs frequent, rare and phrase queries in one server, scoped to one channel and to all its channels:
+    ranked by relevance over the API's default window (--relevance-days) and over the whole history, and by
+    recency; reports p50/p95 latencies, the searches over --max-time-ms (504s in the API) and the documents
+    examined (explain)
+  - fails if a query scans the collection, or if a default search (relevance over the default window, or
+    recency) has a p95 over --target-ms
+- Needs a MongoDB server (connection settings of storage.mongo_storage); the scratch database is dropped at
+  the end unless --keep.
+USAGE: python scripts/bench_message_search.py --messages 1000000 --db analyzer_search_bench
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from pymongo import IndexModel, ASCENDING, TEXT
+from pymongo.errors import ExecutionTimeout
+
+from storage.mongo_storage import MongoStorage
+
+# Zipf-like vocabulary: the first words are in most messages, the last ones in a few
+VOCABULARY = [f"word{i}" for i in range(20_000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+INSERT_BATCH = 10_000
+# Frequent, medium, rare word and a phrase
+QUERIES = ("word1", "word500", "word15000", '"word3 word7"')
+
+def server_of(channel_id: int, servers: int) -> int:
+    return (channel_id - 1) % servers + 1
+
+# ============
+# Function: seed
+# ------------
+# DESCRIPTION: Insert the synthetic messages (12 words each, evenly spread over the span, round-robin over
+#   the channels) and build the text index.
+# PARAMS:
+#   - storage: MongoStorage bound to the scratch database
+#   - messages: int, number of messages
+#   - channels: int, number of channels
+#   - servers: int, number of servers the channels belong to
+#   - span_days: int, history length
+# RETURNS: None
+# ============
+def seed(storage: MongoStorage, messages: int, channels: int, servers: int, span_days: int) -> None:
+    rng = random.Random(42)
+    start = datetime.utcnow() - timedelta(days=span_days)
+    step = timedelta(days=span_days) / messages
+    coll = storage.db.discord_messages
+    coll.drop()
+    started = time.perf_counter()
+    batch: List[dict] = []
+    for i in range(messages):
+        channel_id = i % channels + 1
+        batch.append({
+            '_id': i + 1,
+            'server_id': server_of(channel_id, servers),
+            'channel_id': channel_id,
+            'user_id': rng.randint(1, 500),
+            'author_name': f"user{i % 500}",
+            'content': " ".join(rng.choices(VOCABULARY, weights=WEIGHTS, k=12)),
+            'created_at': start + step * i,
+        })
+        if len(batch) >= INSERT_BATCH:
+            coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+    coll.create_indexes([
+        IndexModel(
+            [("server_id", ASCENDING), ("content", TEXT), ("channel_id", ASCENDING), ("created_at", ASCENDING)],
+            name="idx_server_content_text", default_language="none"
+        )
+    ])
+    print(f"Seeded {messages} messages in {channels} channels of {servers} servers in {time.perf_counter() - started:.1f}s")
+
+def plan_stages(plan: dict) -> Iterator[str]:
+    yield plan.get('stage', '')
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from plan_stages(child)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency and query plans of the Discord message search")
+    parser.add_argument("--messages", type=int, default=1_000_000, help="Messages to seed")
+    parser.add_argument("--channels", type=int, default=100, help="Channels to spread them over")
+    parser.add_argument("--servers", type=int, default=10, help="Servers the channels belong to")
+    parser.add_argument("--span-days", type=int, default=365, help="History length")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per query")
+    parser.add_argument("--max-time-ms", type=int, default=2000, help="Search time limit (SEARCH_MAX_TIME_MS of the API)")
+    parser.add_argument("--relevance-days", type=int, default=90, help="Default relevance window (SEARCH_RELEVANCE_DAYS of the API)")
+    parser.add_argument("--target-ms", type=float, default=1000, help="Max p95 of the default searches")
+    parser.add_argument("--db", default="analyzer_search_bench", help="Scratch database (dropped at the end)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse an already seeded scratch database")
+    args = parser.parse_args()
+
+    storage = MongoStorage()
+    storage.db = storage.client[args.db]
+    failures = []
+    try:
+        if not args.skip_seed:
+            seed(storage, args.messages, args.channels, args.servers, args.span_days)
+        server_channels = [c for c in range(1, args.channels + 1) if server_of(c, args.servers) == 1]
+        for text in QUERIES:
+            for scope, channel_ids in (("1 channel", server_channels[:1]), (f"{len(server_channels)} channels", server_channels)):
+                runs = (
+                    ("relevance", args.relevance_days, True),
+                    ("relevance", None, False),
+                    ("recent", None, True),
+                )
+                for sort, days, default in runs:
+                    since: Optional[datetime] = datetime.utcnow() - timedelta(days=days) if days else None
+                    label = f"{sort} {days}d" if days else f"{sort} all"
+                    latencies = []
+                    timeouts = 0
+                    results = []
+                    for _ in range(args.runs):
+                        started = time.perf_counter()
+                        try:
+                            results = storage.search_discord_messages(
+                                text, 1, channel_ids, sort=sort, limit=21, since=since, max_time_ms=args.max_time_ms
+                            )
+                        except ExecutionTimeout:
+                            timeouts += 1
+                        latencies.append(time.perf_counter() - started)
+                    latencies.sort()
+                    p95 = latencies[int(len(latencies) * 0.95) - 1]
+                    query = {'server_id': 1, '$text': {'$search': text}, 'channel_id': {'$in': channel_ids}}
+                    if since:
+                        query['created_at'] = {'$gte': since}
+                    explain = storage.db.discord_messages.find(query).explain()
+                    examined = explain.get('executionStats', {}).get('totalDocsExamined', '?')
+                    print(
+                        f"{text:>18} | {scope:>12} | {label:>14} | {len(results):2d} results | "
+                        f"p50 {statistics.median(latencies) * 1000:7.1f} ms | p95 {p95 * 1000:7.1f} ms | "
+                        f"{timeouts}/{args.runs} over {args.max_time_ms} ms | {examined} docs examined"
+                    )
+                    stages = set(plan_stages(explain['queryPlanner']['winningPlan']))
+                    if 'COLLSCAN' in stages or not stages & {'TEXT', 'TEXT_MATCH', 'TEXT_OR'}:
+                        failures.append(f"{text} on {scope}: plan {sorted(stages)}")
+                    if default and (timeouts or p95 * 1000 > args.target_ms):
+                        failures.append(f"{text} on {scope}, {label}: p95 {p95 * 1000:.0f} ms, {timeouts} timeouts")
+    finally:
+        if not args.keep:
+            storage.client.drop_database(args.db)
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"OK: every query used the text index, default searches under {args.target_ms:.0f} ms (p95)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Tool: bench_mongo_client
+------------
+DESCRIPTION:
+- Compares request latency with a new MongoClient per request (old MongoStorage behaviour)
+  against the shared pooled client returned by get_mongo_client().
+- Each "request" runs the same read as /discord/harvest/status/{job_id}.
+- Runs sequentially and with concurrent worker threads, like uvicorn's threadpool.
+USAGE: python scripts/bench_mongo_client.py --requests 200 --concurrency 16
+REQUIRES: a reachable MongoDB configured through .env.dev (MG_*)
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from pymongo import MongoClient
+
+from config.config import get_env_var
+from storage.mongo_storage import build_mongo_uri, get_client_options, get_mongo_client
+
+# ============
+# Function: request_with_new_client
+# ------------
+# DESCRIPTION: One request the way endpoints used to do it: new client, one query, close.
+# PARAMS: None
+# RETURNS: None
+# ============
+def request_with_new_client() -> None:
+    client = MongoClient(build_mongo_uri(), **get_client_options())
+    try:
+        client[get_env_var('MG_NAME')].discord_harvest_jobs.find_one({}, {"_id": 1})
+    finally:
+        client.close()
+
+# ============
+# Function: request_with_shared_client
+# ------------
+# DESCRIPTION: One request through the process-wide pooled client.
+# PARAMS: None
+# RETURNS: None
+# ============
+def request_with_shared_client() -> None:
+    get_mongo_client()[get_env_var('MG_NAME')].discord_harvest_jobs.find_one({}, {"_id": 1})
+
+# ============
+# Function: run
+# ------------
+# DESCRIPTION: Time `requests` calls of `fn` spread over `concurrency` threads.
+# PARAMS:
+#   - fn: request function
+#   - requests: int, number of requests
+#   - concurrency: int, number of worker threads
+# RETURNS: (List[float] latencies in ms, float wall time in s)
+# ============
+def run(fn: Callable[[], None], requests: int, concurrency: int):
+    def timed(_):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(requests)))
+    return latencies, time.perf_counter() - start
+
+def report(label: str, latencies: List[float], wall: float) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{label:<28} mean={statistics.mean(ordered):8.2f}ms  p50={statistics.median(ordered):8.2f}ms  "
+        f"p95={p95:8.2f}ms  throughput={len(ordered) / wall:8.1f} req/s"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MongoClient per request vs shared pooled client")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Warm up the shared client so its pool creation is not counted
+    request_with_shared_client()
+
+    for concurrency in (1, args.concurrency):
+        print(f"\n--- {args.requests} requests, concurrency={concurrency} ---")
+        report("new client per request", *run(request_with_new_client, args.requests, concurrency))
+        report("shared pooled client", *run(request_with_shared_client, args.requests, concurrency))
@@ -0,0 +1,112 @@
+"""
+Tool: bench_snowflake_bounds
+------------
+DESCRIPTION:
+- Compares harvesting a date window from a long channel history in two ways:
+  - legacy: page the whole history oldest first and filter created_at in Python (old daemon behaviour)
+  - bounded: translate the dates into snowflakes (after_snowflake / before_snowflake), start paging
+    at `after` and stop at `before`
+- Uses a local fake history source that pages 100 messages per request like Discord's
+  GET /channels/{id}/messages, with a configurable latency per page. No Discord token needed.
+USAGE: python scripts/bench_snowflake_bounds.py --years 5 --per-day 100 --window-days 7 --page-latency 0.005
+"""
+
+import argparse
+import asyncio
+import bisect
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from nextcord.utils import snowflake_time, time_snowflake
+
+from collectors.message_stream import after_snowflake, before_snowflake
+
+PAGE_SIZE = 100
+
+# ============
+# Class: FakeHistory
+# ------------
+# DESCRIPTION:
+#   In-memory channel history (sorted snowflakes) paged like channel.history(oldest_first=True):
+#   each page is one simulated API request of at most 100 messages after the last seen id.
+# PARAMS:
+#   - ids: List[int], sorted message snowflakes
+#   - page_latency: float, seconds slept per page request
+# RETURNS: None
+# ============
+class FakeHistory:
+    def __init__(self, ids: List[int], page_latency: float):
+        self.ids = ids
+        self.page_latency = page_latency
+        self.requests = 0
+
+    async def history(self, after: Optional[int] = None) -> AsyncIterator[int]:
+        position = bisect.bisect_right(self.ids, after) if after is not None else 0
+        while position < len(self.ids):
+            self.requests += 1
+            await asyncio.sleep(self.page_latency)
+            page = self.ids[position:position + PAGE_SIZE]
+            position += len(page)
+            for message_id in page:
+                yield message_id
+
+# ============
+# Function: build_history
+# ------------
+# DESCRIPTION: Generate evenly spaced message snowflakes over the last `years` years.
+# PARAMS:
+#   - now: datetime, end of the history (UTC)
+#   - years: int, history depth
+#   - per_day: int, messages per day
+# RETURNS: List[int]
+# ============
+def build_history(now: datetime, years: int, per_day: int) -> List[int]:
+    start = now - timedelta(days=365 * years)
+    step = timedelta(days=1) / per_day
+    total = 365 * years * per_day
+    return [time_snowflake(start + i * step) + i % 4096 for i in range(total)]
+
+async def harvest_legacy(source: FakeHistory, after: datetime, before: datetime) -> int:
+    count = 0
+    async for message_id in source.history():
+        created_at = snowflake_time(message_id)
+        if after <= created_at <= before:
+            count += 1
+    return count
+
+async def harvest_bounded(source: FakeHistory, after: datetime, before: datetime) -> int:
+    after_id = after_snowflake(after.isoformat())
+    before_id = before_snowflake(before.isoformat())
+    count = 0
+    async for message_id in source.history(after=after_id):
+        if message_id >= before_id:
+            break
+        count += 1
+    return count
+
+async def main(args: argparse.Namespace) -> None:
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    ids = build_history(now, args.years, args.per_day)
+    before = now - timedelta(days=args.window_days)
+    after = before - timedelta(days=args.window_days)
+    print(f"History: {len(ids)} messages over {args.years} years; window: {after} → {before}")
+
+    for name, harvest in (("legacy", harvest_legacy), ("bounded", harvest_bounded)):
+        source = FakeHistory(ids, args.page_latency)
+        started = time.perf_counter()
+        count = await harvest(source, after, before)
+        elapsed = time.perf_counter() - started
+        print(f"{name:8s} messages={count:7d} page_requests={source.requests:6d} time={elapsed:7.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark snowflake-bounded history paging against Python date filtering")
+    parser.add_argument("--years", type=int, default=5, help="History depth in years")
+    parser.add_argument("--per-day", type=int, default=100, help="Messages per day")
+    parser.add_argument("--window-days", type=int, default=7, help="Size of the harvested window (ending window-days ago)")
+    parser.add_argument("--page-latency", type=float, default=0.005, help="Simulated seconds per page request")
+    asyncio.run(main(parser.parse_args()))
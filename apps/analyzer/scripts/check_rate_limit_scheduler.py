@@ -0,0 +1,206 @@
+"""
+Tool: check_rate_limit_scheduler
+------------
+DESCRIPTION:
+- Self-check of the rate-limit scheduler (collectors.discord_http) against a local fake Discord HTTP server.
+- The fake server serves GET /api/v10/channels/{id}/messages (after/limit paging, newest first like Discord)
+  and enforces a per-channel bucket (--bucket-limit requests per --bucket-window seconds) plus a global
+  limit (--global-limit per second), with X-RateLimit-* headers and 429 responses when exceeded.
+- Checks:
+  - every channel is paged completely, oldest first, through the shared message engine
+  - the scheduler stays within the advertised buckets (429s received by the client are reported)
+  - with two jobs competing for the global limit, the higher priority one finishes first
+- No Discord token needed.
+USAGE: python scripts/check_rate_limit_scheduler.py --channels 8 --messages 1500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from aiohttp import web
+from nextcord.utils import time_snowflake
+
+from collectors.discord_http import DiscordHistoryClient, RateLimitScheduler
+from collectors.message_stream import StreamStats, stream_messages
+
+# ============
+# Class: FakeDiscord
+# ------------
+# DESCRIPTION:
+#   aiohttp app paging in-memory channel histories with Discord-like rate limits:
+#   fixed windows per channel bucket and a global window of one second.
+# PARAMS:
+#   - histories: Dict[int, List[dict]], raw messages per channel, oldest first
+#   - bucket_limit, bucket_window: requests allowed per channel window
+#   - global_limit: requests allowed per second overall
+#   - latency: seconds slept per request
+# RETURNS: None
+# ============
+class FakeDiscord:
+    def __init__(self, histories: Dict[int, List[dict]], bucket_limit: int, bucket_window: float, global_limit: int, latency: float):
+        self.histories = histories
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.global_limit = global_limit
+        self.latency = latency
+        self.windows: Dict[int, List[float]] = defaultdict(lambda: [0.0, 0])
+        self.global_window = [0.0, 0]
+        self.requests = 0
+        self.rejected = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/api/v10/channels/{channel_id}/messages', self.messages)
+        return app
+
+    async def messages(self, request: web.Request) -> web.Response:
+        now = time.monotonic()
+        self.requests += 1
+        if now - self.global_window[0] >= 1.0:
+            self.global_window[:] = [now, 0]
+        self.global_window[1] += 1
+        if self.global_window[1] > self.global_limit:
+            self.rejected += 1
+            retry_after = 1.0 - (now - self.global_window[0])
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": retry_after, "global": True},
+                status=429, headers={"X-RateLimit-Global": "true", "X-RateLimit-Scope": "global", "Retry-After": f"{retry_after:.3f}"}
+            )
+        channel_id = int(request.match_info['channel_id'])
+        window = self.windows[channel_id]
+        if now - window[0] >= self.bucket_window:
+            window[:] = [now, 0]
+        window[1] += 1
+        reset_after = self.bucket_window - (now - window[0])
+        headers = {
+            "X-RateLimit-Bucket": f"messages-{channel_id}",
+            "X-RateLimit-Limit": str(self.bucket_limit),
+            "X-RateLimit-Remaining": str(max(self.bucket_limit - window[1], 0)),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if window[1] > self.bucket_limit:
+            self.rejected += 1
+            return web.json_response(
+                {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                status=429, headers={**headers, "X-RateLimit-Scope": "user", "Retry-After": f"{reset_after:.3f}"}
+            )
+        await asyncio.sleep(self.latency)
+        after = int(request.query.get('after', 0))
+        limit = int(request.query.get('limit', 50))
+        page = [msg for msg in self.histories.get(channel_id, []) if int(msg["id"]) > after][:limit]
+        return web.json_response(list(reversed(page)), headers=headers)
+
+# ============
+# Function: build_histories
+# ------------
+# DESCRIPTION: Generate raw API message objects, one per minute, for each channel.
+# PARAMS:
+#   - channels: int, number of channels
+#   - per_channel: int, messages per channel
+# RETURNS: Dict[int, List[dict]]
+# ============
+def build_histories(channels: int, per_channel: int) -> Dict[int, List[dict]]:
+    start = datetime.now(timezone.utc) - timedelta(minutes=per_channel)
+    histories = {}
+    for channel_id in range(1, channels + 1):
+        histories[channel_id] = [
+            {
+                "id": str(time_snowflake(start + timedelta(minutes=i)) + channel_id),
+                "channel_id": str(channel_id),
+                "content": f"message {i}",
+                "author": {"id": str(1000 + i % 7), "username": f"user{i % 7}", "global_name": None},
+                "attachments": [],
+                "embeds": [],
+            }
+            for i in range(per_channel)
+        ]
+    return histories
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+async def drain(client: DiscordHistoryClient, channel_id: int, priority: int = 0) -> StreamStats:
+    stats = StreamStats(channel_id)
+    last_id = 0
+    async for message in stream_messages(FakeChannel(channel_id), stats=stats, history=client, priority=priority):
+        assert message.id > last_id, "messages out of order"
+        last_id = message.id
+    return stats
+
+async def main(args: argparse.Namespace) -> None:
+    histories = build_histories(args.channels, args.messages)
+    fake = FakeDiscord(histories, args.bucket_limit, args.bucket_window, args.global_limit, args.latency)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', args.port)
+    await site.start()
+    base_url = f"http://127.0.0.1:{args.port}/api/v10"
+    failures = []
+    try:
+        # 1. Many channels in parallel
+        client = DiscordHistoryClient(token="fake", base_url=base_url, scheduler=RateLimitScheduler(global_rate=args.global_rate))
+        started = time.perf_counter()
+        results = await asyncio.gather(*(drain(client, channel_id) for channel_id in histories))
+        elapsed = time.perf_counter() - started
+        await client.close()
+        pages = args.messages // 100 + 1
+        bucket_floor = (pages - 1) // args.bucket_limit * args.bucket_window
+        global_floor = args.channels * pages / args.global_rate
+        floor = max(bucket_floor, global_floor)
+        print(f"Parallel: {args.channels} channels x {args.messages} messages in {elapsed:.2f}s (rate-limit floor {floor:.2f}s)")
+        print(f"  scheduler: {client.scheduler.stats.summary()}")
+        print(f"  server: {fake.requests} requests, {fake.rejected} rejected with 429")
+        for stats in results:
+            if stats.messages != args.messages:
+                failures.append(f"channel {stats.channel_id}: {stats.messages}/{args.messages} messages")
+        if client.scheduler.stats.rate_limited:
+            failures.append(f"{client.scheduler.stats.rate_limited} requests hit a 429")
+
+        # 2. Priority: a backfill (priority 1) and a delta job (priority 0) each page half of the channels,
+        #    competing for the global limit; the delta job starts last but must finish first
+        client = DiscordHistoryClient(token="fake", base_url=base_url, scheduler=RateLimitScheduler(global_rate=args.global_rate))
+        channel_ids = list(histories)
+        half = len(channel_ids) // 2
+        finished = []
+
+        async def job(name: str, channels: List[int], priority: int) -> None:
+            await asyncio.gather(*(drain(client, channel_id, priority=priority) for channel_id in channels))
+            finished.append((name, round(time.perf_counter() - started, 2)))
+
+        started = time.perf_counter()
+        backfill = asyncio.create_task(job("backfill", channel_ids[:half], 1))
+        await asyncio.sleep(0.2)
+        await asyncio.gather(backfill, job("delta", channel_ids[half:], 0))
+        await client.close()
+        print(f"Priority: finish order {finished}; scheduler: {client.scheduler.stats.summary()}")
+        if global_floor <= bucket_floor:
+            print("  (channel buckets are the bottleneck, not the global limit: priority has nothing to arbitrate)")
+        elif finished[0][0] != "delta":
+            failures.append("priority 0 job did not finish first")
+    finally:
+        await runner.cleanup()
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the Discord rate-limit scheduler against a fake rate-limited server")
+    parser.add_argument("--channels", type=int, default=8, help="Channels paged in parallel")
+    parser.add_argument("--messages", type=int, default=1500, help="Messages per channel")
+    parser.add_argument("--bucket-limit", type=int, default=5, help="Requests per channel bucket window")
+    parser.add_argument("--bucket-window", type=float, default=0.5, help="Channel bucket window (seconds)")
+    parser.add_argument("--global-limit", type=int, default=50, help="Requests per second overall")
+    parser.add_argument("--global-rate", type=float, default=45, help="Client-side global pacing (requests per second)")
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per request")
+    parser.add_argument("--port", type=int, default=8766, help="Port of the fake server")
+    asyncio.run(main(parser.parse_args()))
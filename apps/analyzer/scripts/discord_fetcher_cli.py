@@ -5,14 +5,13 @@ DESCRIPTION:
 - Provides a reusable, stateful interface for interacting with Discord.
 - Maintains a persistent connection to the Discord gateway.
 - Lists all connected guilds (servers) and their readable text channels.
-- Fetches the entire message history from a specified channel.
+- Streams the message history of a specified channel (shared engine: collectors.message_stream).
 - Aggregates message content, attachments, and embeds.
 - Logs each major step for traceability and debugging.
 """
 
 import asyncio
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import AsyncIterator, Dict, List
 import sys
 import os
 
@@ -25,6 +24,7 @@ import nextcord
 from nextcord import Intents
 
 from config.config import load_env, get_env_var
+from collectors.message_stream import after_snowflake, before_snowflake, readable_text_channel, stream_messages, MessageRecord, StreamStats
 
 # ============
 # Class: DiscordFetcher
@@ -128,78 +128,43 @@ class DiscordFetcher:
             if ch.permissions_for(guild.me).read_messages
         ]
 
-    async def fetch_messages(
+    async def iter_messages(
         self,
         guild_id: int,
         channel_id: int,
-        after_id: int | None = None,          # ← NEW : delta fetch
-    ) -> List[Dict[str, Any]]:
+        after_id: int | None = None,          # ← delta fetch
+        before_id: int | None = None,
+        stats: StreamStats | None = None,
+    ) -> AsyncIterator[MessageRecord]:
         """
         ============
-        Function: fetch_messages
+        Function: iter_messages
         ------------
         DESCRIPTION:
-            Fetch every message in a text channel *after* `after_id`
-            (Snowflake). If `after_id` is None, the whole history is
-            returned. Attachments and embeds are appended inline.
+            Stream the messages of a text channel *after* `after_id`
+            and *before* `before_id` (Snowflakes, exclusive), oldest
+            first, through the shared extraction engine
+            (collectors.message_stream). If `after_id` is None, the
+            history is read from the beginning.
 
         PARAMS:
         - guild_id (int): Guild ID.
         - channel_id (int): Channel ID.
         - after_id (int | None): Snowflake ID of the last stored message.
+        - before_id (int | None): Snowflake upper bound (see before_snowflake for dates).
+        - stats (StreamStats | None): Metrics to update.
 
         RETURNS:
-            List[Dict] where each dict matches the DB schema:
-            {
-            'id'            : discord_id (BIGINT),
-            'channel_id'    : discord_id (BIGINT),
-            'author_user_id': discord_id (BIGINT),
-            'author_name'   : str,
-            'content'       : str,
-            'created_at'    : datetime,      # original timestamp (UTC)
-            'fetched_at'    : datetime       # retrieval timestamp (UTC)
-            }
+            AsyncIterator[MessageRecord]
+            (see collectors.message_stream.MessageRecord)
         ============
         """
         guild = self.client.get_guild(guild_id)
         if guild is None:
             raise ValueError(f"Guild {guild_id} not found")
-
-        channel = guild.get_channel(channel_id)
-        if not isinstance(channel, nextcord.TextChannel):
-            raise ValueError(f"Channel {channel_id} is not a text channel")
-
-        perms = channel.permissions_for(guild.me)
-        if not (perms.read_messages and perms.read_message_history):
-            raise ValueError(f"Missing permissions on channel {channel_id}")
-
-        history_kwargs = {"limit": None, "oldest_first": True}
-        if after_id is not None:
-            history_kwargs["after"] = nextcord.Object(id=after_id)
-
-        messages: List[Dict[str, Any]] = []
-        async for msg in channel.history(**history_kwargs):
-            text = msg.content or ""
-            if msg.attachments:
-                text += " [Attachments: " + ", ".join(a.url for a in msg.attachments) + "]"
-            if msg.embeds:
-                text += " [Embeds present]"
-
-            parent_id = msg.reference.message_id if msg.reference else None
-
-            messages.append(
-                {
-                    "id": int(msg.id),                   # ← Snowflake ID BIGINT
-                    "channel_id": int(channel_id),
-                    "parent_message_id": int(parent_id) if parent_id else None,
-                    "author_name": getattr(msg.author, 'display_name', msg.author.name),
-                    "author_user_id": int(msg.author.id),
-                    "content": text,
-                    "created_at": msg.created_at,        # datetime in UTC
-                    "fetched_at": datetime.utcnow(),
-                }
-            )
-        return messages
+        channel = readable_text_channel(guild, channel_id)
+        async for message in stream_messages(channel, after_id=after_id, before_id=before_id, stats=stats):
+            yield message
 
 # ============
 # CLI MODE
@@ -218,7 +183,11 @@ if __name__ == "__main__":
         print("  0. Quitter")
 
     parser = argparse.ArgumentParser(description="DiscordFetcher CLI - Explore guilds and channels")
+    parser.add_argument("--after", help="Start of period: ISO timestamp (UTC if naive) or snowflake ID")
+    parser.add_argument("--before", help="End of period: ISO timestamp (UTC if naive) or snowflake ID")
     args = parser.parse_args()
+    after_id = after_snowflake(args.after)
+    before_id = before_snowflake(args.before)
 
     load_env()
     token = get_env_var("DISCORD_BOT_TOKEN")
@@ -266,18 +235,19 @@ if __name__ == "__main__":
                 fetch = input("Voulez-vous afficher les messages de ce canal ? (o/n) : ").strip().lower()
                 if fetch == "o":
                     print("\nRécupération des messages...")
+                    stats = StreamStats(int(channel_id))
                     try:
-                        messages = await fetcher.fetch_messages(int(guild_id), int(channel_id))
-                        if not messages:
+                        async for msg in fetcher.iter_messages(int(guild_id), int(channel_id), after_id=after_id, before_id=before_id, stats=stats):
+                            print("-" * 40)
+                            print(f"Message Snowflake: {msg.id}")
+                            print(f"Auteur: {msg.author_name} (Snowflake: {msg.author_user_id})")
+                            print(f"Date: {msg.created_at}")
+                            print(f"Parent Snowflake: {msg.parent_message_id}")
+                            print(f"Contenu: {msg.content}")
+                        if not stats.messages:
                             print("Aucun message trouvé.")
                         else:
-                            for msg in messages:
-                                print("-" * 40)
-                                print(f"Message Snowflake: {msg['id']}")
-                                print(f"Auteur: {msg['author_name']} (Snowflake: {msg['author_user_id']})")
-                                print(f"Date: {msg['created_at']}")
-                                print(f"Parent Snowflake: {msg['parent_message_id']}")
-                                print(f"Contenu: {msg['content']}")
+                            print(f"\n{stats.summary()}")
                     except Exception as e:
                         print(f"Erreur lors du fetch: {e}")
                 else:
@@ -72,13 +72,15 @@ def get_last_message_id(mongo: MongoTool, channel_id: int):
 # PARAMS:
 #   - mongo (MongoTool): MongoTool instance
 #   - messages (List[dict]): List of messages to insert
+#   - guild_id (int): Server ID of the messages
 # RETURNS: None
 # ============
-def insert_new_messages(mongo: MongoTool, messages: List[dict]) -> None:
+def insert_new_messages(mongo: MongoTool, messages: List[dict], guild_id: int) -> None:
     docs = []
     for m in messages:
         doc = {
             '_id': Int64(m['id']),
+            'server_id': Int64(guild_id),
             'channel_id': Int64(m['channel_id']),
             'user_id': Int64(m['author_user_id']),
             'author_name': m['author_name'],
@@ -174,7 +176,7 @@ async def main():
                     new_messages = [m for m in new_messages if m['created_at'] <= before_dt]
                 except Exception:
                     pass
-            insert_new_messages(mongo, new_messages)
+            insert_new_messages(mongo, new_messages, args.guild)
             print(f"Channel {channel_id}: {len(new_messages)} new messages inserted.")
     finally:
         await fetcher.close()
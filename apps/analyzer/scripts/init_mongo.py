@@ -5,13 +5,18 @@ File: init_mongo_collections.py
 DESCRIPTION: Create MongoDB collections for Discord & YouTube harvesting
 with JSON Schema validation and indexes, using environment variables.
 USAGE: python init_mongo_collections.py
-REQUIRES: 'pymongo', 'python-dotenv'
+REQUIRES: 'pymongo', 'python-dotenv' (connection settings shared with storage.mongo_storage)
 """
 
 from datetime import timedelta
 import os
-from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
-from dotenv import load_dotenv
+import sys
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from config.config import get_env_var
+from storage.mongo_storage import get_mongo_client
 
 # ------------------------------------------------------------
 #               1) Helpers
@@ -34,20 +39,16 @@ def ttl_in_seconds(days: int) -> int:
 # ------------------------------------------------------------
 #               2) Load env & connect
 # ------------------------------------------------------------
-# Charger explicitement le fichier .env.dev à la racine du projet
-load_dotenv(dotenv_path="/Users/macleo/Desktop/Snowledge-collecte/.env.dev")
-
-MG_HOST     = os.getenv("MG_HOST", "localhost")
-MG_PORT     = os.getenv("MG_PORT")
-MG_NAME     = os.getenv("MG_NAME")
-MG_USER     = os.getenv("MG_USER")
-MG_PASSWORD = os.getenv("MG_PASSWORD")
+MG_HOST     = get_env_var("MG_HOST", "localhost")
+MG_PORT     = get_env_var("MG_PORT")
+MG_NAME     = get_env_var("MG_NAME")
+MG_USER     = get_env_var("MG_USER")
+MG_PASSWORD = get_env_var("MG_PASSWORD")
 
 if not all([MG_HOST, MG_PORT, MG_NAME, MG_USER, MG_PASSWORD]):
     raise EnvironmentError("Vérifie que MG_HOST, MG_PORT, MG_NAME, MG_USER et MG_PASSWORD sont définis dans .env.dev")
 
-MONGO_URI = MONGO_URI = f"mongodb://{MG_USER}:{MG_PASSWORD}@{MG_HOST}:{MG_PORT}/{MG_NAME}?authSource=admin"
-client    = MongoClient(MONGO_URI)
+client    = get_mongo_client()
 db        = client[MG_NAME]
 
 print(f"Connected to MongoDB at {MG_HOST}:{MG_PORT}, database '{MG_NAME}'")
@@ -91,12 +92,14 @@ definitions = {
                 "required": ["_id", "channel_id", "user_id", "created_at"],
                 "properties": {
                     "_id": make_long_schema("Message snowflake"),
+                    "server_id": make_long_schema("FK → discord_servers (guild of the channel)"),
                     "channel_id": make_long_schema("FK → discord_channels"),
                     "user_id": make_long_schema("FK → user table"),
                     "parent_message_id": make_long_schema("Parent message snowflake (if reply)"),
                     "content": {"bsonType": ["string", "null"]},
                     "created_at": {"bsonType": "date"},
-                    "fetched_at": {"bsonType": "date"}
+                    "fetched_at": {"bsonType": "date"},
+                    "edited_at": {"bsonType": "date", "description": "Last edit received through live ingestion"}
                 }
             }
         },
@@ -104,9 +107,52 @@ definitions = {
             IndexModel([("channel_id", ASCENDING), ("created_at", DESCENDING)], name="idx_channel_created"),
             IndexModel([("user_id", ASCENDING)], name="idx_user"),
             IndexModel([("parent_message_id", ASCENDING)], name="idx_parent"),
-            IndexModel([("fetched_at", DESCENDING)], name="idx_fetched_ttl", expireAfterSeconds=ttl_in_seconds(365))
+            IndexModel([("fetched_at", DESCENDING)], name="idx_fetched_ttl", expireAfterSeconds=ttl_in_seconds(365)),
+            # Full-text search (/discord/search): server_id prefix (one server's entries per term), channel_id
+            # and created_at suffixes filter the matches inside the index. No stemming: communities mix languages.
+            IndexModel(
+                [("server_id", ASCENDING), ("content", TEXT), ("channel_id", ASCENDING), ("created_at", ASCENDING)],
+                name="idx_server_content_text", default_language="none"
+            )
+        ],
+        # A collection has a single text index: the previous one must go first
+        "dropped_indexes": ["idx_content_text"]
+    },
+    "discord_channel_activity": {
+        "validator": {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["channel_id", "hour", "message_count"],
+                "properties": {
+                    "channel_id": make_long_schema("FK → discord_channels"),
+                    "hour": {"bsonType": "date", "description": "Start of the hourly bucket (UTC)"},
+                    "message_count": {"bsonType": ["int", "long"], "description": "Messages posted in the hour"},
+                    "reply_count": {"bsonType": ["int", "long"], "description": "Replies posted in the hour"},
+                    "authors": {"bsonType": "object", "description": "user_id → messages posted in the hour"},
+                    "author_names": {"bsonType": "object", "description": "user_id → last seen author name"},
+                    "updated_at": {"bsonType": "date"}
+                }
+            }
+        },
+        "indexes": [
+            IndexModel([("channel_id", ASCENDING), ("hour", ASCENDING)], name="idx_channel_hour", unique=True),
+            IndexModel([("hour", DESCENDING)], name="idx_hour_ttl", expireAfterSeconds=ttl_in_seconds(365))
         ]
     },
+    "channel_harvest_state": {
+        "validator": {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["_id", "last_message_id"],
+                "properties": {
+                    "_id": make_long_schema("Channel snowflake"),
+                    "last_message_id": make_long_schema("Newest harvested message snowflake (high-water mark)"),
+                    "updated_at": {"bsonType": "date"}
+                }
+            }
+        },
+        "indexes": []
+    },
     "discord_harvest_jobs": {
         "validator": {
             "$jsonSchema": {
@@ -122,16 +168,33 @@ definitions = {
                     },
                     "after": make_string_schema("ISO timestamp or snowflake ID for start of period"),
                     "before": make_string_schema("ISO timestamp or snowflake ID for end of period"),
+                    "full_backfill": {"bsonType": "bool", "description": "Re-read whole channel histories instead of resuming from channel_harvest_state"},
                     "status": make_string_schema("Job status: pending, done, failed, running"),
                     "created_at": {"bsonType": "date", "description": "Job creation date"},
+                    "started_at": {"bsonType": "date", "description": "Job claim date"},
                     "finished_at": {"bsonType": "date", "description": "Job finish date"},
+                    "worker": make_string_schema("Daemon worker that ran the job (host:pid/index)"),
+                    "lease_expires_at": {"bsonType": "date", "description": "End of the claiming worker's lease, renewed while running"},
+                    "attempts": {"bsonType": "int", "description": "Number of claims (1 + lease expirations reclaimed)"},
+                    "queue_wait_seconds": {"bsonType": "double", "description": "Time spent pending before being claimed"},
+                    "duration_seconds": {"bsonType": "double", "description": "Time spent running"},
                     "inserted": {"bsonType": "int", "description": "Number of inserted messages"},
+                    "progress": {
+                        "bsonType": "object",
+                        "description": "Running totals, updated after each stored batch",
+                        "properties": {
+                            "fetched": {"bsonType": ["int", "long"]},
+                            "inserted": {"bsonType": ["int", "long"]},
+                            "updated_at": {"bsonType": "date"}
+                        }
+                    },
                     "error": make_string_schema("Error message if failed")
                 }
             }
         },
         "indexes": [
             IndexModel([("status", ASCENDING)], name="idx_status"),
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="idx_status_created"),
             IndexModel([("created_at", DESCENDING)], name="idx_created"),
             IndexModel([("serverId", ASCENDING)], name="idx_server")
         ]
@@ -251,6 +314,50 @@ definitions = {
             IndexModel([("source_analysis_id", ASCENDING)], name="idx_source_analysis", sparse=True)
         ]
     },
+    "analysis_jobs": {
+        "validator": {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["params", "status", "created_at"],
+                "properties": {
+                    "params": {"bsonType": "object", "description": "DiscordAnalyzeRequest fields"},
+                    "force_refresh": {"bsonType": "bool"},
+                    "status": make_string_schema("Job status: pending, running, done, failed"),
+                    "created_at": {"bsonType": "date", "description": "Job creation date"},
+                    "started_at": {"bsonType": "date", "description": "Job start date"},
+                    "finished_at": {"bsonType": "date", "description": "Job finish date"},
+                    "worker": make_string_schema("Analysis worker that ran the job (host:pid/index)"),
+                    "lease_expires_at": {"bsonType": "date", "description": "End of the claiming worker's lease, renewed while running"},
+                    "attempts": {"bsonType": "int", "description": "Number of claims (1 + lease expirations reclaimed)"},
+                    "analysis_id": {"bsonType": "objectId", "description": "Resulting analysis_results document"},
+                    "error": make_string_schema("Error message if failed")
+                }
+            }
+        },
+        "indexes": [
+            IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="idx_status_created"),
+            IndexModel([("finished_at", DESCENDING)], name="idx_finished_ttl", expireAfterSeconds=ttl_in_seconds(30))
+        ]
+    },
+    "llm_cache": {
+        "validator": {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["_id", "result", "created_at", "expires_at"],
+                "properties": {
+                    "_id": make_string_schema("sha256 of (model, prompt config, input)"),
+                    "result": {"bsonType": "object"},
+                    "model": make_string_schema("LLM model name"),
+                    "prompt_key": make_string_schema("Prompt template key"),
+                    "created_at": {"bsonType": "date"},
+                    "expires_at": {"bsonType": "date"}
+                }
+            }
+        },
+        "indexes": [
+            IndexModel([("expires_at", ASCENDING)], name="idx_expires_ttl", expireAfterSeconds=0)
+        ]
+    },
 }
 
 # ------------------------------------------------------------
@@ -264,6 +371,23 @@ for name, cfg in definitions.items():
     else:
         print(f"• Creating collection '{name}'")
         coll = db.create_collection(name, validator=cfg["validator"])
-    coll.create_indexes(cfg["indexes"])
+    for index_name in cfg.get("dropped_indexes", []):
+        if index_name in coll.index_information():
+            print(f"  - dropping superseded index '{index_name}'")
+            coll.drop_index(index_name)
+    if cfg["indexes"]:
+        coll.create_indexes(cfg["indexes"])
+
+# ------------------------------------------------------------
+#               5) Backfills
+# ------------------------------------------------------------
+# server_id of messages stored before it was denormalized (prefix of the search index)
+for channel in db.discord_channels.find({}, {"server_id": 1}):
+    result = db.discord_messages.update_many(
+        {"channel_id": channel["_id"], "server_id": {"$exists": False}},
+        {"$set": {"server_id": channel["server_id"]}}
+    )
+    if result.modified_count:
+        print(f"• Backfilled server_id of {result.modified_count} messages of channel {channel['_id']}")
 
 print("Initialization complete ✅")
\ No newline at end of file
@@ -1,23 +1,16 @@
 from datetime import datetime
 import os
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import sys
 
-# Charger le .env.dev à la racine du projet
-load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../../.env.dev'))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-MG_HOST     = os.getenv("MG_HOST", "localhost")
-MG_PORT     = os.getenv("MG_PORT", "27017")
-MG_NAME     = os.getenv("MG_NAME")
-MG_USER     = os.getenv("MG_USER")
-MG_PASSWORD = os.getenv("MG_PASSWORD")
+from config.config import get_env_var
+from storage.mongo_storage import MongoStorage
 
-if not all([MG_HOST, MG_PORT, MG_NAME, MG_USER, MG_PASSWORD]):
+if not all(get_env_var(key) for key in ("MG_HOST", "MG_PORT", "MG_NAME", "MG_USER", "MG_PASSWORD")):
     raise EnvironmentError("Vérifie que MG_HOST, MG_PORT, MG_NAME, MG_USER et MG_PASSWORD sont définis dans .env.dev")
 
-MONGO_URI = f"mongodb://{MG_USER}:{MG_PASSWORD}@{MG_HOST}:{MG_PORT}/{MG_NAME}?authSource=admin"
-client    = MongoClient(MONGO_URI)
-db        = client[MG_NAME]
+storage = MongoStorage()
 
 # Renseigne ici les valeurs souhaitées
 AFTER = ""  # exemple: "2024-06-01T00:00:00" ou ""
@@ -36,5 +29,5 @@ if AFTER:
 if BEFORE:
     job["before"] = BEFORE
 
-db.discord_harvest_jobs.insert_one(job)
+storage.add_harvest_job(job)
 print("Job inserted !")
\ No newline at end of file
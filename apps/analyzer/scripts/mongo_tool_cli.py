@@ -10,7 +10,6 @@ Simple interface for CRUD operations on MongoDB collections:
 import os
 import sys
 from typing import List, Dict, Any, Optional
-from pymongo import MongoClient
 
 # ============
 # Add project root to PYTHONPATH for robust absolute imports
@@ -18,6 +17,7 @@ from pymongo import MongoClient
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from config.config import load_env, get_env_var
+from storage.mongo_storage import get_mongo_client
 
 # ============
 # Class: MongoTool
@@ -40,9 +40,7 @@ class MongoTool:
         ============
         """
         load_env()
-        self.client = MongoClient(
-            f"mongodb://{get_env_var('MG_USER')}:{get_env_var('MG_PASSWORD')}@{get_env_var('MG_HOST')}:{get_env_var('MG_PORT')}/{get_env_var('MG_NAME')}?authSource=admin"
-        )
+        self.client = get_mongo_client()
         self.db = self.client[get_env_var('MG_NAME')]
 
     # ============
@@ -1,11 +1,13 @@
 import sys
 import os
 import json
+import asyncio
 from pathlib import Path
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from llm.analyse import load_yaml, analyse
+from llm.ovh_client import close_ovh_client
 
 # Exemple de message formaté depuis MongoDB
 EXAMPLE_MESSAGES = [
@@ -78,16 +80,22 @@ def main():
     # Ask for streaming
     stream = input("Enable streaming output? (y/N): ").strip().lower() == 'y'
 
+    async def run():
+        try:
+            if stream:
+                print("\nStreaming output:")
+                async for chunk in await analyse(model_name, prompt_name, messages, stream=True):
+                    print(chunk, end='', flush=True)
+                print()
+            else:
+                result = await analyse(model_name, prompt_name, messages)
+                print("\nResult:")
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+        finally:
+            await close_ovh_client()
+
     try:
-        if stream:
-            print("\nStreaming output:")
-            for chunk in analyse(model_name, prompt_name, messages, stream=True):
-                print(chunk, end='', flush=True)
-            print()
-        else:
-            result = analyse(model_name, prompt_name, messages)
-            print("\nResult:")
-            print(json.dumps(result, indent=2, ensure_ascii=False))
+        asyncio.run(run())
     except Exception as e:
         print(f"Error: {e}")
 
@@ -0,0 +1,46 @@
+"""
+Module: async_mongo_storage.py
+------------------------
+DESCRIPTION: Asyncio adapter over MongoStorage: every storage method runs in a dedicated thread pool, so pymongo round trips never block the event loop. Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from config.config import get_env_var
+from storage.mongo_storage import MongoStorage
+
+class AsyncMongoStorage:
+    """
+    ============
+    Class: AsyncMongoStorage
+    ------------
+    DESCRIPTION: Exposes each MongoStorage method as a coroutine run in a thread pool (`await storage.get_next_pending_job(...)`). Raw collections (`db`) are deliberately not exposed: every query goes through a MongoStorage method.
+    PARAMS:
+    - storage (MongoStorage|None): Wrapped storage (default: new MongoStorage on the shared client)
+    - max_workers (int|None): Threads of the pool (default env MG_ASYNC_WORKERS, 16); keep it under the Mongo pool size
+    RETURNS: None
+    ============
+    """
+    def __init__(self, storage: Optional[MongoStorage] = None, max_workers: Optional[int] = None):
+        self.sync = storage or MongoStorage()
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(max_workers or get_env_var('MG_ASYNC_WORKERS', '16')),
+            thread_name_prefix='mongo-storage'
+        )
+
+    def __getattr__(self, name: str) -> Callable[..., Any]:
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            raise AttributeError(f"AsyncMongoStorage only exposes MongoStorage methods, not '{name}'")
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        return call
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -4,9 +4,147 @@ Module: mongo_storage.py
 DESCRIPTION: Centralizes all MongoDB read/write logic for Discord, YouTube, and other platforms. This module is intended to be imported and used by orchestrators (CLI, API, etc.) and should not be run directly. Do not add sys.path manipulations here; handle PYTHONPATH in entry scripts only.
 """
 
-from typing import List, Dict, Any, Optional
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterator, Optional
 from config.config import load_env, get_env_var
-from pymongo import MongoClient
+from config.metrics import MONGO_WRITE_LATENCY
+from pymongo import MongoClient, ReturnDocument, InsertOne, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+from dateutil.parser import parse as parse_date
+
+# One client (and thus one connection pool + monitor threads) per process
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+# MongoStorage bound to that client (see get_shared_storage)
+_storage: Optional["MongoStorage"] = None
+
+DUPLICATE_KEY_ERROR = 11000
+# Recency windows (days) tried in turn by the 'recent' message search before searching the whole history
+SEARCH_RECENT_WINDOWS = (1, 7, 30, 180)
+
+def build_mongo_uri() -> str:
+    """
+    ============
+    Function: build_mongo_uri
+    ------------
+    DESCRIPTION: Build the MongoDB connection URI from environment variables.
+    PARAMS: None
+    RETURNS: str
+    ============
+    """
+    load_env()
+    return f"mongodb://{get_env_var('MG_USER')}:{get_env_var('MG_PASSWORD')}@{get_env_var('MG_HOST', 'localhost')}:{get_env_var('MG_PORT', '27017')}/{get_env_var('MG_NAME')}?authSource=admin"
+
+def get_client_options() -> Dict[str, Any]:
+    """
+    ============
+    Function: get_client_options
+    ------------
+    DESCRIPTION: Pool size, timeouts and wire compression of the shared client, configurable through environment variables.
+    PARAMS: None
+    RETURNS: dict of MongoClient keyword arguments
+    ============
+    """
+    options = {
+        "maxPoolSize": int(get_env_var("MG_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(get_env_var("MG_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(get_env_var("MG_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(get_env_var("MG_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(get_env_var("MG_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "waitQueueTimeoutMS": int(get_env_var("MG_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+    }
+    socket_timeout = get_env_var("MG_SOCKET_TIMEOUT_MS")
+    if socket_timeout:
+        options["socketTimeoutMS"] = int(socket_timeout)
+    # e.g. "zstd,snappy,zlib" (zstd/snappy need their optional python packages)
+    compressors = get_env_var("MG_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def get_mongo_client() -> MongoClient:
+    """
+    ============
+    Function: get_mongo_client
+    ------------
+    DESCRIPTION: Return the process-wide MongoClient, creating it on first use. A forked child gets its own client (MongoClient is not fork-safe).
+    PARAMS: None
+    RETURNS: MongoClient
+    ============
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(build_mongo_uri(), **get_client_options())
+                _client_pid = pid
+    return _client
+
+def close_mongo_client() -> None:
+    """
+    ============
+    Function: close_mongo_client
+    ------------
+    DESCRIPTION: Close the process-wide MongoClient (on shutdown). The next get_mongo_client() call creates a new one.
+    PARAMS: None
+    RETURNS: None
+    ============
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+def to_message_doc(msg, fetched_at: datetime) -> dict:
+    """
+    ============
+    Function: to_message_doc
+    ------------
+    DESCRIPTION: Convert a collected message record into a discord_messages document: the snowflake becomes '_id', 'author_user_id' becomes 'user_id', 'created_at' is taken from the snowflake, and a None parent or server is left out (the schema expects a long or no field).
+    PARAMS:
+    - msg (MessageRecord): Collected message (see collectors.message_stream)
+    - fetched_at (datetime): Retrieval time, shared by the messages of a batch
+    RETURNS: dict
+    ============
+    """
+    doc = {
+        '_id': msg.id,
+        'channel_id': msg.channel_id,
+        'user_id': msg.author_user_id,
+        'author_name': msg.author_name,
+        'content': msg.content,
+        'created_at': msg.created_at,
+        'fetched_at': fetched_at,
+    }
+    # Mongo expects a long or no field
+    if msg.parent_message_id is not None:
+        doc['parent_message_id'] = msg.parent_message_id
+    if msg.server_id is not None:
+        doc['server_id'] = msg.server_id
+    return doc
+
+def hour_bucket(created_at) -> datetime:
+    """
+    ============
+    Function: hour_bucket
+    ------------
+    DESCRIPTION: Truncate a message date to its activity rollup bucket (start of the hour, naive UTC).
+    PARAMS: created_at (datetime | str) - Message date, aware or naive UTC, or ISO string
+    RETURNS: datetime
+    ============
+    """
+    if isinstance(created_at, str):
+        created_at = parse_date(created_at)
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at.replace(minute=0, second=0, microsecond=0)
 
 class MongoStorage:
     """
@@ -14,25 +152,24 @@ class MongoStorage:
     Class: MongoStorage
     ------------
     DESCRIPTION: Handles storage and retrieval of all collections in MongoDB for Discord, YouTube, and other platforms.
-    PARAMS: None (connection info loaded from env)
+    PARAMS: client (MongoClient|None) - defaults to the shared process-wide client
     RETURNS: None
     ============
     """
 
-    def __init__(self):
+    def __init__(self, client: Optional[MongoClient] = None):
         """
         ============
         Function: __init__
         ------------
-        DESCRIPTION: Initialize MongoDB connection using environment variables.
-        PARAMS: None
+        DESCRIPTION: Bind to MongoDB. Cheap: reuses the shared pooled client unless one is given.
+        PARAMS:
+        - client (MongoClient|None): Client to use. If None, the process-wide client is used.
         RETURNS: None
         ============
         """
         load_env()
-        self.client = MongoClient(
-            f"mongodb://{get_env_var('MG_USER')}:{get_env_var('MG_PASSWORD')}@{get_env_var('MG_HOST')}:{get_env_var('MG_PORT')}/{get_env_var('MG_NAME')}?authSource=admin"
-        )
+        self.client = client or get_mongo_client()
         self.db = self.client[get_env_var('MG_NAME')]
 
     # ===== Discord =====
@@ -49,42 +186,303 @@ class MongoStorage:
         query = {'server_id': server_id} if server_id else {}
         return list(self.db.discord_channels.find(query))
 
+    def get_discord_channel_ids(self) -> List[int]:
+        return self.db.discord_channels.distinct('_id')
+
     def add_discord_channel(self, channel: Dict[str, Any]) -> Any:
         return self.db.discord_channels.insert_one(channel).inserted_id
 
     def delete_discord_channel(self, channel_id: int) -> Any:
         return self.db.discord_channels.delete_one({'_id': channel_id})
 
-    def save_discord_messages(self, messages: List[dict]) -> None:
+    def ensure_discord_server_and_channels(self, server: Dict[str, Any], channels: List[Dict[str, Any]]) -> None:
+        """
+        ============
+        Function: ensure_discord_server_and_channels
+        ------------
+        DESCRIPTION: Register a guild and its channels if absent, with $setOnInsert upserts (one round trip per collection, existing documents untouched).
+        PARAMS:
+        - server (dict): discord_servers document (_id, user_id, name)
+        - channels (List[dict]): discord_channels documents (_id, name, server_id)
+        RETURNS: None
+        ============
+        """
+        self.db.discord_servers.update_one({'_id': server['_id']}, {'$setOnInsert': server}, upsert=True)
+        if channels:
+            self.db.discord_channels.bulk_write(
+                [UpdateOne({'_id': ch['_id']}, {'$setOnInsert': ch}, upsert=True) for ch in channels],
+                ordered=False
+            )
+
+    def save_discord_messages(self, messages: list, batch_size: int = 1000) -> Dict[str, int]:
         """
         ============
         Function: save_discord_messages
         ------------
-        DESCRIPTION: Insert a list of Discord messages into the database, adapting field names and types to match the MongoDB schema.
-        PARAMS: messages (List[dict]) - List of Discord message dicts to insert.
+        DESCRIPTION: Insert a list of collected Discord messages into the database with unordered bulk inserts, counting duplicates as skipped. Activity rollups are updated for the inserted messages only.
+        PARAMS:
+        - messages (List[MessageRecord]): Collected messages to insert (see collectors.message_stream, not modified).
+        - batch_size (int): Messages per bulk_write.
+        RETURNS: Dict[str, int] - {"inserted": n, "skipped": n}
+        ============
+        """
+        counts = {"inserted": 0, "skipped": 0}
+        for start in range(0, len(messages), batch_size):
+            fetched_at = datetime.utcnow()
+            docs = [to_message_doc(msg, fetched_at) for msg in messages[start:start + batch_size]]
+            duplicates = set()
+            try:
+                with MONGO_WRITE_LATENCY.labels(operation='insert_messages').time():
+                    self.db.discord_messages.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors) or e.details.get("writeConcernErrors"):
+                    raise
+                duplicates = {err["index"] for err in errors}
+            inserted = [doc for i, doc in enumerate(docs) if i not in duplicates]
+            counts["inserted"] += len(inserted)
+            counts["skipped"] += len(duplicates)
+            if inserted:
+                self.update_channel_activity(inserted)
+        return counts
+
+    def update_channel_activity(self, messages: List[dict], step: int = 1) -> None:
+        """
+        ============
+        Function: update_channel_activity
+        ------------
+        DESCRIPTION: Fold inserted (or, with step=-1, deleted) messages into the hourly per-channel rollups of discord_channel_activity.
+        PARAMS:
+        - messages (List[dict]): Inserted message documents (Mongo schema: _id, channel_id, user_id, parent_message_id, created_at)
+        - step (int): 1 for inserted messages, -1 for deleted ones
         RETURNS: None
         ============
         """
-        cleaned = []
+        buckets: Dict[tuple, Dict[str, Any]] = {}
         for msg in messages:
-            # Ensure '_id' is the Discord message snowflake (int)
-            if 'id' in msg:
-                msg['_id'] = msg.pop('id')
-            # Rename 'author_user_id' to 'user_id' if present
-            if 'author_user_id' in msg:
-                msg['user_id'] = msg.pop('author_user_id')
-            # Remove 'parent_message_id' if None (Mongo expects long or not present)
-            if msg.get('parent_message_id') is None:
-                msg.pop('parent_message_id', None)
-            # Remove any field with value None that is not allowed by schema
-            # (add more fields here if needed)
-            cleaned.append(msg)
-        if cleaned:
-            self.db.discord_messages.insert_many(cleaned)
+            key = (msg['channel_id'], hour_bucket(msg['created_at']))
+            bucket = buckets.setdefault(key, {'inc': {}, 'names': {}})
+            inc = bucket['inc']
+            inc['message_count'] = inc.get('message_count', 0) + step
+            if msg.get('parent_message_id') is not None:
+                inc['reply_count'] = inc.get('reply_count', 0) + step
+            author = str(msg.get('user_id'))
+            inc[f'authors.{author}'] = inc.get(f'authors.{author}', 0) + step
+            if msg.get('author_name'):
+                bucket['names'][f'author_names.{author}'] = msg['author_name']
+        if not buckets:
+            return
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {'channel_id': channel_id, 'hour': hour},
+                {'$inc': bucket['inc'], '$set': {'updated_at': now, **bucket['names']}},
+                upsert=step > 0
+            )
+            for (channel_id, hour), bucket in buckets.items()
+        ]
+        with MONGO_WRITE_LATENCY.labels(operation='activity_rollup').time():
+            self.db.discord_channel_activity.bulk_write(requests, ordered=False)
+
+    def update_discord_message_contents(self, contents: Dict[int, str]) -> int:
+        """
+        ============
+        Function: update_discord_message_contents
+        ------------
+        DESCRIPTION: Apply message edits (new content and edited_at) with one unordered bulk write. Messages that are not stored are left alone.
+        PARAMS: contents (Dict[int, str]) - Message snowflake → new stored text
+        RETURNS: int - number of modified messages
+        ============
+        """
+        if not contents:
+            return 0
+        now = datetime.utcnow()
+        result = self.db.discord_messages.bulk_write(
+            [UpdateOne({'_id': message_id}, {'$set': {'content': text, 'edited_at': now}}) for message_id, text in contents.items()],
+            ordered=False
+        )
+        return result.modified_count
+
+    def delete_discord_messages(self, message_ids: List[int]) -> int:
+        """
+        ============
+        Function: delete_discord_messages
+        ------------
+        DESCRIPTION: Delete stored messages and take them out of the activity rollups. Unknown ids are ignored.
+        PARAMS: message_ids (List[int]) - Message snowflakes
+        RETURNS: int - number of deleted messages
+        ============
+        """
+        if not message_ids:
+            return 0
+        # One find_one_and_delete per message: only the documents this call actually removed are taken out of
+        # the rollups, so concurrent deletions of the same message (daemon replicas) decrement once
+        deleted = []
+        for message_id in set(message_ids):
+            doc = self.db.discord_messages.find_one_and_delete(
+                {'_id': message_id},
+                {'channel_id': 1, 'user_id': 1, 'parent_message_id': 1, 'created_at': 1}
+            )
+            if doc:
+                deleted.append(doc)
+        self.update_channel_activity(deleted, step=-1)
+        return len(deleted)
+
+    def get_channel_activity(self, channel_id: int, since: datetime, until: datetime) -> List[dict]:
+        """
+        ============
+        Function: get_channel_activity
+        ------------
+        DESCRIPTION: Hourly activity buckets of a channel over a period, oldest first.
+        PARAMS:
+        - channel_id (int): Channel snowflake
+        - since (datetime): Start of period (UTC)
+        - until (datetime): End of period (UTC)
+        RETURNS: List[dict] - discord_channel_activity documents (without _id and channel_id)
+        ============
+        """
+        return list(self.db.discord_channel_activity.find(
+            {'channel_id': channel_id, 'hour': {'$gte': hour_bucket(since), '$lte': until}},
+            {'_id': 0, 'channel_id': 0},
+            sort=[('hour', ASCENDING)]
+        ))
+
+    def search_discord_messages(
+        self,
+        text: str,
+        server_id: int,
+        channel_ids: List[int],
+        sort: str = 'relevance',
+        skip: int = 0,
+        limit: int = 20,
+        since: Optional[datetime] = None,
+        max_time_ms: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        ============
+        Function: search_discord_messages
+        ------------
+        DESCRIPTION: Full-text search of a server's messages within channels, by relevance (text score) or by recency.
+        PARAMS:
+        - text (str): $text search string (words, "exact phrases", -excluded words)
+        - server_id (int): Guild snowflake (equality prefix of the text index)
+        - channel_ids (List[int]): Channels of that guild to search
+        - sort (str): 'relevance' or 'recent'
+        - skip (int): Matches to skip (pagination)
+        - limit (int): Max matches to return
+        - since (datetime|None): Only messages created from this date (UTC)
+        - max_time_ms (int|None): Server-side time limit of the whole search (ExecutionTimeout beyond)
+        RETURNS: List[dict] - message documents (_id, channel_id, user_id, author_name, content, created_at, parent_message_id) with their text 'score'
+        ============
+        """
+        query: Dict[str, Any] = {'server_id': server_id, '$text': {'$search': text}, 'channel_id': {'$in': channel_ids}}
+        if since:
+            query['created_at'] = {'$gte': since}
+        deadline = time.monotonic() + max_time_ms / 1000 if max_time_ms else None
+        if sort != 'recent':
+            order = [('score', {'$meta': 'textScore'}), ('created_at', DESCENDING)]
+            return self._find_text_matches(query, order, skip, limit, deadline)
+        order = [('created_at', DESCENDING)]
+        now = datetime.utcnow()
+        for days in SEARCH_RECENT_WINDOWS:
+            start = now - timedelta(days=days)
+            if since and start <= since:
+                break
+            # A window holding enough matches already contains the newest ones
+            matches = self._find_text_matches(dict(query, created_at={'$gte': start}), order, 0, skip + limit, deadline)
+            if len(matches) >= skip + limit:
+                return matches[skip:]
+        return self._find_text_matches(query, order, skip, limit, deadline)
+
+    def _find_text_matches(self, query: Dict[str, Any], order: List[tuple], skip: int, limit: int, deadline: Optional[float]) -> List[dict]:
+        projection = {
+            'channel_id': 1, 'user_id': 1, 'author_name': 1, 'content': 1, 'created_at': 1, 'parent_message_id': 1,
+            'score': {'$meta': 'textScore'}
+        }
+        cursor = self.db.discord_messages.find(query, projection).sort(order).skip(skip).limit(limit)
+        if deadline is not None:
+            # Time left of the whole search; once spent, the server aborts the query (ExecutionTimeout)
+            cursor = cursor.max_time_ms(max(int((deadline - time.monotonic()) * 1000), 1))
+        return list(cursor)
 
     def get_discord_messages(self, filters: Optional[dict] = None) -> List[dict]:
         return list(self.db.discord_messages.find(filters or {}))
 
+    def iter_discord_messages_for_analysis(self, channel_id: int, since: datetime, until: datetime, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        ============
+        Function: iter_discord_messages_for_analysis
+        ------------
+        DESCRIPTION: Stream a channel's messages over a period, oldest first, with only the fields a prompt needs. The sort runs server-side on idx_channel_created (channel_id, created_at) and documents arrive in cursor batches, so memory does not grow with the period size.
+        PARAMS:
+        - channel_id (int): Channel snowflake
+        - since (datetime): Start of period (inclusive, UTC)
+        - until (datetime): End of period (inclusive, UTC)
+        - batch_size (int): Documents per cursor batch
+        RETURNS: Iterator[dict] with created_at, author_name, user_id, content
+        ============
+        """
+        return self.db.discord_messages.find(
+            {"channel_id": channel_id, "created_at": {"$gte": since, "$lte": until}},
+            {"_id": 0, "created_at": 1, "author_name": 1, "user_id": 1, "content": 1},
+            sort=[("created_at", ASCENDING)],
+            batch_size=batch_size
+        )
+
+    # ===== Harvest state =====
+    def get_channel_high_water_mark(self, channel_id: int) -> Optional[int]:
+        """
+        ============
+        Function: get_channel_high_water_mark
+        ------------
+        DESCRIPTION: Snowflake of the newest message already harvested in a channel, from channel_harvest_state. Falls back to the newest stored message for channels harvested before the state collection existed.
+        PARAMS: channel_id (int) - Channel snowflake
+        RETURNS: int or None if the channel was never harvested
+        ============
+        """
+        state = self.db.channel_harvest_state.find_one({"_id": channel_id}, {"last_message_id": 1})
+        if state and state.get("last_message_id"):
+            return state["last_message_id"]
+        last = self.db.discord_messages.find_one(
+            {"channel_id": channel_id},
+            {"_id": 1},
+            sort=[("created_at", -1)]
+        )
+        return last["_id"] if last else None
+
+    def get_harvested_channel_ids(self) -> List[int]:
+        """
+        ============
+        Function: get_harvested_channel_ids
+        ------------
+        DESCRIPTION: Channels with a high-water mark in channel_harvest_state, i.e. whose history has been read up to a known message by an unbounded harvest.
+        PARAMS: None
+        RETURNS: List[int] of channel snowflakes
+        ============
+        """
+        return self.db.channel_harvest_state.distinct('_id')
+
+    def advance_channel_high_water_mark(self, channel_id: int, message_id: int) -> None:
+        """
+        ============
+        Function: advance_channel_high_water_mark
+        ------------
+        DESCRIPTION: Move a channel's high-water mark forward to `message_id` ($max: never moves it back, safe with concurrent harvests).
+        PARAMS:
+        - channel_id (int): Channel snowflake
+        - message_id (int): Snowflake of the newest message harvested
+        RETURNS: None
+        ============
+        """
+        self.db.channel_harvest_state.update_one(
+            {"_id": channel_id},
+            {"$max": {"last_message_id": message_id}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    def count_pending_harvest_jobs(self) -> int:
+        return self.db.discord_harvest_jobs.count_documents({"status": "pending"})
+
     def add_harvest_job(self, job: dict) -> Any:
         """
         ============
@@ -97,24 +495,132 @@ class MongoStorage:
         """
         return self.db.discord_harvest_jobs.insert_one(job).inserted_id
 
-    def get_next_pending_job(self) -> Optional[dict]:
+    def get_next_pending_job(
+        self,
+        exclude_servers: Optional[List[int]] = None,
+        worker: Optional[str] = None,
+        lease_seconds: float = 60,
+        max_attempts: Optional[int] = None,
+        per_server_limit: Optional[int] = None
+    ) -> Optional[dict]:
         """
         ============
         Function: get_next_pending_job
         ------------
-        DESCRIPTION: Fetch and mark as 'running' the next pending Discord harvest job (FIFO order).
-        PARAMS: None
-        RETURNS: The job document or None if no pending job.
+        DESCRIPTION: Claim the next Discord harvest job (FIFO order): a pending job, or a running job whose lease expired. Skips the given guilds and, with `per_server_limit`, guilds already running that many jobs.
+        PARAMS:
+        - exclude_servers: Guild snowflakes whose jobs must not be claimed
+        - worker: Name of the claiming worker (lease owner)
+        - lease_seconds: Lease duration
+        - max_attempts: Jobs already claimed this many times are not claimed again (see fail_exhausted_harvest_jobs)
+        - per_server_limit: Max running jobs per guild, across every daemon
+        RETURNS: The claimed job document (with started_at) or None if no eligible job.
         ============
         """
-        job = self.db.discord_harvest_jobs.find_one_and_update(
-            {"status": "pending"},
-            {"$set": {"status": "running"}},
-            sort=[("created_at", 1)]
+        jobs = self.db.discord_harvest_jobs
+        excluded = set(exclude_servers or [])
+        if per_server_limit:
+            excluded.update(self.get_busy_harvest_servers(per_server_limit))
+        while True:
+            query = {"serverId": {"$nin": list(excluded)}} if excluded else {}
+            job = self._claim_job(jobs, query, worker, lease_seconds, max_attempts)
+            if job is None or not per_server_limit or self._within_server_limit(jobs, job, per_server_limit):
+                return job
+            # Another daemon claimed a job of this guild meanwhile: give this one back
+            self._release_job(jobs, job)
+            excluded.add(job["serverId"])
+
+    def get_busy_harvest_servers(self, limit: int) -> List[int]:
+        """
+        ============
+        Function: get_busy_harvest_servers
+        ------------
+        DESCRIPTION: Guilds with at least `limit` harvest jobs running under a live lease, whichever daemon runs them.
+        PARAMS: limit (int) - Running jobs per guild
+        RETURNS: List[int] of guild snowflakes
+        ============
+        """
+        pipeline = [
+            {"$match": {"status": "running", "lease_expires_at": {"$gte": datetime.utcnow()}}},
+            {"$group": {"_id": "$serverId", "running": {"$sum": 1}}},
+            {"$match": {"running": {"$gte": limit}}}
+        ]
+        return [doc["_id"] for doc in self.db.discord_harvest_jobs.aggregate(pipeline)]
+
+    def renew_harvest_job_lease(self, job_id, worker: str, lease_seconds: float = 60) -> bool:
+        """
+        ============
+        Function: renew_harvest_job_lease
+        ------------
+        DESCRIPTION: Extend the lease of a running Discord harvest job (heartbeat), if `worker` still owns it.
+        PARAMS:
+        - job_id: The ObjectId of the job
+        - worker: Name of the lease owner
+        - lease_seconds: New lease duration from now
+        RETURNS: bool - False if the lease was lost (job reclaimed by another worker or finished)
+        ============
+        """
+        return self._renew_job_lease(self.db.discord_harvest_jobs, job_id, worker, lease_seconds)
+
+    def fail_exhausted_harvest_jobs(self, max_attempts: int) -> int:
+        """
+        ============
+        Function: fail_exhausted_harvest_jobs
+        ------------
+        DESCRIPTION: Mark as failed the running Discord harvest jobs whose lease expired after `max_attempts` claims (e.g. a job that crashes every daemon that runs it).
+        PARAMS: max_attempts (int) - Claims allowed per job
+        RETURNS: int - number of jobs failed
+        ============
+        """
+        return self._fail_exhausted_jobs(self.db.discord_harvest_jobs, max_attempts)
+
+    def watch_harvest_job_inserts(self, max_await_time_ms: int = 1000):
+        """
+        ============
+        Function: watch_harvest_job_inserts
+        ------------
+        DESCRIPTION: Open a change stream on new Discord harvest jobs (inserts only, ids only). Requires a replica set or sharded cluster: raises OperationFailure (code 40573) on a standalone server.
+        PARAMS: max_await_time_ms (int) - Max time a try_next() call blocks on the server
+        RETURNS: pymongo ChangeStream (context manager)
+        ============
+        """
+        return self.db.discord_harvest_jobs.watch(
+            [{"$match": {"operationType": "insert"}}, {"$project": {"documentKey": 1}}],
+            max_await_time_ms=max_await_time_ms
         )
-        return job
 
-    def update_job_status(self, job_id, status, **kwargs):
+    def record_harvest_progress(self, job_id, fetched: int, inserted: int) -> None:
+        """
+        ============
+        Function: record_harvest_progress
+        ------------
+        DESCRIPTION: Add a stored batch to the progress counters of a running Discord harvest job.
+        PARAMS:
+        - job_id: The ObjectId of the job
+        - fetched (int): Messages read from Discord in the batch
+        - inserted (int): Messages actually inserted
+        RETURNS: None
+        ============
+        """
+        self.db.discord_harvest_jobs.update_one(
+            {"_id": job_id},
+            {"$inc": {"progress.fetched": fetched, "progress.inserted": inserted}, "$set": {"progress.updated_at": datetime.utcnow()}}
+        )
+
+    def get_harvest_job_progress(self, job_id) -> Dict[str, Any]:
+        """
+        ============
+        Function: get_harvest_job_progress
+        ------------
+        DESCRIPTION: Progress counters of a Discord harvest job (see record_harvest_progress).
+        PARAMS: job_id - The ObjectId of the job
+        RETURNS: dict (empty if no batch was stored yet)
+        ============
+        """
+        job = self.db.discord_harvest_jobs.find_one({"_id": job_id}, {"progress": 1}) or {}
+        return job.get("progress", {})
+
+    def update_job_status(self, job_id, status, worker: Optional[str] = None, **kwargs) -> bool:
         """
         ============
         Function: update_job_status
@@ -123,13 +629,194 @@ class MongoStorage:
         PARAMS:
         - job_id: The ObjectId of the job
         - status: New status string
+        - worker: If set, only update while this worker still holds the job's lease (fencing against a reclaimed job)
         - kwargs: Additional fields to update
-        RETURNS: None
+        RETURNS: bool - False if nothing matched (job missing or lease lost)
+        ============
+        """
+        return self._set_job_status(self.db.discord_harvest_jobs, job_id, status, worker, kwargs)
+
+    # ===== Analysis jobs =====
+    def add_analysis_job(self, job: dict) -> Any:
+        """
+        ============
+        Function: add_analysis_job
+        ------------
+        DESCRIPTION: Insert a new LLM analysis job in the database.
+        PARAMS: job (dict) - Analysis parameters and metadata.
+        RETURNS: Inserted job ID
+        ============
+        """
+        return self.db.analysis_jobs.insert_one(job).inserted_id
+
+    def count_pending_analysis_jobs(self) -> int:
+        return self.db.analysis_jobs.count_documents({"status": "pending"})
+
+    def get_analysis_job(self, job_id) -> Optional[dict]:
+        return self.db.analysis_jobs.find_one({"_id": job_id})
+
+    def get_next_pending_analysis_job(
+        self,
+        worker: Optional[str] = None,
+        lease_seconds: float = 120,
+        max_attempts: Optional[int] = None
+    ) -> Optional[dict]:
+        """
         ============
+        Function: get_next_pending_analysis_job
+        ------------
+        DESCRIPTION: Claim the next analysis job (FIFO order): a pending job, or a running job whose lease expired (its worker died). The claim marks it 'running' under a lease of `lease_seconds` that the owner must renew (renew_analysis_job_lease), and counts the attempt.
+        PARAMS:
+        - worker: Name of the claiming worker (lease owner)
+        - lease_seconds: Lease duration
+        - max_attempts: Jobs already claimed this many times are not claimed again (see fail_exhausted_analysis_jobs)
+        RETURNS: The claimed job document (with started_at) or None if no eligible job.
+        ============
+        """
+        return self._claim_job(self.db.analysis_jobs, {}, worker, lease_seconds, max_attempts)
+
+    def renew_analysis_job_lease(self, job_id, worker: str, lease_seconds: float = 120) -> bool:
+        """
+        ============
+        Function: renew_analysis_job_lease
+        ------------
+        DESCRIPTION: Extend the lease of a running analysis job (heartbeat), if `worker` still owns it.
+        PARAMS:
+        - job_id: The ObjectId of the job
+        - worker: Name of the lease owner
+        - lease_seconds: New lease duration from now
+        RETURNS: bool - False if the lease was lost (job reclaimed by another worker or finished)
+        ============
+        """
+        return self._renew_job_lease(self.db.analysis_jobs, job_id, worker, lease_seconds)
+
+    def fail_exhausted_analysis_jobs(self, max_attempts: int) -> int:
+        """
+        ============
+        Function: fail_exhausted_analysis_jobs
+        ------------
+        DESCRIPTION: Mark as failed the running analysis jobs whose lease expired after `max_attempts` claims.
+        PARAMS: max_attempts (int) - Claims allowed per job
+        RETURNS: int - number of jobs failed
+        ============
+        """
+        return self._fail_exhausted_jobs(self.db.analysis_jobs, max_attempts)
+
+    def update_analysis_job_status(self, job_id, status, worker: Optional[str] = None, **kwargs) -> bool:
         """
+        ============
+        Function: update_analysis_job_status
+        ------------
+        DESCRIPTION: Update the status and additional fields of an analysis job.
+        PARAMS:
+        - job_id: The ObjectId of the job
+        - status: New status string
+        - worker: If set, only update while this worker still holds the job's lease (fencing against a reclaimed job)
+        - kwargs: Additional fields to update
+        RETURNS: bool - False if nothing matched (job missing or lease lost)
+        ============
+        """
+        return self._set_job_status(self.db.analysis_jobs, job_id, status, worker, kwargs)
+
+    # ===== Job leases (harvest and analysis jobs) =====
+    def _claim_job(self, jobs, query: Dict[str, Any], worker: Optional[str], lease_seconds: float, max_attempts: Optional[int]) -> Optional[dict]:
+        """Claim the oldest pending or lease-expired job of a jobs collection matching `query`."""
+        now = datetime.utcnow()
+        query = dict(query)
+        query["$or"] = [
+            {"status": "pending"},
+            # Missing lease (job claimed before leases existed) counts as expired
+            {"status": "running", "lease_expires_at": {"$not": {"$gte": now}}}
+        ]
+        if max_attempts:
+            query["attempts"] = {"$not": {"$gte": max_attempts}}
+        return jobs.find_one_and_update(
+            query,
+            {
+                "$set": {
+                    "status": "running",
+                    "started_at": now,
+                    "worker": worker,
+                    "lease_expires_at": now + timedelta(seconds=lease_seconds)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _within_server_limit(self, jobs, job: dict, limit: int) -> bool:
+        """Whether a just-claimed job is among the first `limit` running jobs of its server (claim order), so that
+        concurrent claimers agree on which ones keep their claim."""
+        first = jobs.find(
+            {"serverId": job["serverId"], "status": "running", "lease_expires_at": {"$gte": datetime.utcnow()}},
+            {"_id": 1},
+            sort=[("started_at", 1), ("_id", 1)],
+            limit=limit
+        )
+        return any(doc["_id"] == job["_id"] for doc in first)
+
+    def _release_job(self, jobs, job: dict) -> None:
+        """Give a claimed job back to the queue, without counting the attempt."""
+        jobs.update_one(
+            {"_id": job["_id"], "status": "running", "worker": job.get("worker")},
+            {"$set": {"status": "pending"}, "$unset": {"worker": "", "lease_expires_at": "", "started_at": ""}, "$inc": {"attempts": -1}}
+        )
+
+    def _renew_job_lease(self, jobs, job_id, worker: str, lease_seconds: float) -> bool:
+        result = jobs.update_one(
+            {"_id": job_id, "status": "running", "worker": worker},
+            {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+        return result.matched_count == 1
+
+    def _fail_exhausted_jobs(self, jobs, max_attempts: int) -> int:
+        now = datetime.utcnow()
+        result = jobs.update_many(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": max_attempts}},
+            {"$set": {"status": "failed", "finished_at": now, "error": f"Lease expired after {max_attempts} attempts"}}
+        )
+        return result.modified_count
+
+    def _set_job_status(self, jobs, job_id, status, worker: Optional[str], fields: Dict[str, Any]) -> bool:
+        query = {"_id": job_id}
+        if worker is not None:
+            query.update({"status": "running", "worker": worker})
         update = {"status": status}
-        update.update(kwargs)
-        self.db.discord_harvest_jobs.update_one({"_id": job_id}, {"$set": update})
+        update.update(fields)
+        return jobs.update_one(query, {"$set": update}).matched_count == 1
+
+    # ===== LLM result cache =====
+    def get_cached_llm_result(self, key: str) -> Optional[dict]:
+        """
+        ============
+        Function: get_cached_llm_result
+        ------------
+        DESCRIPTION: Return a cached LLM response by content hash, ignoring entries past expiry that the TTL monitor has not removed yet.
+        PARAMS: key (str) - Cache key (sha256 hex)
+        RETURNS: Cached document or None
+        ============
+        """
+        return self.db.llm_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+
+    def save_cached_llm_result(self, key: str, result: dict, ttl_seconds: int, **metadata) -> None:
+        """
+        ============
+        Function: save_cached_llm_result
+        ------------
+        DESCRIPTION: Store (or replace) an LLM response under its content hash. Expiry is enforced by the TTL index on expires_at.
+        PARAMS:
+        - key (str): Cache key (sha256 hex)
+        - result (dict): LLM response
+        - ttl_seconds (int): Time to live
+        - metadata: Extra fields stored with the entry (model, prompt_key...)
+        RETURNS: None
+        ============
+        """
+        now = datetime.utcnow()
+        doc = {"result": result, "created_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)}
+        doc.update(metadata)
+        self.db.llm_cache.replace_one({"_id": key}, doc, upsert=True)
 
     # ===== YouTube =====
     def get_youtube_accounts(self) -> List[Dict[str, Any]]:
@@ -157,4 +844,21 @@ class MongoStorage:
         return self.db.list_collection_names()
 
     def list_documents_in_collection(self, collection_name: str, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
-        return list(self.db[collection_name].find().skip(skip).limit(limit))
\ No newline at end of file
+        return list(self.db[collection_name].find().skip(skip).limit(limit))
+
+def get_shared_storage() -> MongoStorage:
+    """
+    ============
+    Function: get_shared_storage
+    ------------
+    DESCRIPTION: Return the process-wide MongoStorage, bound to the process-wide client. Rebuilt only when that client changes (after a fork or close_mongo_client), so callers on hot paths never re-read the environment.
+    PARAMS: None
+    RETURNS: MongoStorage
+    ============
+    """
+    global _storage
+    client = get_mongo_client()
+    storage = _storage
+    if storage is None or storage.client is not client:
+        storage = _storage = MongoStorage(client)
+    return storage